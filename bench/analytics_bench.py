@@ -0,0 +1,107 @@
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sessions import generate_session, START_TIME
+
+# Benchmarks for the session analytics routes.
+#
+# Generates synthetic sessions of increasing length (sessions.py) in a
+# temporary data directory, then times /analyze and /generate-heatmap through
+# Flask's test client: first request (cold: nothing cached in memory or under
+# .cache/) and a repeat (warm), plus a heatmap over the last quarter of the
+# session and its JSON grid. Reports seconds, CPU seconds and response size
+# per request, and the process's peak RSS after each session.
+#
+#   python bench/analytics_bench.py --hours 0.5,2,8 --players 5
+#   python bench/analytics_bench.py --hours 1 --players 30 --json results.json
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def _timed(client, url):
+    wall, cpu = time.perf_counter(), time.process_time()
+    response = client.get(url)
+    return {
+        "seconds": round(time.perf_counter() - wall, 4),
+        "cpu_seconds": round(time.process_time() - cpu, 4),
+        "bytes": len(response.data),
+        "status": response.status_code,
+    }
+
+
+def _peak_rss_mb():
+    # ru_maxrss is kB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run(hours_list, players, event_rate, sample_rate):
+    with tempfile.TemporaryDirectory(prefix="mc-analytics-bench-") as tmp:
+        data_dir = Path(tmp)
+        # The app reads MC_DATA_DIR at import
+        os.environ["MC_DATA_DIR"] = str(data_dir)
+        sys.path.insert(0, str(BASE_DIR / "webapp"))
+        import app as webapp
+
+        client = webapp.app.test_client()
+        results = []
+        for hours in hours_list:
+            name = f"events_bench_{hours:g}h"
+            started = time.perf_counter()
+            events, samples = generate_session(data_dir / name, hours, players, event_rate, sample_rate)
+            generated = time.perf_counter() - started
+
+            window = START_TIME + hours * 3600 * 0.75
+            requests = [
+                ("analyze", f"/analyze?file={name}"),
+                ("analyze (warm)", f"/analyze?file={name}"),
+                ("heatmap", f"/generate-heatmap?file={name}"),
+                ("heatmap (warm)", f"/generate-heatmap?file={name}"),
+                ("heatmap last 25%", f"/generate-heatmap?file={name}&start={window}"),
+                ("heatmap json", f"/generate-heatmap?file={name}&format=json"),
+            ]
+            row = {
+                "hours": hours,
+                "players": players,
+                "events": events,
+                "samples": samples,
+                "generate_seconds": round(generated, 2),
+                "requests": {label: _timed(client, url) for label, url in requests},
+                "peak_rss_mb": _peak_rss_mb(),
+            }
+            results.append(row)
+            _print(row)
+        return results
+
+
+def _print(row):
+    print(f"\n{row['hours']:g}h, {row['players']} players: {row['events']} events, "
+          f"{row['samples']} samples (peak RSS {row['peak_rss_mb']} MB)")
+    for label, result in row["requests"].items():
+        print(f"  {label:20} {result['seconds'] * 1000:>9.1f} ms  cpu {result['cpu_seconds'] * 1000:>9.1f} ms  "
+              f"{result['bytes']:>9} B  {result['status']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark /analyze and /generate-heatmap on generated sessions")
+    parser.add_argument("--hours", default="0.5,2,8", help="Comma-separated session lengths, one session each")
+    parser.add_argument("--players", type=int, default=5)
+    parser.add_argument("--event-rate", type=float, default=4.0, help="Journaled events per second, all players")
+    parser.add_argument("--sample-rate", type=float, default=5.0, help="Position samples per player per second")
+    parser.add_argument("--json", type=Path, help="Also write the results here")
+    args = parser.parse_args(argv)
+
+    results = run([float(h) for h in args.hours.split(",")], args.players, args.event_rate, args.sample_rate)
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from simclient import ClientRates, run_clients
+from procstats import ProcessSampler
+
+# Ingest benchmark for websocket_server/server.py.
+#
+# For each client count, a fresh server is started on localhost with its own
+# temporary data directory. N simulated Bedrock clients (simclient.py) then
+# replay events at the given rates for --duration seconds. A tailer thread
+# follows the session's journal segments as they are written and matches
+# each tagged event to its send time, which gives end-to-end ingest latency
+# from client send to on disk (to within TAIL_INTERVAL). The server's CPU and RSS are sampled from
+# /proc throughout. After the clients stop, the harness waits for the server
+# to drain. Throughput counts what reached disk, journal events plus
+# positions.bin records, so dropped or filtered samples don't inflate it.
+#
+#   python bench/ingest_bench.py --clients 1,10,30 --duration 20
+#   python bench/ingest_bench.py --clients 20 --transform-rate 20 --json results.json
+#   python bench/ingest_bench.py --clients 100 --workers 4
+#
+# The clients run in this process, so on a small machine they compete with
+# the server for CPU; compare runs on the same machine.
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+SERVER_PATH = BASE_DIR / "websocket_server" / "server.py"
+sys.path.insert(0, str(BASE_DIR / "websocket_server"))
+
+from telemetry import POSITION_DTYPE, POSITIONS_FILE
+
+TAIL_INTERVAL = 0.01   # Seconds between journal polls
+DRAIN_TIMEOUT = 30.0   # Max seconds to wait for the server to write everything after the clients stop
+STARTUP_TIMEOUT = 15.0
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class JournalTailer:
+    # Follows every segment of the session in `data_dir` and records ingest latency of tagged events
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.latencies = []
+        self.events = 0
+        self._offsets = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.poll()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.poll()
+            time.sleep(TAIL_INTERVAL)
+
+    def poll(self):
+        for segment in sorted(self.data_dir.glob("events_*/**/segment_*.jsonl")):
+            offset = self._offsets.get(segment, 0)
+            if segment.stat().st_size == offset:
+                continue
+            seen = time.time()
+            with segment.open("rb") as f:
+                f.seek(offset)
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        break
+                    offset += len(raw)
+                    try:
+                        bench = json.loads(raw)["body"].get("bench")
+                    except (ValueError, KeyError, AttributeError):
+                        continue
+                    self.events += 1
+                    if bench:
+                        self.latencies.append(seen - bench["sent"])
+            self._offsets[segment] = offset
+
+
+def position_records(data_dir):
+    return sum(path.stat().st_size // POSITION_DTYPE.itemsize for path in data_dir.glob(f"events_*/**/{POSITIONS_FILE}"))
+
+
+def start_server(data_dir, port, filter_path=None, workers=1):
+    env = dict(os.environ, MC_DATA_DIR=str(data_dir), MC_SERVER_HOST="127.0.0.1", MC_SERVER_PORT=str(port),
+               MC_LIVE_FEED_PORT=str(free_port()), MC_SERVER_LOG_LEVEL="WARNING", MC_INGEST_WORKERS=str(workers))
+    if filter_path:
+        env["MC_INGEST_FILTER"] = str(filter_path)
+    process = subprocess.Popen([sys.executable, str(SERVER_PATH)], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("Server did not start listening")
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=DRAIN_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    ms = np.array(values) * 1000
+    return {f"p{q}": round(float(np.percentile(ms, q)), 1) for q in (50, 90, 99)} | {"max": round(float(ms.max()), 1)}
+
+
+def run_step(clients, args):
+    # One benchmark run against a fresh server; returns the result row
+    with tempfile.TemporaryDirectory(prefix="mc-ingest-bench-") as tmp:
+        data_dir = Path(tmp)
+        port = free_port()
+        process = start_server(data_dir, port, args.filter, args.workers)
+        sampler = ProcessSampler(process.pid)
+        tailer = JournalTailer(data_dir)
+        try:
+            sampler.start()
+            tailer.start()
+            rates = ClientRates(args.transform_rate, args.block_rate, args.message_rate)
+            started = time.monotonic()
+            stats = asyncio.run(run_clients(f"ws://127.0.0.1:{port}", clients, args.duration, rates, ramp=args.ramp))
+            sending = time.monotonic() - started
+
+            # Wait until every tagged event has been written
+            tagged = sum(count for s in stats for name, count in s.sent.items() if name != "PlayerTransform")
+            deadline = time.monotonic() + DRAIN_TIMEOUT
+            while len(tailer.latencies) < tagged and time.monotonic() < deadline:
+                time.sleep(TAIL_INTERVAL)
+            drain = time.monotonic() - started - sending
+            cpu = sampler.cpu_percent()
+        finally:
+            stop_server(process)
+            tailer.stop()
+            sampler.stop()
+
+        sent = {}
+        for s in stats:
+            for name, count in s.sent.items():
+                sent[name] = sent.get(name, 0) + count
+        persisted = tailer.events + position_records(data_dir)
+        subscribed = [s.subscribed_after for s in stats if s.subscribed_after is not None]
+        return {
+            "clients": clients,
+            "workers": args.workers,
+            "seconds": round(sending, 2),
+            "sent": sent,
+            "sent_per_second": round(sum(sent.values()) / sending, 1),
+            "persisted": persisted,
+            "persisted_per_second": round(persisted / (sending + drain), 1),
+            "lost_tagged": tagged - len(tailer.latencies),
+            "drain_seconds": round(drain, 2),
+            "latency_ms": percentiles(tailer.latencies),
+            "subscribe_ms": percentiles(subscribed),
+            "client_errors": sum(s.errors for s in stats),
+            "server_cpu_percent": cpu,
+            "server_rss_mb": sampler.rss_mb(),
+            "server_peak_rss_mb": sampler.peak_rss_mb(),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark WebSocket ingest with simulated Bedrock clients")
+    parser.add_argument("--clients", default="1,10,30", help="Comma-separated client counts, one run each")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of event replay per run")
+    parser.add_argument("--ramp", type=float, default=1.0, help="Seconds over which clients connect")
+    parser.add_argument("--transform-rate", type=float, default=10.0, help="PlayerTransform samples per client per second")
+    parser.add_argument("--block-rate", type=float, default=0.5, help="BlockPlaced per client per second")
+    parser.add_argument("--message-rate", type=float, default=0.05, help="PlayerMessage per client per second")
+    parser.add_argument("--workers", default="1", help="Ingest worker processes (MC_INGEST_WORKERS), or 'auto'")
+    parser.add_argument("--filter", type=Path, help="Ingest filter rules for the server (MC_INGEST_FILTER)")
+    parser.add_argument("--json", type=Path, help="Also write the results here")
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'Clients':>7} {'sent/s':>8} {'disk/s':>8} {'p50 ms':>7} {'p99 ms':>7} {'max ms':>7} "
+          f"{'drain':>6} {'lost':>5} {'CPU %':>6} {'RSS MB':>7} {'peak':>6}")
+    for clients in (int(n) for n in args.clients.split(",")):
+        row = run_step(clients, args)
+        results.append(row)
+        latency = row["latency_ms"]
+        print(f"{clients:>7} {row['sent_per_second']:>8} {row['persisted_per_second']:>8} "
+              f"{latency.get('p50', '-'):>7} {latency.get('p99', '-'):>7} {latency.get('max', '-'):>7} "
+              f"{row['drain_seconds']:>5}s {row['lost_tagged']:>5} {row['server_cpu_percent'] or '-':>6} "
+              f"{row['server_rss_mb'] or '-':>7} {row['server_peak_rss_mb'] or '-':>6}")
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+
+# CPU and memory of another process and its children (a multi-worker
+# server's workers), read from /proc (Linux).
+#
+# Elsewhere the sampler reports None rather than pulling in a dependency for
+# a benchmark-only number.
+
+SAMPLE_INTERVAL = 0.25
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def _stat(pid):
+    # Fields after the command name, which may contain spaces
+    with open(f"/proc/{pid}/stat") as f:
+        return f.read().rsplit(")", 1)[1].split()
+
+
+def _cpu_seconds(pid):
+    # User + system CPU time
+    fields = _stat(pid)
+    return (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+
+
+def _children(pid):
+    children = []
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                if int(_stat(entry)[1]) == pid:
+                    children.append(int(entry))
+            except (OSError, IndexError):
+                continue  # Exited while we looked
+    return children
+
+
+def _memory_kb(pid):
+    # (current RSS, peak RSS) in kB
+    values = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                values[key] = int(value.split()[0])
+    return values.get("VmRSS"), values.get("VmHWM")
+
+
+class ProcessSampler:
+    def __init__(self, pid, interval=SAMPLE_INTERVAL):
+        self.pid = pid
+        self.interval = interval
+        self.available = os.path.exists(f"/proc/{pid}/stat")
+        self._rss_kb = None
+        self._peak_kb = None
+        self._started = None
+        self._start_cpu = {}   # Pid -> CPU seconds when first seen
+        self._cpu = {}         # Pid -> CPU seconds when last seen
+        self._peaks = {}       # Pid -> peak RSS in kB
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        if not self.available:
+            return
+        self._started = time.monotonic()
+        self._start_cpu[self.pid] = _cpu_seconds(self.pid)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _sample(self):
+        # Returns False once the process has exited
+        total = 0
+        for pid in [self.pid] + _children(self.pid):
+            try:
+                rss, peak = _memory_kb(pid)
+                cpu = _cpu_seconds(pid)
+            except OSError:
+                if pid == self.pid:
+                    return False
+                continue
+            self._start_cpu.setdefault(pid, 0.0)  # Children start after us
+            self._cpu[pid] = cpu
+            self._peaks[pid] = max(self._peaks.get(pid, 0), peak or rss or 0)
+            total += rss or 0
+        self._rss_kb = total
+        self._peak_kb = max(self._peak_kb or 0, sum(self._peaks.values()))  # Upper bound for the tree
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self._sample():
+                return
+
+    def cpu_percent(self):
+        # Average CPU use since start(), where 100 is one core
+        if not self.available:
+            return None
+        if not self._sample() and not self._cpu:
+            return None
+        used = sum(cpu - self._start_cpu[pid] for pid, cpu in self._cpu.items())
+        elapsed = time.monotonic() - self._started
+        return round(100 * used / elapsed, 1) if elapsed > 0 else None
+
+    def rss_mb(self):
+        return round(self._rss_kb / 1024, 1) if self._rss_kb else None
+
+    def peak_rss_mb(self):
+        return round(self._peak_kb / 1024, 1) if self._peak_kb else None
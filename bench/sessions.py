@@ -0,0 +1,92 @@
+import json
+import math
+import random
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+# Appended, not prepended: analytics_bench.py imports the dashboard, whose module names overlap the server's
+sys.path.append(str(Path(__file__).resolve().parent.parent / "websocket_server"))
+
+from journal import SEGMENT_MAX_BYTES
+from telemetry import POSITION_DTYPE, POSITIONS_FILE, PLAYERS_FILE
+
+# Synthetic sessions in the server's on-disk layout.
+#
+# Writes what a classroom session of `hours` with `players` players would
+# leave behind: JSON Lines journal segments (rotated at the journal's segment
+# size) with joins, block and chat events at Poisson rates, and positions.bin
+# with each player walking around at `sample_rate` samples per second.
+
+START_TIME = 1_790_000_000.0
+
+
+class _Segments:
+    def __init__(self, directory):
+        self.directory = directory
+        self.index = 0
+        self.file = None
+        self._next()
+
+    def _next(self):
+        if self.file is not None:
+            self.file.close()
+        self.index += 1
+        self.file = open(self.directory / f"segment_{self.index:05d}.jsonl", "w", encoding="utf-8")
+
+    def write(self, event_name, t, body):
+        self.file.write(json.dumps({"event": event_name, "body": body, "client_ip": "127.0.0.1",
+                                    "timestamp": datetime.fromtimestamp(t).isoformat()}) + "\n")
+        if self.file.tell() >= SEGMENT_MAX_BYTES:
+            self._next()
+
+    def close(self):
+        self.file.close()
+
+
+def generate_session(directory, hours, players=5, event_rate=4.0, sample_rate=5.0, seed=0):
+    # Returns (journaled events, position records)
+    rng = random.Random(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+    names = [f"Player{i}" for i in range(players)]
+    end = START_TIME + hours * 3600
+
+    segments = _Segments(directory)
+    events = 0
+    for name in names:
+        segments.write("PlayerJoin", START_TIME, {"player": {"name": name}})
+        events += 1
+    t = START_TIME
+    while True:
+        t += rng.expovariate(event_rate)
+        if t >= end:
+            break
+        name = rng.choice(names)
+        roll = rng.random()
+        if roll < 0.6:
+            segments.write("BlockPlaced", t, {"player": {"name": name}, "block": {"id": "stone"}})
+        elif roll < 0.9:
+            segments.write("BlockBroken", t, {"player": {"name": name}, "block": {"id": "dirt"}})
+        else:
+            segments.write("PlayerMessage", t, {"sender": name, "message": "hello", "type": "chat"})
+        events += 1
+    segments.close()
+
+    # Each player wanders around their own area, interleaved in time like the server writes them
+    steps = int(hours * 3600 * sample_rate)
+    records = np.empty(steps * players, dtype=POSITION_DTYPE)
+    phase = np.arange(steps) / 3000
+    for i in range(players):
+        walk = np.cumsum(np.random.default_rng(seed + i).normal(0, 0.3, (steps, 2)), axis=0)
+        rows = slice(i, None, players)
+        records["t"][rows] = START_TIME + np.arange(steps) / sample_rate
+        records["player"][rows] = i
+        records["x"][rows] = walk[:, 0] + 50 * np.sin(phase + i * 2 * math.pi / players)
+        records["y"][rows] = 64
+        records["z"][rows] = walk[:, 1] + 50 * np.cos(phase + i * 2 * math.pi / players)
+        records["yaw"][rows] = 0
+    records.tofile(directory / POSITIONS_FILE)
+    (directory / PLAYERS_FILE).write_text(json.dumps(names), encoding="utf-8")
+    return events, len(records)
@@ -0,0 +1,188 @@
+import asyncio
+import json
+import math
+import random
+import time
+
+import websockets
+
+# Simulated Minecraft Bedrock clients.
+#
+# Each client connects like the game does after /connect, answers the
+# server's subscribe commandRequests with a commandResponse, then plays a
+# player: a PlayerJoin, a steady stream of PlayerTransform samples from a
+# walk around the world, and BlockPlaced and PlayerMessage events at Poisson
+# rates. Events are only sent once the server has subscribed to their type.
+#
+# Journaled events carry body["bench"] = {"sent": unix time, "seq": n} so the
+# harness can match them on disk and measure end-to-end ingest latency.
+# PlayerTransform bodies are left untagged: they are stored as binary
+# records, and a tag would defeat the ingest filter's duplicate check.
+
+WALK_SPEED = 4.3        # Blocks per second, a walking player
+TURN_RATE = 0.6         # Radians per second of heading drift
+BLOCKS = ["stone", "dirt", "planks", "glass", "torch", "cobblestone"]
+SIMULATED_EVENTS = {"PlayerJoin", "PlayerLeave", "PlayerTransform", "BlockPlaced", "PlayerMessage"}
+MESSAGES = ["hello", "where are you?", "look at this", "I found diamonds", "brb", "can you help me build this?"]
+
+
+class ClientRates:
+    def __init__(self, transform=10.0, block=0.5, message=0.05):
+        self.transform = transform  # Samples per second
+        self.block = block          # BlockPlaced per second, on average
+        self.message = message      # PlayerMessage per second, on average
+
+
+class ClientStats:
+    def __init__(self):
+        self.sent = {}
+        self.subscribed_after = None    # Seconds from connect until all subscriptions arrived
+        self.errors = 0
+
+    def count(self, event_name):
+        self.sent[event_name] = self.sent.get(event_name, 0) + 1
+
+
+def _header(event_name):
+    return {
+        "version": 1,
+        "requestId": "00000000-0000-0000-0000-000000000000",
+        "messagePurpose": "event",
+        "eventName": event_name,
+    }
+
+
+def _player(name, x, y, z, yaw):
+    return {"name": name, "position": {"x": x, "y": y, "z": z}, "yRot": yaw,
+            "color": "ffededed", "dimension": 0, "id": -4294967295, "type": "minecraft:player", "variant": 0}
+
+
+class SimulatedPlayer:
+    def __init__(self, name, rates, seed=None):
+        self.name = name
+        self.rates = rates
+        self.random = random.Random(seed)
+        self.x = self.random.uniform(-200, 200)
+        self.z = self.random.uniform(-200, 200)
+        self.y = 64.0
+        self.heading = self.random.uniform(0, 2 * math.pi)
+        self.seq = 0
+        self.subscribed = set()
+        self.stats = ClientStats()
+
+    def _tagged(self, body):
+        self.seq += 1
+        body["bench"] = {"sent": time.time(), "seq": self.seq}
+        return body
+
+    def _move(self, dt):
+        self.heading += self.random.gauss(0, TURN_RATE * math.sqrt(dt))
+        self.x += math.cos(self.heading) * WALK_SPEED * dt
+        self.z += math.sin(self.heading) * WALK_SPEED * dt
+
+    def _event(self, event_name):
+        player = _player(self.name, self.x, self.y, self.z, math.degrees(self.heading) % 360 - 180)
+        if event_name == "PlayerTransform":
+            return {"player": player}
+        if event_name == "PlayerJoin":
+            return self._tagged({"player": {"name": self.name, "id": -4294967295}})
+        if event_name == "PlayerLeave":
+            return self._tagged({"player": {"name": self.name, "id": -4294967295}})
+        if event_name == "BlockPlaced":
+            return self._tagged({"block": {"id": self.random.choice(BLOCKS), "namespace": "minecraft"},
+                                 "count": 1, "placedUnderWater": False, "placementMethod": 0,
+                                 "player": player, "tool": {"id": "air", "namespace": "minecraft"}})
+        return self._tagged({"message": self.random.choice(MESSAGES), "receiver": "",
+                             "sender": self.name, "type": "chat"})
+
+    async def _send(self, websocket, event_name):
+        if event_name not in self.subscribed:
+            return
+        await websocket.send(json.dumps({"header": _header(event_name), "body": self._event(event_name)}))
+        self.stats.count(event_name)
+
+    async def _answer(self, websocket, connected):
+        # Reply to commandRequests the way the game does
+        async for message in websocket:
+            try:
+                data = json.loads(message)
+            except json.JSONDecodeError:
+                continue
+            header = data.get("header", {})
+            if header.get("messageType") != "commandRequest":
+                continue
+            event_name = data.get("body", {}).get("eventName")
+            if header.get("messagePurpose") == "subscribe" and event_name:
+                self.subscribed.add(event_name)
+                if self.stats.subscribed_after is None and self.subscribed >= SIMULATED_EVENTS:
+                    self.stats.subscribed_after = time.perf_counter() - connected
+            await websocket.send(json.dumps({
+                "header": {"version": 1, "requestId": header.get("requestId"),
+                           "messagePurpose": "commandResponse", "messageType": "commandResponse"},
+                "body": {"statusCode": 0, "statusMessage": ""},
+            }))
+
+    async def run(self, url, duration, subscribe_timeout=5.0):
+        connected = time.perf_counter()
+        async with websockets.connect(url, max_queue=None) as websocket:
+            answering = asyncio.create_task(self._answer(websocket, connected))
+            try:
+                deadline = time.perf_counter() + subscribe_timeout
+                while self.stats.subscribed_after is None and time.perf_counter() < deadline:
+                    await asyncio.sleep(0.01)
+                await self._send(websocket, "PlayerJoin")
+                await self._play(websocket, duration)
+                await self._send(websocket, "PlayerLeave")
+            finally:
+                answering.cancel()
+
+    async def _play(self, websocket, duration):
+        now = time.perf_counter()
+        end = now + duration
+        # Spread the first samples so clients don't all send on the same tick
+        interval = 1 / self.rates.transform if self.rates.transform > 0 else None
+        due = {
+            "PlayerTransform": now + self.random.uniform(0, interval) if interval else math.inf,
+            "BlockPlaced": now + self._wait(self.rates.block),
+            "PlayerMessage": now + self._wait(self.rates.message),
+        }
+        last_move = now
+        while True:
+            event_name = min(due, key=due.get)
+            if due[event_name] >= end:
+                return
+            delay = due[event_name] - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            now = time.perf_counter()
+            self._move(now - last_move)
+            last_move = now
+            try:
+                await self._send(websocket, event_name)
+            except websockets.exceptions.ConnectionClosed:
+                self.stats.errors += 1
+                return
+            if event_name == "PlayerTransform":
+                due[event_name] += interval
+            else:
+                rate = self.rates.block if event_name == "BlockPlaced" else self.rates.message
+                due[event_name] = now + self._wait(rate)
+
+    def _wait(self, rate):
+        return self.random.expovariate(rate) if rate > 0 else math.inf
+
+
+async def run_clients(url, count, duration, rates, ramp=1.0, seed=0):
+    # Runs `count` players for `duration` seconds, connecting over `ramp` seconds; returns their stats
+    players = [SimulatedPlayer(f"Bench{i:04d}", rates, seed=seed + i) for i in range(count)]
+
+    async def start(i, player):
+        await asyncio.sleep(ramp * i / max(count, 1))
+        try:
+            await player.run(url, duration)
+        except (OSError, websockets.exceptions.WebSocketException):
+            player.stats.errors += 1
+
+    await asyncio.gather(*(start(i, player) for i, player in enumerate(players)))
+    return [player.stats for player in players]
+
@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+from collections import Counter
+
+from event_store import session_segments, segment_name, iter_events, read_new_events
+
+# Persistent, incremental aggregates for /analyze.
+#
+# For each session we remember the totals computed so far together with how
+# far into each journal segment they go (a byte offset for JSONL segments, a
+# size/mtime stamp for legacy JSON arrays). A repeat request only parses the
+# events appended since then; anything rewritten or truncated triggers a full
+# rebuild. State is kept in memory and mirrored to DATA_DIR/.cache/analyze/.
+
+CACHE_VERSION = 1
+
+_lock = threading.Lock()
+_states = {}
+
+
+def _empty_state():
+    return {
+        "version": CACHE_VERSION,
+        "segments": {},
+        "event_types": {},
+        "joins": 0,
+        "messages": 0,
+        "total_events": 0,
+        "join_timestamps": [],
+    }
+
+
+def _add_events(state, event_types, events):
+    for e in events:
+        event_name = e.get("event")
+        if event_name == "PlayerTransform":
+            continue  # Counted from the position records instead
+
+        state["total_events"] += 1
+        event_types[event_name] += 1
+
+        if event_name == "PlayerJoin":
+            state["joins"] += 1
+            state["join_timestamps"].append(e.get("timestamp"))
+        elif event_name == "PlayerMessage":
+            state["messages"] += 1
+
+
+def _cache_path(cache_dir, path):
+    return cache_dir / f"{path.name}.json"
+
+
+def _load_state(cache_dir, path):
+    state = _states.get(path)
+    if state is None:
+        try:
+            with open(_cache_path(cache_dir, path), encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = None
+    if state is None or state.get("version") != CACHE_VERSION:
+        state = _empty_state()
+    return state
+
+
+def _save_state(cache_dir, path, state):
+    _states[path] = state
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = _cache_path(cache_dir, path).with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, _cache_path(cache_dir, path))
+
+
+def _is_stale(state, path, segments):
+    known = state["segments"]
+    current = {segment_name(path, segment) for segment in segments}
+    if set(known) - current:
+        return True
+    for segment in segments:
+        mark = known.get(segment_name(path, segment))
+        if mark is None:
+            continue
+        stat = segment.stat()
+        if segment.suffix == ".json":
+            if mark != [stat.st_size, stat.st_mtime_ns]:
+                return True
+        elif stat.st_size < mark:
+            return True
+    return False
+
+
+def session_aggregates(cache_dir, path):
+    with _lock:
+        state = _load_state(cache_dir, path)
+        segments = session_segments(path)
+        if _is_stale(state, path, segments):
+            state = _empty_state()
+
+        event_types = Counter(state["event_types"])
+        changed = False
+        for segment in segments:
+            name = segment_name(path, segment)
+            mark = state["segments"].get(name)
+            if segment.suffix == ".json":
+                if mark is not None:
+                    continue
+                stat = segment.stat()
+                _add_events(state, event_types, iter_events(segment))
+                state["segments"][name] = [stat.st_size, stat.st_mtime_ns]
+                changed = True
+            else:
+                offset = mark or 0
+                if segment.stat().st_size == offset:
+                    continue
+                events, offset = read_new_events(segment, offset)
+                _add_events(state, event_types, events)
+                state["segments"][name] = offset
+                changed = True
+
+        if changed:
+            state["event_types"] = dict(event_types)
+            _save_state(cache_dir, path, state)
+        else:
+            _states[path] = state
+        # Copy the parts that later updates mutate in place; shards add joins out of order
+        return dict(state, event_types=dict(state["event_types"]),
+                    join_timestamps=sorted(state["join_timestamps"], key=lambda t: t or ""))
@@ -1,49 +1,99 @@
-from flask import Flask, jsonify, request, render_template, send_file, send_from_directory, abort
+from flask import Flask, Response, g, jsonify, request, render_template, send_file, send_from_directory, abort
 import subprocess
 from pathlib import Path
 import json
+import math
 import os
-from collections import Counter, defaultdict
+import shutil
+from collections import Counter
 import matplotlib
-matplotlib.use('Agg')  # For macOS
-import matplotlib.pyplot as plt
+matplotlib.use('Agg')  # Ensure headless rendering, also on macOS
 import io
-import numpy as np
 import requests
 import sys
 from werkzeug.utils import secure_filename
-import textstat
-import re
 import zipfile
-import tempfile
 from datetime import datetime
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')  # Ensure headless rendering
-import hashlib
+import queue
+import time
+from event_store import list_event_files, delete_session, load_positions, parse_time
+from analysis_cache import session_aggregates
+from session_query import query_session, QueryError
+from catalog import list_sessions, forget as forget_sessions
+from heatmap import heatmap_grid, heatmap_png
+from trajectory import player_paths, DEFAULT_POINTS as DEFAULT_PATH_POINTS, ENCODING as PATH_ENCODING
+from live_feed import LiveFeed, LIVE_FEED_PORT
+from metrics import RouteMetrics, json_view as metrics_json, prometheus_text, PROMETHEUS_CONTENT_TYPE, SERVER_STALE_AFTER
+from commands import send_commands, CommandError, CommandRejected, COMMAND_PORT, COMMAND_TIMEOUT
+from jobs import JobManager
+from lang_analysis import ANALYZER_VERSION, find_world_filename, analyze_lang_file as run_lang_file_analysis
+from lang_parser import parse_file
+from lang_cache import LangResultCache
+from world_extract import extract_world, UnsafeArchive
+from batch import find_worlds, run_batch
+from llm import LLMClient, LLMError
+from chunker import chunk_entries, build_prompts
 
 app = Flask(__name__)
 
 # Globals for process tracking
 websocket_process = None
+live_feed = LiveFeed(port=int(os.environ.get("MC_LIVE_FEED_PORT", LIVE_FEED_PORT)))
+route_metrics = RouteMetrics()
+
+LIVE_KEEPALIVE = 3  # Seconds between status pings on an idle live feed
 
-MAX_TOKENS = 4000  # Safe chunk size (adjust based on your model's capacity)
-PLACEHOLDER_PATTERN = r"\{.*?\}|\%s|\§."
+MAX_TOKENS = 4000  # Estimated tokens of NPC text per chunk (adjust based on your model's context)
+LLM_PROMPT_PREFIX = (
+    "You are an expert in education content development.\n"
+    "I will provide a Minecraft Education language file.\n"
+    "Focus ONLY on NPC game text. Ignore placeholders and formatting.\n"
+    "Lines marked \"(repeated N times)\" appear N times in the game.\n\n"
+)
 
 # Directories
 APP_DIR = Path(__file__).resolve().parent
 BASE_DIR = APP_DIR.parent
-DATA_DIR = BASE_DIR / "data"
+DATA_DIR = Path(os.environ.get("MC_DATA_DIR", BASE_DIR / "data"))  # The server started below inherits this
 DATA_DIR.mkdir(exist_ok=True)  # Ensure the parent directory exists
 
 LANGUAGE_TOOL_DIR = DATA_DIR / "languagetooldata"
 LANGUAGE_TOOL_DIR.mkdir(exist_ok=True)  # Create the subdirectory
 
-PLACEHOLDER_PATTERN = r"(%\d*\$?[sd]|\\n|\u00a7.)"
+CACHE_DIR = DATA_DIR / ".cache"  # Derived data that can always be rebuilt
+POSITIONS_CACHE_DIR = CACHE_DIR / "positions"  # Converted positions of legacy sessions
+
+SERVER_PATH = BASE_DIR / "websocket_server" / "server.py"
+
+jobs = JobManager()
+lang_cache = LangResultCache(CACHE_DIR / "lang", ANALYZER_VERSION)
+llm_client = LLMClient(cache_dir=CACHE_DIR / "llm")
+
+# ────────────────────────────── METRICS ────────────────────────────── #
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    # Streaming responses (SSE) are timed to their first byte
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else '(unmatched)'
+        route_metrics.observe(route, request.method, response.status_code, time.perf_counter() - started)
+    return response
 
-def is_just_formatting(value):
-    cleaned = re.sub(PLACEHOLDER_PATTERN, "", value)
-    return not cleaned.strip()
+@app.route('/metrics')
+def metrics_prometheus():
+    # Prometheus text format: dashboard routes plus the ingest server's latest snapshot
+    live_feed.start()
+    return Response(prometheus_text(route_metrics, live_feed.metrics()), mimetype=None, content_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.route('/metrics/json')
+def metrics_json_view():
+    live_feed.start()
+    return jsonify(metrics_json(route_metrics, live_feed.metrics()))
 
 # ────────────────────────────── ROUTES ────────────────────────────── #
 
@@ -89,26 +139,25 @@ def upload_mcworld():
 
     filename = secure_filename(file.filename)
     world_name = Path(filename).stem
+    if not world_name:
+        return jsonify({'error': 'Invalid filename'}), 400
     world_dir = LANGUAGE_TOOL_DIR / world_name
     world_dir.mkdir(parents=True, exist_ok=True)
 
-    # Save the uploaded file temporarily
-    temp_path = LANGUAGE_TOOL_DIR / filename
-    file.save(temp_path)
-
+    # Extract only the language files straight from the upload (?full=1 extracts everything)
+    full = request.values.get("full") == "1"
     try:
-        # Unzip the .mcworld into the world-specific folder
-        with zipfile.ZipFile(temp_path, 'r') as zip_ref:
-            zip_ref.extractall(world_dir)
+        extract_world(file.stream, world_dir, full=full)
 
         # Save the original .mcworld filename for later reporting
         with open(world_dir / "source_world_name.txt", "w", encoding="utf-8") as f:
             f.write(filename)
 
+    except (UnsafeArchive, zipfile.BadZipFile) as e:
+        shutil.rmtree(world_dir, ignore_errors=True)  # Also any members written before a stream ran past its size
+        return jsonify({'error': f'Rejected archive: {e}'}), 400
     except Exception as e:
         return jsonify({'error': f'Failed to unzip: {e}'}), 500
-    finally:
-        temp_path.unlink(missing_ok=True)  # Clean up uploaded zip
 
     # Find all .lang files inside the extracted world folder
     lang_files = []
@@ -119,123 +168,102 @@ def upload_mcworld():
 
     return jsonify({'lang_files': lang_files})
 
-@app.route('/analyze-lang-file', methods=['POST'])
-def analyze_lang_file():
+def _lang_file_request():
+    # Resolves the lang file named in a JSON request, or returns an error response
     data = request.json
     rel_path = data.get("filename")
     if not rel_path:
-        return jsonify({"error": "No file provided"}), 400
+        return None, (jsonify({"error": "No file provided"}), 400)
 
     path = LANGUAGE_TOOL_DIR / rel_path
     if not path.exists():
-        return jsonify({"error": "File not found"}), 404
+        return None, (jsonify({"error": "File not found"}), 404)
+    return path, None
 
-    # Walk up from lang file path to find original .mcworld filename
-    current_dir = path.parent
-    world_filename = "(unknown)"
-    while current_dir != LANGUAGE_TOOL_DIR:
-        candidate = current_dir / "source_world_name.txt"
-        if candidate.exists():
-            with open(candidate, "r", encoding="utf-8") as f:
-                world_filename = f.read().strip()
-            break
-        current_dir = current_dir.parent
-
-    # Read all lines from the lang file
-    with open(path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    # Extract useful lines
-    texts = [line.strip().split("=", 1)[1] for line in lines if "=" in line and not is_just_formatting(line)]
-    joined_text = "\n".join(texts)
-
-    # Compute readability metrics
-    difficult_words_list = textstat.difficult_words_list(joined_text)
-    difficult_word_counts = {word: difficult_words_list.count(word) for word in set(difficult_words_list)}
-
-    analysis = {
-        "Flesch Reading Ease": textstat.flesch_reading_ease(joined_text),
-        "Flesch-Kincaid Grade": textstat.flesch_kincaid_grade(joined_text),
-        "SMOG Index": textstat.smog_index(joined_text),
-        "Dale-Chall Score": textstat.dale_chall_readability_score(joined_text),
-        "Automated Readability Index": textstat.automated_readability_index(joined_text),
-        "Difficult Word Count": len(difficult_words_list),
-        "Line Count": len(texts),
-        "Difficult Words": difficult_word_counts
-    }
-
-    # ── Save main summary .txt report ─────────────────────────────
-    analysis_file = path.parent / f"analysis_{Path(rel_path).stem}.txt"
-    with open(analysis_file, "w", encoding="utf-8") as f:
-        f.write(f"World File: {world_filename}\n")
-        f.write(f"Language File: {Path(rel_path).name}\n")
-        f.write(f"Analysis Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write("-" * 50 + "\n\n")
-        for key, value in analysis.items():
-            if isinstance(value, dict):
-                f.write(f"\n{key}:\n")
-                for word, count in sorted(value.items()):
-                    f.write(f"  - {word} ({count})\n")
-            else:
-                f.write(f"{key}: {value}\n")
-
-    # ── Save per-line reading age .json ──────────────────────────
-    line_analysis = []
-    for i, line in enumerate(lines, 1):
-        if "=" in line and not is_just_formatting(line):
-            try:
-                _, value = line.strip().split("=", 1)
-                reading_age = textstat.flesch_kincaid_grade(value)
-            except Exception:
-                value = ""
-                reading_age = None
-            line_analysis.append({
-                "line": i,
-                "text": value.strip(),
-                "reading_age": reading_age
-            })
-
-    json_path = path.parent / f"line_analysis_{Path(rel_path).stem}.json"
-    with open(json_path, "w", encoding="utf-8") as jf:
-        json.dump(line_analysis, jf, indent=2)
-
-    # ── Generate histogram chart (only reading_age > 0) ──────────
-    filtered_reading_ages = [
-        entry["reading_age"] for entry in line_analysis
-        if isinstance(entry["reading_age"], (int, float)) and entry["reading_age"] > 0
-    ]
-
-    chart_path = path.parent / f"reading_age_distribution_{Path(rel_path).stem}.png"
-    if filtered_reading_ages:
-        plt.figure(figsize=(10, 6))
-        plt.hist(filtered_reading_ages, bins=30, color='orange', edgecolor='black')
-        plt.title("Distribution of Reading Age")
-        plt.xlabel("Reading Age")
-        plt.ylabel("Frequency")
-        plt.savefig(chart_path)
-        plt.close()
-
-    # ── Save lines with reading_age > 16 ─────────────────────────
-    high_reading_lines = [
-        f"Line {entry['line']}: {entry['text']} (Reading Age: {entry['reading_age']})"
-        for entry in line_analysis
-        if isinstance(entry["reading_age"], (int, float)) and entry["reading_age"] > 16
-    ]
-
-    high_reading_path = path.parent / f"above_reading_age_16_{Path(rel_path).stem}.txt"
-    with open(high_reading_path, "w", encoding="utf-8") as f:
-        f.write("Lines with Reading Age > 16\n")
-        f.write("=" * 40 + "\n\n")
-        for line in high_reading_lines:
-            f.write(line + "\n")
+def _report_urls(reports):
+    return {key: f"/download-analysis/{report.relative_to(LANGUAGE_TOOL_DIR)}" for key, report in reports.items()}
+
+@app.route('/analyze-lang-file', methods=['POST'])
+def analyze_lang_file():
+    path, error = _lang_file_request()
+    if error:
+        return error
+
+    world_filename = find_world_filename(path, LANGUAGE_TOOL_DIR)
+    reports = run_lang_file_analysis(path, world_filename, cache=lang_cache)
 
     # ── Return file URLs for frontend download ───────────────────
-    return jsonify({
-        "file_url": f"/download-analysis/{analysis_file.relative_to(LANGUAGE_TOOL_DIR)}",
-        "json_url": f"/download-analysis/{json_path.relative_to(LANGUAGE_TOOL_DIR)}",
-        "chart_url": f"/download-analysis/{chart_path.relative_to(LANGUAGE_TOOL_DIR)}",
-        "high_reading_url": f"/download-analysis/{high_reading_path.relative_to(LANGUAGE_TOOL_DIR)}"
-    })
+    return jsonify(_report_urls(reports))
+
+@app.route('/analyze-lang-file/jobs', methods=['POST'])
+def start_lang_analysis_job():
+    # Same analysis as /analyze-lang-file, run in the background; poll /jobs/<id>
+    path, error = _lang_file_request()
+    if error:
+        return error
+
+    def run(job, path):
+        world_filename = find_world_filename(path, LANGUAGE_TOOL_DIR)
+        return _report_urls(run_lang_file_analysis(path, world_filename, progress=job.update, cache=lang_cache))
+
+    job = jobs.submit("lang-analysis", run, path)
+    return jsonify(job.to_dict()), 202
+
+@app.route('/batch-analyze', methods=['POST'])
+def batch_analyze():
+    # Many worlds at once: multipart 'files', or JSON {"directory": <folder under languagetooldata>}
+    batch_dir = LANGUAGE_TOOL_DIR / f"batch_{datetime.now().strftime('%Y-%m-%dT%H-%M-%S-%f')}"
+    uploads = request.files.getlist('files')
+    if uploads:
+        batch_dir.mkdir(parents=True)
+        worlds = []
+        for file in uploads:
+            world_path = batch_dir / secure_filename(file.filename)
+            file.save(world_path)
+            worlds.append(world_path)
+    else:
+        directory = (request.get_json(silent=True) or {}).get('directory')
+        if not directory:
+            return jsonify({'error': 'No worlds provided'}), 400
+        source = (LANGUAGE_TOOL_DIR / directory).resolve()
+        if LANGUAGE_TOOL_DIR.resolve() not in source.parents or not source.is_dir():
+            return jsonify({'error': 'Directory not found'}), 404
+        worlds = find_worlds([source])
+        batch_dir.mkdir(parents=True)
+
+    worlds = [w for w in worlds if w.suffix == '.mcworld']
+    if not worlds:
+        return jsonify({'error': 'No .mcworld files found'}), 400
+
+    def run(job, worlds):
+        try:
+            summary = run_batch(worlds, progress=job.update)
+        finally:
+            for world in worlds:
+                if world.parent == batch_dir:
+                    world.unlink(missing_ok=True)  # Uploaded copies are no longer needed
+        summary_path = batch_dir / "summary.json"
+        with open(summary_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        summary["summary_url"] = f"/download-analysis/{summary_path.relative_to(LANGUAGE_TOOL_DIR).as_posix()}"
+        return summary
+
+    job = jobs.submit("batch-analysis", run, worlds)
+    return jsonify(job.to_dict()), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
 
 @app.route('/download-analysis/<path:filename>')
 def download_analysis_file(filename):
@@ -248,6 +276,7 @@ def download_analysis_file(filename):
 def start_server():
     global websocket_process
     try:
+        live_feed.start()  # Listen before the server starts publishing
         websocket_process = subprocess.Popen([sys.executable, str(SERVER_PATH)])
         return jsonify({'status': 'WebSocket server started.'})
     except Exception as e:
@@ -265,32 +294,104 @@ def stop_server():
 
 @app.route('/clear-json-data', methods=['POST'])
 def clear_json_data():
+    # Sessions a server is still writing to are kept: deleting them would leave it writing to unlinked files
+    live = {session["name"] for session in list_sessions(DATA_DIR) if session["live"]}
     deleted = []
-    for file in DATA_DIR.glob("*.json"):
+    for file in sorted(set(DATA_DIR.glob("*.json")) | set(list_event_files(DATA_DIR))):
+        if file.name in live:
+            continue
         try:
-            file.unlink()
+            delete_session(file)
             deleted.append(file.name)
         except Exception as e:
+            forget_sessions(DATA_DIR, deleted)
             return jsonify({'status': f'Failed to delete {file.name}: {e}'}), 500
-    return jsonify({'status': f'Deleted {len(deleted)} JSON file(s).'}) 
+    forget_sessions(DATA_DIR, deleted)
+    kept = f' Kept {len(live)} live session(s).' if live else ''
+    return jsonify({'status': f'Deleted {len(deleted)} JSON file(s).{kept}'})
 
 @app.route('/status')
 def status():
-    global websocket_process
-    running = websocket_process is not None and websocket_process.poll() is None
-    return jsonify({'websocket_running': running})
+    return jsonify({'websocket_running': websocket_running()})
+
+@app.route('/send-command', methods=['POST'])
+def send_command():
+    # Runs Minecraft commands on every connected client (or those listed by address or player name)
+    # in one pipelined round-trip: {"commands": ["say hi", ...]} or {"command": "..."}, "timeout", "clients"
+    data = request.get_json(silent=True) or {}
+    command_lines = data.get("commands") or ([data["command"]] if data.get("command") else [])
+    if not isinstance(command_lines, list) or not command_lines:
+        return jsonify({"error": "No command provided"}), 400
+    timeout = data.get("timeout", COMMAND_TIMEOUT)
+    if not isinstance(timeout, (int, float)):
+        return jsonify({"error": "timeout must be a number of seconds"}), 400
+
+    live_feed.start()  # Server processes announce their command ports with their metrics
+    ports = live_feed.command_ports(SERVER_STALE_AFTER) or [int(os.environ.get("MC_COMMAND_PORT", COMMAND_PORT))]
+    try:
+        result = send_commands(ports, command_lines, timeout, data.get("clients"))
+    except CommandRejected as e:
+        return jsonify({"error": str(e)}), 400
+    except CommandError as e:
+        return jsonify({"error": f"Commands unavailable: {e}"}), 503
+    return jsonify(result)
+
+def websocket_running():
+    return websocket_process is not None and websocket_process.poll() is None
+
+def sse_message(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/live-feed')
+def live_feed_stream():
+    # Server-Sent Events: a snapshot on connect, then the server's per-second deltas
+    live_feed.start()
+    q, snapshot = live_feed.subscribe()
+
+    def stream():
+        try:
+            snapshot['websocket_running'] = websocket_running()
+            snapshot['error'] = live_feed.error
+            yield sse_message('snapshot', snapshot)
+            while True:
+                try:
+                    update = q.get(timeout=LIVE_KEEPALIVE)
+                except queue.Empty:
+                    yield sse_message('status', {'websocket_running': websocket_running()})
+                    continue
+                yield sse_message('update', update)
+        finally:
+            live_feed.unsubscribe(q)
+
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
 
 @app.route("/list-files", methods=["GET"])
 def list_files():
-    files = [f.name for f in DATA_DIR.glob("events_*.json")]
-    lang_files = [f.name for f in (DATA_DIR / "languagetooldata").glob("*.lang")]
-    return jsonify({"files": files + lang_files})
+    # Sessions come from the catalog, optionally filtered by player, event type and time range
+    try:
+        since = parse_time(request.args.get("since"))
+        until = parse_time(request.args.get("until"))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
+    player = request.args.get("player")
+    event = request.args.get("event")
+    sessions = list_sessions(DATA_DIR, player=player, event=event, since=since, until=until)
+
+    files = [session["name"] for session in sessions]
+    if player is None and event is None and since is None and until is None:
+        files += [f.name for f in (DATA_DIR / "languagetooldata").glob("*.lang")]
+    return jsonify({"files": files, "sessions": sessions})
 
 @app.route("/download/<path:filename>", methods=['GET'])
 def download_file(filename):
     directory = LANGUAGE_TOOL_DIR  # Ensure this points to the directory where JSON files are stored
     return send_from_directory(directory, filename, as_attachment=True)
 
+def _inside_data_dir(path):
+    # Session names come from the query string; "../" must not reach outside DATA_DIR
+    resolved, root = path.resolve(), DATA_DIR.resolve()
+    return resolved != root and resolved.is_relative_to(root)
+
 @app.route("/analyze", methods=["GET"])
 def analyze():
     filename = request.args.get("file")
@@ -298,98 +399,124 @@ def analyze():
         return jsonify({"error": "No file provided"}), 400
 
     path = DATA_DIR / filename
+    if not _inside_data_dir(path):
+        return jsonify({"error": "Invalid file"}), 400
     if not path.exists():
         return jsonify({"error": "File not found"}), 404
 
-    with path.open() as f:
-        events = json.load(f)
-
-    event_types = Counter()
-    join_count = 0
-    chat_count = 0
-    join_timestamps = []
-    positions = defaultdict(list)
-
-    for e in events:
-        event_name = e.get("event")
-        event_types[event_name] += 1
-
-        if event_name == "PlayerJoin":
-            join_count += 1
-            join_timestamps.append(e.get("timestamp"))
-        elif event_name == "PlayerMessage":
-            chat_count += 1
-        elif event_name == "PlayerTransform":
-            player = e.get("body", {}).get("player", {})
-            name = player.get("name", "Unknown")
-            pos = player.get("position", {})
-            x = round(pos.get("x", 0))
-            z = round(pos.get("z", 0))
-            positions[name].append((x, z))
+    # Simplified paths: a point budget per player and/or a tolerance in blocks
+    try:
+        points = request.args.get("points", default=DEFAULT_PATH_POINTS, type=int)
+        if points < 2:
+            raise ValueError("points must be at least 2")
+        tolerance = request.args.get("tolerance", type=float)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
+
+    # Only events appended since the last request are parsed
+    aggregates = session_aggregates(CACHE_DIR / "analyze", path)
+    event_types = Counter(aggregates["event_types"])
+    total_events = aggregates["total_events"]
+
+    records, names = load_positions(path, POSITIONS_CACHE_DIR)
+    if len(records):
+        event_types["PlayerTransform"] = len(records)
+        total_events += len(records)
+
+    positions, path_stats = player_paths(path, points=points, tolerance=tolerance,
+                                         positions_cache=POSITIONS_CACHE_DIR)
 
     return jsonify({
-        "joins": join_count,
-        "messages": chat_count,
-        "total_events": len(events),
-        "join_timestamps": join_timestamps,
+        "joins": aggregates["joins"],
+        "messages": aggregates["messages"],
+        "total_events": total_events,
+        "join_timestamps": aggregates["join_timestamps"],
         "event_types": dict(event_types),
-        "positions": dict(positions)
+        "positions": positions,
+        "positions_encoding": PATH_ENCODING,
+        "position_stats": path_stats
     })
 
-@app.route("/generate-heatmap")
-def generate_heatmap():
+@app.route("/query", methods=["GET"])
+def query():
+    # Aggregates over a time window of a session: counts per event type and
+    # player, rates, optional time buckets and a few of the matching events
     filename = request.args.get("file")
     if not filename:
         return jsonify({"error": "No file provided"}), 400
 
     path = DATA_DIR / filename
+    if not _inside_data_dir(path):
+        return jsonify({"error": "Invalid file"}), 400
     if not path.exists():
         return jsonify({"error": "File not found"}), 404
 
-    with path.open() as f:
-        events = json.load(f)
+    try:
+        start = parse_time(request.args.get("start"))
+        end = parse_time(request.args.get("end"))
+        bucket = request.args.get("bucket", type=float)
+        if bucket is not None and bucket <= 0:
+            raise ValueError("bucket must be a positive number of seconds")
+        limit = request.args.get("limit", default=0, type=int)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
 
-    positions = []
-    for e in events:
-        if e.get("event") == "PlayerTransform":
-            player = e.get("body", {}).get("player", {})
-            pos = player.get("position", {})
-            x = round(pos.get("x", 0))
-            z = round(pos.get("z", 0))
-            positions.append((x, z))
+    try:
+        result = query_session(CACHE_DIR / "query", path, start=start, end=end,
+                               player=request.args.get("player"), event=request.args.get("event"),
+                               bucket=bucket, limit=limit, positions_cache=POSITIONS_CACHE_DIR)
+    except QueryError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result)
 
-    if not positions:
-        return jsonify({"error": "No movement data"}), 400
+@app.route("/generate-heatmap")
+def generate_heatmap():
+    filename = request.args.get("file")
+    if not filename:
+        return jsonify({"error": "No file provided"}), 400
 
-    xs, zs = zip(*positions)
-    heatmap, xedges, yedges = np.histogram2d(xs, zs, bins=100)
-    extent = [xedges[0], xedges[-1], yedges[0], yedges[-1]]
-
-    fig, ax = plt.subplots()
-    cax = ax.imshow(
-        heatmap.T,
-        extent=extent,
-        origin='lower',
-        cmap='hot',
-        interpolation='nearest'
-    )
-    ax.set_title('Player Movement Heatmap')
-    ax.set_xlabel('X')
-    ax.set_ylabel('Z')
-    fig.colorbar(cax, ax=ax, label='Movement Density')
-
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    plt.close(fig)
-    buf.seek(0)
-
-    return send_file(buf, mimetype='image/png')
+    path = DATA_DIR / filename
+    if not _inside_data_dir(path):
+        return jsonify({"error": "Invalid file"}), 400
+    if not path.exists():
+        return jsonify({"error": "File not found"}), 404
+
+    # Optional zoom/filter parameters: bounds, bin size (blocks), player and time window
+    try:
+        bounds = None
+        if request.args.get("bounds"):
+            bounds = tuple(float(v) for v in request.args["bounds"].split(","))
+            if len(bounds) != 4:
+                raise ValueError("bounds must be xmin,xmax,zmin,zmax")
+            xmin, xmax, zmin, zmax = bounds
+            if not all(math.isfinite(v) for v in bounds) or xmin >= xmax or zmin >= zmax:
+                raise ValueError("bounds must be finite, with each minimum below its maximum")
+        bin_size = request.args.get("bin", type=float)
+        if bin_size is not None and not (math.isfinite(bin_size) and bin_size > 0):
+            raise ValueError("bin must be a positive number of blocks")
+        start = parse_time(request.args.get("start"))
+        end = parse_time(request.args.get("end"))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
+    params = {"bounds": bounds, "bin_size": bin_size, "player": request.args.get("player"), "start": start, "end": end}
+
+    if request.args.get("format") == "json":
+        result = heatmap_grid(path, positions_cache=POSITIONS_CACHE_DIR, **params)
+        if result is None:
+            return jsonify({"error": "No movement data"}), 400
+        counts, extent, size = result
+        return jsonify({"extent": extent, "bin": size, "counts": counts.tolist()})
+
+    png = heatmap_png(path, positions_cache=POSITIONS_CACHE_DIR, **params)
+    if png is None:
+        return jsonify({"error": "No movement data"}), 400
+    return send_file(io.BytesIO(png), mimetype='image/png')
 
 @app.route("/connection-info", methods=["GET"])
 def connection_info():
     try:
         public_ip = requests.get("https://api.ipify.org").text
-        port = 19131
+        port = int(os.environ.get("MC_SERVER_PORT", 19131))
         connection_string = f"/connect {public_ip}:{port}"
         return jsonify({"connection_string": connection_string})
     except Exception as e:
@@ -399,125 +526,100 @@ def connection_info():
 def ai_lang_tool():
     return render_template('ai_lang_tool.html')
 
-@app.route("/run-lang-analysis", methods=["POST"])
-def run_lang_analysis():
+def _lang_llm_request():
+    # Builds the objectives/grammar prompts for the lang file in a JSON request,
+    # interleaved per chunk, or returns an error response
     data = request.json
     filename = data.get("filename")
     model = data.get("model", "phi4")  # Allow user to specify model, default to phi4
 
     if not filename:
-        return jsonify({"error": "Filename is required"}), 400
+        return None, None, (jsonify({"error": "Filename is required"}), 400)
 
     file_path = LANGUAGE_TOOL_DIR / filename
     if not file_path.exists():
-        return jsonify({"error": "File not found"}), 404
+        return None, None, (jsonify({"error": "File not found"}), 404)
 
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            file_content = f.read()
+        entries = [(entry.key, entry.cleaned) for entry in parse_file(file_path) if entry.is_text]
     except Exception as e:
-        return jsonify({"error": f"Failed to read file: {e}"}), 500
-
-    # Extract only dialogue-related text
-    npc_texts = []
-    for line in file_content.splitlines():
-        if "=" in line and not is_just_formatting(line):
-            key, value = line.split("=", 1)
-            key_lower = key.lower()
-            if key_lower.startswith("dialogue.") or key_lower.startswith("npc.") or "dialogue" in key_lower:
-                cleaned_value = re.sub(PLACEHOLDER_PATTERN, "", value).strip()
-                if cleaned_value:
-                    npc_texts.append(cleaned_value)
+        return None, None, (jsonify({"error": f"Failed to read file: {e}"}), 500)
+
+    # Extract only dialogue-related text, keeping keys so related lines stay together
+    npc_entries = [(key, text) for key, text in entries
+                   if key.lower().startswith(("dialogue.", "npc.")) or "dialogue" in key.lower()]
 
     # If no NPC text extracted, fallback to analyzing ALL meaningful lines
-    if not npc_texts:
-        for line in file_content.splitlines():
-            if "=" in line and not is_just_formatting(line):
-                _, value = line.split("=", 1)
-                cleaned_value = re.sub(PLACEHOLDER_PATTERN, "", value).strip()
-                if cleaned_value:
-                    npc_texts.append(cleaned_value)
-
-    # If too large, break into chunks
-    npc_chunks = []
-    current_chunk = []
-    current_length = 0
-
-    for text in npc_texts:
-        text_length = len(text.split())
-        if current_length + text_length > MAX_TOKENS:
-            npc_chunks.append("\n".join(current_chunk))
-            current_chunk = [text]
-            current_length = text_length
-        else:
-            current_chunk.append(text)
-            current_length += text_length
-
-    if current_chunk:
-        npc_chunks.append("\n".join(current_chunk))
-
-    final_report = []
-
-    for idx, chunk in enumerate(npc_chunks):
-        prompt = (
-            "You are an expert in education content development.\n"
-            "I will provide a Minecraft Education language file.\n"
-            "Focus ONLY on NPC game text. Ignore placeholders and formatting.\n"
-            "Your tasks are:\n"
-            "States the learning objectives of this game, given the NPC game text.\n"
-            f"Here is the extracted NPC text chunk ({idx+1}/{len(npc_chunks)}):\n\n{chunk}\n\n"
-            "Please write a detailed analysis report."
-        )
+    if not npc_entries:
+        npc_entries = entries
+
+    # Pack into chunks by estimated tokens; repeated lines are sent once
+    npc_chunks = chunk_entries(npc_entries, MAX_TOKENS)
+
+    # Every prompt opens with the same instructions and its chunk, so both passes
+    # over a chunk share a long prefix that Ollama can reuse from its cache
+    objectives_prompts = build_prompts(LLM_PROMPT_PREFIX, npc_chunks,
+                                       "Your task: state the learning objectives of this game, given the NPC game text. "
+                                       "Please write a detailed analysis report.")
+    grammar_prompts = build_prompts(LLM_PROMPT_PREFIX, npc_chunks,
+                                    "Your task: highlight grammar and readability issues, with examples. "
+                                    "Please write a detailed analysis report.")
+
+    # The two prompts for a chunk are queued back to back so the shared prefix is still cached
+    prompts = [prompt for pair in zip(objectives_prompts, grammar_prompts) for prompt in pair]
+    return model, prompts, None
+
+def _combine_llm_outputs(outputs):
+    # Combine all chunk analyses: even prompts are Part 1, odd prompts Part 2
+    full_output1 = "\n\n".join(outputs[0::2])
+    full_output2 = "\n\n".join(outputs[1::2])
+    return "Part 1:\n\n" + full_output1 + "\n\nPart 2:\n\n" + full_output2
 
-        try:
-            process = subprocess.run(
-                ["ollama", "run", model],
-                input=prompt.encode("utf-8"),
-                text=False,
-                capture_output=True,
-                check=True
-            )
-            output = process.stdout.decode("utf-8").strip()
-            final_report.append(output)
-        except subprocess.CalledProcessError as e:
-            return jsonify({"error": f"Ollama model error: {e.stderr.decode('utf-8').strip()}"}), 500
-
-    # Combine all chunk analyses
-    full_output1 = "\n\n".join(final_report)
-    
-    final_report = []
-
-    for idx, chunk in enumerate(npc_chunks):
-        prompt = (
-            "You are an expert in education content development.\n"
-            "I will provide a Minecraft Education language file.\n"
-            "Focus ONLY on NPC game text. Ignore placeholders and formatting.\n"
-            "Your tasks are:\n"
-            "- Highlight grammar and readability issues, with examples.\n\n"
-            f"Here is the extracted NPC text chunk ({idx+1}/{len(npc_chunks)}):\n\n{chunk}\n\n"
-            "Please write a detailed analysis report."
-        )
+@app.route("/run-lang-analysis", methods=["POST"])
+def run_lang_analysis():
+    model, prompts, error = _lang_llm_request()
+    if error:
+        return error
 
+    # Both passes and all chunks run concurrently (up to LLM_PARALLELISM) on the Ollama server
+    try:
+        outputs = llm_client.generate_many(model, prompts)
+    except LLMError as e:
+        return jsonify({"error": f"Ollama model error: {e}"}), 500
+
+    return jsonify({"output": _combine_llm_outputs(outputs)})
+
+@app.route("/run-lang-analysis/stream", methods=["POST"])
+def run_lang_analysis_stream():
+    # Server-Sent Events over a POST response: tokens from every chunk as they
+    # are generated, per-chunk progress, then the combined report
+    model, prompts, error = _lang_llm_request()
+    if error:
+        return error
+
+    def stream():
+        yield sse_message('start', {'chunks': len(prompts) // 2, 'prompts': len(prompts)})
+        outputs = [None] * len(prompts)
+        done = 0
+        events = llm_client.generate_stream(model, prompts)
         try:
-            process = subprocess.run(
-                ["ollama", "run", model],
-                input=prompt.encode("utf-8"),
-                text=False,
-                capture_output=True,
-                check=True
-            )
-            output = process.stdout.decode("utf-8").strip()
-            final_report.append(output)
-        except subprocess.CalledProcessError as e:
-            return jsonify({"error": f"Ollama model error: {e.stderr.decode('utf-8').strip()}"}), 500
-
-            # Combine all chunk analyses
-    
-    full_output2 = "\n\n".join(final_report)
-    
-    full_output = "Part 1:\n\n" + full_output1 + "\n\nPart 2:\n\n" + full_output2
-
-    return jsonify({"output": full_output})
+            for kind, index, text in events:
+                part, chunk = index % 2 + 1, index // 2 + 1
+                if kind == 'token':
+                    yield sse_message('token', {'part': part, 'chunk': chunk, 'text': text})
+                elif kind == 'error':
+                    yield sse_message('error', {'error': f"Ollama model error: {text}"})
+                    return
+                else:
+                    outputs[index] = text
+                    done += 1
+                    yield sse_message('progress', {'part': part, 'chunk': chunk, 'done': done, 'total': len(prompts)})
+            yield sse_message('result', {'output': _combine_llm_outputs(outputs)})
+        finally:
+            events.close()  # Stops generation if the browser went away
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/unpack-and-json', methods=['POST'])
 def unpack_and_json():
@@ -530,17 +632,14 @@ def unpack_and_json():
 
     filename = secure_filename(file.filename)
     world_name = Path(filename).stem
+    if not world_name:
+        return jsonify({'error': 'Invalid filename'}), 400
     world_dir = LANGUAGE_TOOL_DIR / world_name
     world_dir.mkdir(parents=True, exist_ok=True)
 
-    # Save the uploaded file temporarily
-    temp_path = LANGUAGE_TOOL_DIR / filename
-    file.save(temp_path)
-
     try:
-        # Unzip the .mcworld into the world-specific folder
-        with zipfile.ZipFile(temp_path, 'r') as zip_ref:
-            zip_ref.extractall(world_dir)
+        # Extract only the language files straight from the upload
+        extract_world(file.stream, world_dir)
 
         # Find the largest en_US.lang file
         lang_files = list(world_dir.rglob('*en_US.lang'))
@@ -551,10 +650,10 @@ def unpack_and_json():
 
         # Convert the largest en_US.lang file to JSON
         json_output_path = world_dir / f"{world_name}_en_US.json"
-        with open(largest_file, 'r', encoding='utf-8') as lang_file, open(json_output_path, 'w', encoding='utf-8') as json_file:
-            json_data = {}
-            for line_number, line in enumerate(lang_file, start=1):
-                json_data[line_number] = line.strip()
+        with open(json_output_path, 'w', encoding='utf-8') as json_file:
+            # Line number -> "key=value", as ai_materials_gen.html expects; comments are left out
+            json_data = {entry.line: f"{entry.key}={entry.value}" for entry in parse_file(largest_file)
+                         if not entry.is_comment}
             json.dump(json_data, json_file, indent=4)
 
         # Return the relative path for the JSON file
@@ -564,10 +663,11 @@ def unpack_and_json():
             'json_file': f"/download/{relative_json_path.as_posix()}",
             'lang_files': [{'name': f.name, 'size': round(f.stat().st_size / 1024, 2)} for f in lang_files]
         })
+    except (UnsafeArchive, zipfile.BadZipFile) as e:
+        shutil.rmtree(world_dir, ignore_errors=True)  # Also any members written before a stream ran past its size
+        return jsonify({'error': f'Rejected archive: {e}'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        temp_path.unlink(missing_ok=True)  # Clean up uploaded zip
 
 # ────────────────────────────── RUN ────────────────────────────── #
 
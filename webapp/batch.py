@@ -0,0 +1,146 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from lang_analysis import extract_entries
+from readability import line_grades, text_metrics
+from world_extract import read_world_texts
+
+# Batch readability analysis for many .mcworld files.
+#
+# Each world is read straight from its archive (language files only) and
+# scored in its own worker process; at most `workers` worlds are in flight
+# at once. The combined summary has one row of metrics per world, the
+# difficult words shared between worlds, and the batch throughput.
+#
+# Also usable from the command line:
+#   python batch.py path/to/worlds/ other.mcworld --workers 4 --output summary.json
+
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+HIGH_READING_AGE = 16
+
+
+def find_worlds(paths):
+    worlds = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            worlds.extend(sorted(path.rglob("*.mcworld")))
+        elif path.suffix == ".mcworld":
+            worlds.append(path)
+    return worlds
+
+
+def _pick_lang_texts(texts):
+    # The dashboard reports on en_US; fall back to every language file
+    english = {name: text for name, text in texts.items() if name.endswith("en_US.lang")}
+    return english or {name: text for name, text in texts.items() if name.endswith(".lang")}
+
+
+def analyze_world(path):
+    started = time.perf_counter()
+    lang_texts = _pick_lang_texts(read_world_texts(path))
+
+    values = []
+    for text in lang_texts.values():
+        values.extend(value for _, value in extract_entries(text))
+    joined_text = "\n".join(values)
+
+    metrics = text_metrics(joined_text) if values else {}
+    reading_ages = [age for age in line_grades(values) if isinstance(age, (int, float))]
+    difficult_words = metrics.pop("Difficult Words", {})
+
+    return {
+        "world": path.name,
+        "lang_files": sorted(lang_texts),
+        "line_count": len(values),
+        "metrics": metrics,
+        "mean_line_reading_age": round(sum(reading_ages) / len(reading_ages), 2) if reading_ages else None,
+        "lines_above_16": sum(1 for age in reading_ages if age > HIGH_READING_AGE),
+        "difficult_words": difficult_words,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def run_batch(worlds, workers=DEFAULT_WORKERS, progress=None):
+    started = time.perf_counter()
+    results, errors = [], []
+
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(worlds) or 1))) as pool:
+        futures = {pool.submit(analyze_world, world): world for world in worlds}
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                world = futures[future]
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    errors.append({"world": world.name, "error": str(e)})
+                if progress:
+                    progress(done / len(worlds), f"Analyzed {done}/{len(worlds)} worlds")
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    elapsed = time.perf_counter() - started
+    results.sort(key=lambda r: r["world"])
+    return {
+        "worlds": results,
+        "errors": errors,
+        "shared_difficult_words": shared_difficult_words(results),
+        "elapsed_seconds": round(elapsed, 3),
+        "worlds_per_minute": round(len(worlds) / elapsed * 60, 2) if elapsed > 0 else None,
+        "workers": workers,
+    }
+
+
+def shared_difficult_words(results, limit=100):
+    # Difficult words used in more than one world, most widespread first
+    worlds_using = Counter()
+    occurrences = Counter()
+    for result in results:
+        worlds_using.update(result["difficult_words"].keys())
+        occurrences.update(result["difficult_words"])
+    shared = [word for word, count in worlds_using.items() if count > 1]
+    shared.sort(key=lambda word: (-worlds_using[word], -occurrences[word], word))
+    return [{"word": word, "worlds": worlds_using[word], "occurrences": occurrences[word]} for word in shared[:limit]]
+
+
+def _print_table(summary):
+    print(f"{'World':40} {'Lines':>7} {'FK grade':>9} {'Ease':>7} {'>16':>5} {'Difficult':>9}")
+    for row in summary["worlds"]:
+        metrics = row["metrics"]
+        print(f"{row['world'][:40]:40} {row['line_count']:>7} {metrics.get('Flesch-Kincaid Grade', '-'):>9} "
+              f"{metrics.get('Flesch Reading Ease', '-'):>7} {row['lines_above_16']:>5} {metrics.get('Difficult Word Count', '-'):>9}")
+    for error in summary["errors"]:
+        print(f"{error['world'][:40]:40} failed: {error['error']}")
+    print(f"\n{len(summary['worlds'])} world(s) in {summary['elapsed_seconds']}s "
+          f"({summary['worlds_per_minute']} worlds/minute, {summary['workers']} workers)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Readability summary for many .mcworld files")
+    parser.add_argument("paths", nargs="+", help=".mcworld files or directories containing them")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--output", help="Write the full summary as JSON to this file")
+    args = parser.parse_args(argv)
+
+    worlds = find_worlds(args.paths)
+    if not worlds:
+        print("No .mcworld files found", file=sys.stderr)
+        return 1
+
+    summary = run_batch(worlds, args.workers)
+    _print_table(summary)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from event_store import list_event_files, session_shards, iter_events, load_positions
+
+# Reader for the session catalog (DATA_DIR/catalog.sqlite).
+#
+# The WebSocket server keeps the catalog up to date as it ingests (see
+# websocket_server/catalog.py): per-session time range, totals, players,
+# counts per event type, and time checkpoints with the positions.bin record
+# index reached at each. Listing and filtering sessions is
+# then a couple of SQL queries. Sessions recorded before the catalog existed
+# are scanned once and added on first listing; rows for deleted sessions are
+# dropped at the same time.
+#
+# Checkpoints let analytics over a time window skip the part of a session
+# recorded before it: seek_positions() slices the memory-mapped position
+# records. Journaled events are found through the time index (session_query.py),
+# which holds each one's byte offset.
+#
+# Each worker of a sharded session has its own rows, named
+# "<session>/shard_NN"; listings add them up into one session.
+
+CATALOG_FILE = "catalog.sqlite"
+LIVE_TIMEOUT = 30.0          # A live row not updated for this long is from a server that died
+CHECKPOINT_INTERVAL = 60.0   # For scanned sessions, as the server uses
+
+# Schema, defined once next to the server's writer
+SCHEMA_FILE = Path(__file__).resolve().parent.parent / "websocket_server" / "catalog_schema.sql"
+SCHEMA = SCHEMA_FILE.read_text(encoding="utf-8")
+
+_sync_lock = threading.Lock()
+
+
+def connect(data_dir):
+    db = sqlite3.connect(data_dir / CATALOG_FILE, timeout=10)
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA journal_mode=WAL")
+    db.executescript(SCHEMA)
+    return db
+
+
+def connect_readonly(data_dir):
+    # For lookups on the request path: no WAL switch or schema script, so no write lock to wait for
+    return sqlite3.connect((data_dir / CATALOG_FILE).resolve().as_uri() + "?mode=ro", uri=True, timeout=10)
+
+
+# ── Listing ──────────────────────────────────────────────────────
+
+def _session_of(name):
+    # A sharded session's workers each have a row, named "<session>/shard_NN"
+    return name.split("/", 1)[0]
+
+
+def sync(data_dir):
+    # Adds sessions on disk the catalog doesn't know, drops rows for sessions that are gone
+    with _sync_lock, closing(connect(data_dir)) as db:
+        on_disk = {path.name: path for path in list_event_files(data_dir)}
+        known = {_session_of(row["name"]) for row in db.execute("SELECT name FROM sessions")}
+        for name in sorted(set(on_disk) - known):
+            _backfill(db, on_disk[name])
+        _forget(db, known - set(on_disk))
+
+
+def forget(data_dir, names):
+    with closing(connect(data_dir)) as db:
+        _forget(db, names)
+
+
+def _forget(db, names):
+    # Deletes sessions and all of their shards
+    with db:
+        for table, column in (("sessions", "name"), ("session_players", "session"),
+                              ("session_events", "session"), ("checkpoints", "session")):
+            db.executemany(f"DELETE FROM {table} WHERE {column} = ? OR substr({column}, 1, length(?) + 1) = ? || '/'",
+                           [(name, name, name) for name in names])
+
+
+def _merged_sessions(db, now):
+    # One entry per session, adding up the rows of its shards
+    sessions = {}
+    for row in db.execute("SELECT * FROM sessions"):
+        name = _session_of(row["name"])
+        live = bool(row["live"]) and now - (row["updated"] or 0) < LIVE_TIMEOUT
+        session = sessions.get(name)
+        if session is None:
+            sessions[name] = {"name": name, "start": row["start_time"], "end": row["end_time"], "live": live,
+                              "events": row["events"], "positions": row["positions"],
+                              "shards": int(row["name"] != name), "players": {}, "event_counts": {}}
+            continue
+        if row["start_time"] is not None:
+            session["start"] = row["start_time"] if session["start"] is None else min(session["start"], row["start_time"])
+        if row["end_time"] is not None:
+            session["end"] = row["end_time"] if session["end"] is None else max(session["end"], row["end_time"])
+        session["live"] = session["live"] or live
+        session["events"] += row["events"]
+        session["positions"] += row["positions"]
+        session["shards"] += int(row["name"] != name)
+
+    for row in db.execute("SELECT * FROM session_players ORDER BY first_seen"):
+        session = sessions.get(_session_of(row["session"]))
+        if session is not None:
+            _seen(session["players"], row["player"], row["first_seen"], row["last_seen"], row["events"])
+    for row in db.execute("SELECT * FROM session_events"):
+        session = sessions.get(_session_of(row["session"]))
+        if session is not None:
+            counts = session["event_counts"]
+            counts[row["event"]] = counts.get(row["event"], 0) + row["count"]
+
+    for session in sessions.values():
+        session["players"] = {player: {"first_seen": first, "last_seen": last, "events": events}
+                              for player, (first, last, events) in session["players"].items()}
+    return sessions
+
+
+def list_sessions(data_dir, player=None, event=None, since=None, until=None, now=None):
+    # Sessions overlapping [since, until), optionally with a given player or event type, oldest first
+    sync(data_dir)
+    now = now if now is not None else datetime.now().timestamp()
+    with closing(connect(data_dir)) as db:
+        sessions = _merged_sessions(db, now)
+
+    matches = []
+    for name in sorted(sessions):
+        session = sessions[name]
+        if player is not None and player not in session["players"]:
+            continue
+        if event is not None and not session["event_counts"].get(event):
+            continue
+        if since is not None and (session["end"] is None or session["end"] < since):
+            continue
+        if until is not None and (session["start"] is None or session["start"] >= until):
+            continue
+        matches.append(session)
+    return matches
+
+
+# ── Seeking ──────────────────────────────────────────────────────
+
+def checkpoint(path, t):
+    # positions.bin record index of the latest checkpoint at or before t, or None
+    if t is None or not (path.parent / CATALOG_FILE).exists():
+        return None
+    try:
+        with closing(connect_readonly(path.parent)) as db:
+            row = db.execute("SELECT position_index FROM checkpoints "
+                             "WHERE session = ? AND t <= ? ORDER BY t DESC LIMIT 1", (path.name, t)).fetchone()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
+
+
+def seek_positions(path, records, start):
+    # Position records from the checkpoint before `start`; every record cut off is earlier than start
+    if session_shards(path):
+        # Merged shards are sorted by time already
+        return records[int(np.searchsorted(records["t"], start, side="left")):]
+    found = checkpoint(path, start)
+    if found is None:
+        return records
+    return records[min(found, len(records)):]
+
+
+# ── Backfill ─────────────────────────────────────────────────────
+
+def _event_time(event):
+    timestamp = event.get("timestamp")
+    return datetime.fromisoformat(timestamp).timestamp() if timestamp else None
+
+
+def _seen(players, name, first, last, count):
+    # players: name -> [first seen, last seen, events]
+    entry = players.setdefault(name, [None, None, 0])
+    if first is not None:
+        entry[0] = first if entry[0] is None else min(entry[0], first)
+    if last is not None:
+        entry[1] = last if entry[1] is None else max(entry[1], last)
+    entry[2] += count
+
+
+def _backfill(db, path):
+    name = path.name
+    event_counts, players = {}, {}
+    times = []
+    events = 0
+
+    for event in iter_events(path):
+        if not isinstance(event, dict):
+            continue
+        try:
+            t = _event_time(event)
+        except (ValueError, TypeError):
+            t = None
+        event_name = event.get("event")
+        if event_name == "PlayerTransform":
+            continue  # Counted from the position records below
+        events += 1
+        event_counts[event_name] = event_counts.get(event_name, 0) + 1
+        body = event.get("body") or {}
+        player = (body.get("player") or {}).get("name") or body.get("sender")
+        if player:
+            _seen(players, player, t, t, 1)
+        if t is not None:
+            times.append(t)
+
+    records, names = load_positions(path)
+    if len(records):
+        event_counts["PlayerTransform"] = len(records)
+        ids, counts = np.unique(records["player"], return_counts=True)
+        for player_id, count in zip(ids.tolist(), counts.tolist()):
+            t = records["t"][records["player"] == player_id]
+            _seen(players, names[player_id] if player_id < len(names) else "Unknown", float(t.min()), float(t.max()), count)
+
+    all_times = [a for a in (np.array(times), np.asarray(records["t"])) if len(a)]
+    start_time = float(min(a.min() for a in all_times)) if all_times else None
+    end_time = float(max(a.max() for a in all_times)) if all_times else None
+
+    # Checkpoints: the first record at or after each interval; every record before it is earlier
+    checkpoints = []
+    if start_time is not None and len(records):
+        record_max = np.maximum.accumulate(np.asarray(records["t"]))
+        for t in np.arange(start_time, end_time, CHECKPOINT_INTERVAL)[1:]:
+            checkpoints.append((name, float(t), int(np.searchsorted(record_max, t, side="left"))))
+
+    with db:
+        db.execute("INSERT OR REPLACE INTO sessions (name, start_time, end_time, events, positions, live, updated) "
+                   "VALUES (?, ?, ?, ?, ?, 0, ?)",
+                   (name, start_time, end_time, events, len(records), datetime.now().timestamp()))
+        db.executemany("INSERT OR REPLACE INTO session_players (session, player, first_seen, last_seen, events) "
+                       "VALUES (?, ?, ?, ?, ?)", [(name, player, *entry) for player, entry in players.items()])
+        db.executemany("INSERT OR REPLACE INTO session_events (session, event, count) VALUES (?, ?, ?)",
+                       [(name, event, count) for event, count in event_counts.items()])
+        db.executemany("INSERT OR IGNORE INTO checkpoints (session, t, position_index) VALUES (?, ?, ?)",
+                       checkpoints)
@@ -0,0 +1,79 @@
+import math
+import re
+
+# Token-aware chunking of lang strings for LLM prompts.
+#
+# Strings are budgeted by an estimate of real tokens rather than words, so
+# chunks stay inside the model's context. Repeated strings are sent once with
+# a repeat count, and strings sharing a key prefix (e.g. every line of
+# dialogue.npc.teacher.*) are packed into the same chunk so the model sees a
+# conversation together. Prompts start with one shared instruction prefix
+# followed by the chunk, and only end with the task, so every prompt for a
+# chunk shares a long identical prefix the inference server can cache.
+
+CHARS_PER_TOKEN = 4          # Typical for English BPE vocabularies
+_PIECE_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text):
+    # Word/punctuation pieces, or characters / 4 for long words, whichever is larger
+    return max(len(_PIECE_PATTERN.findall(text)), math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+def key_prefix(key, depth=2):
+    return ".".join(key.split(".")[:depth])
+
+
+def dedupe(entries):
+    # [(key, text)] -> [(key, text, count)] keeping the first key for each text
+    counts = {}
+    first_key = {}
+    for key, text in entries:
+        if text not in counts:
+            counts[text] = 0
+            first_key[text] = key
+        counts[text] += 1
+    return [(first_key[text], text, count) for text, count in counts.items()]
+
+
+def _render(text, count):
+    return text if count == 1 else f"{text} (repeated {count} times)"
+
+
+def chunk_entries(entries, budget, tokenizer=estimate_tokens):
+    # Packs [(key, text)] into chunks of at most `budget` tokens, grouped by key prefix
+    groups = {}
+    for key, text, count in dedupe(entries):
+        groups.setdefault(key_prefix(key), []).append(_render(text, count))
+
+    chunks = []
+    current, current_tokens = [], 0
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            chunks.append("\n".join(current))
+        current, current_tokens = [], 0
+
+    for lines in groups.values():
+        group_tokens = [tokenizer(line) + 1 for line in lines]  # +1 for the newline
+        # Start a fresh chunk rather than split a group that would fit in one
+        if current and current_tokens + sum(group_tokens) > budget and sum(group_tokens) <= budget:
+            flush()
+        for line, tokens in zip(lines, group_tokens):
+            if current and current_tokens + tokens > budget:
+                flush()
+            current.append(line)
+            current_tokens += tokens
+    flush()
+    return chunks
+
+
+def build_prompts(prefix, chunks, task):
+    # One prompt per chunk: shared prefix, then the chunk, then the task
+    return [
+        f"{prefix}"
+        f"Here is the extracted NPC text chunk ({idx + 1}/{len(chunks)}):\n\n{chunk}\n\n"
+        f"{task}"
+        for idx, chunk in enumerate(chunks)
+    ]
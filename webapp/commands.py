@@ -0,0 +1,73 @@
+import json
+import socket
+from concurrent.futures import ThreadPoolExecutor
+
+# Sends commands to the connected Minecraft clients through the WebSocket
+# server's command port (see websocket_server/commands.py).
+#
+# A multi-worker server has one port per worker, each serving the clients
+# connected to that worker. The request goes to all of them at once and their
+# replies are merged, so the caller sees one result for the whole class.
+
+COMMAND_HOST = "127.0.0.1"
+COMMAND_PORT = 19141     # Default; must match COMMAND_PORT in websocket_server/commands.py
+COMMAND_TIMEOUT = 10.0   # Seconds per command, as in websocket_server/commands.py
+REPLY_GRACE = 5.0        # Seconds beyond the command timeout to wait for a worker's reply
+MAX_REPLY_BYTES = 16 * 1024 * 1024
+
+
+class CommandError(Exception):
+    pass
+
+
+class CommandRejected(CommandError):
+    # The server refused the request itself (bad command list, timeout, ...)
+    pass
+
+
+def _ask(port, request, timeout):
+    with socket.create_connection((COMMAND_HOST, port), timeout=timeout + REPLY_GRACE) as sock:
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        reply = b""
+        while not reply.endswith(b"\n"):
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            reply += chunk
+            if len(reply) > MAX_REPLY_BYTES:
+                raise CommandError("reply too large")
+    if not reply:
+        raise CommandError("no reply")
+    return json.loads(reply)
+
+
+def send_commands(ports, command_lines, timeout, clients=None):
+    request = {"commands": command_lines, "timeout": timeout}
+    if clients is not None:
+        request["clients"] = clients
+
+    def ask(port):
+        try:
+            return _ask(port, request, timeout)
+        except (OSError, ValueError, CommandError) as e:
+            return {"error": f"port {port}: {e}", "unreachable": True}
+
+    with ThreadPoolExecutor(max_workers=max(1, len(ports))) as pool:
+        replies = list(pool.map(ask, ports))
+
+    rejected = [reply["error"] for reply in replies if "error" in reply and not reply.get("unreachable")]
+    if rejected:
+        raise CommandRejected(rejected[0])  # Every worker validates the same way
+    errors = [reply["error"] for reply in replies if "error" in reply]
+    answered = [reply for reply in replies if "error" not in reply]
+    if not answered:
+        raise CommandError("; ".join(errors) or "WebSocket server is not running")
+
+    merged = {"clients": 0, "seconds": 0.0, "summary": {}, "results": [], "errors": errors}
+    for reply in answered:
+        merged["clients"] += reply["clients"]
+        merged["seconds"] = max(merged["seconds"], reply["seconds"])
+        for status, count in reply["summary"].items():
+            merged["summary"][status] = merged["summary"].get(status, 0) + count
+        merged["results"].extend(reply["results"])
+    return merged
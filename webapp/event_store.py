@@ -0,0 +1,246 @@
+import heapq
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+# Readers for the event sessions written by websocket_server/server.py.
+#
+# A session is a directory (events_<timestamp>/) of append-only JSON Lines
+# segments, read in order. Single-file journals (events_*.jsonl) and older
+# sessions saved as one JSON array (events_*.json) are still readable.
+#
+# PlayerTransform samples are stored separately, as fixed-width binary records
+# in positions.bin with player names in players.json. Older sessions that
+# journaled raw PlayerTransform events are converted to the same layout; given
+# a cache directory (the app passes DATA_DIR/.cache/positions/), the converted
+# records are kept there and reused until the session's files change.
+#
+# A server running several ingest workers writes one shard per worker
+# (events_<timestamp>/shard_NN/, each laid out like a session). Readers see
+# a sharded session as one: events are merged in timestamp order, positions
+# are merged and sorted by time, and segments are named relative to the
+# session directory (shard_00/segment_00001.jsonl) so they stay distinct.
+
+SEGMENT_PATTERN = "segment_*.jsonl"
+SHARD_PATTERN = "shard_*"
+MERGED_CACHE_SIZE = 4
+
+# Record layout; must match POSITION_DTYPE in websocket_server/telemetry.py. The
+# dashboard's only copy: every other webapp module reads positions through here.
+POSITION_DTYPE = np.dtype([
+    ("t", "<f8"),
+    ("player", "<u2"),
+    ("x", "<f4"),
+    ("y", "<f4"),
+    ("z", "<f4"),
+    ("yaw", "<f4"),
+])
+assert POSITION_DTYPE.itemsize == 26, "positions.bin records are 26 bytes"
+POSITIONS_FILE = "positions.bin"
+PLAYERS_FILE = "players.json"
+
+
+def parse_time(value):
+    # Query-string times: Unix seconds or an ISO timestamp (server local time)
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def list_event_files(data_dir):
+    sessions = [p for p in data_dir.glob("events_*") if p.is_dir() or p.suffix in (".json", ".jsonl")]
+    return sorted(sessions)
+
+
+def delete_session(path):
+    if path.is_dir():
+        shutil.rmtree(path)
+    else:
+        path.unlink()
+
+
+def session_shards(path):
+    if not path.is_dir():
+        return []
+    return sorted(p for p in path.glob(SHARD_PATTERN) if p.is_dir())
+
+
+def session_version(path):
+    # Changes whenever anything in the session is appended to or rewritten
+    files = sorted(path.rglob("*")) if path.is_dir() else [path]
+    return tuple((f.relative_to(path).as_posix() if path.is_dir() else f.name, f.stat().st_size, f.stat().st_mtime_ns)
+                 for f in files if f.is_file())
+
+
+def session_segments(path):
+    if path.is_dir():
+        shards = session_shards(path)
+        if shards:
+            return [segment for shard in shards for segment in sorted(shard.glob(SEGMENT_PATTERN))]
+        return sorted(path.glob(SEGMENT_PATTERN))
+    return [path]
+
+
+def segment_name(path, segment):
+    # Name of a segment within its session, unique across shards
+    if path.is_dir():
+        return segment.relative_to(path).as_posix()
+    return segment.name
+
+
+def _timestamp(event):
+    if not isinstance(event, dict):
+        return ""
+    return event.get("timestamp") or ""
+
+
+def iter_events(path):
+    shards = session_shards(path)
+    if shards:
+        # Each shard is in time order; merge them into one stream
+        yield from heapq.merge(*(iter_events(shard) for shard in shards), key=_timestamp)
+        return
+    for segment in session_segments(path):
+        yield from _iter_segment(segment)
+
+
+def _iter_segment(path):
+    if path.suffix == ".json":
+        with path.open() as f:
+            yield from json.load(f)
+        return
+
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # A torn last line from an interrupted write; skip it
+                continue
+
+
+def read_new_events(segment, offset):
+    # Events appended to a JSONL segment since byte `offset`, and the offset to
+    # resume from next time. An incomplete trailing line is left for later.
+    events = []
+    with segment.open("rb") as f:
+        f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            offset += len(raw)
+            line = raw.strip()
+            if line:
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return events, offset
+
+
+def load_positions(path, cache_dir=None):
+    # Returns (records, player_names); records is a memory map where possible
+    shards = session_shards(path)
+    if shards:
+        return _merged_positions(path, shards, cache_dir)
+    positions_path = path / POSITIONS_FILE if path.is_dir() else None
+    if positions_path is not None and positions_path.exists():
+        players_path = path / PLAYERS_FILE
+        names = json.loads(players_path.read_text(encoding="utf-8")) if players_path.exists() else []
+        # Ignore a partially written trailing record
+        count = positions_path.stat().st_size // POSITION_DTYPE.itemsize
+        if count == 0:
+            return np.empty(0, dtype=POSITION_DTYPE), names
+        return np.memmap(positions_path, dtype=POSITION_DTYPE, mode="r", shape=(count,)), names
+
+    return _legacy_positions(path, cache_dir)
+
+
+def _legacy_positions(path, cache_dir):
+    # Converted records of a session without positions.bin, cached by the session's size/mtime stamps
+    if cache_dir is None:
+        return _positions_from_events(iter_events(path))
+    records_path = cache_dir / f"{path.name}.bin"
+    meta_path = cache_dir / f"{path.name}.json"
+    version = [list(entry) for entry in session_version(path)]
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if meta["version"] == version:
+            count = records_path.stat().st_size // POSITION_DTYPE.itemsize
+            if count == 0:
+                return np.empty(0, dtype=POSITION_DTYPE), meta["players"]
+            return np.memmap(records_path, dtype=POSITION_DTYPE, mode="r", shape=(count,)), meta["players"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    records, names = _positions_from_events(iter_events(path))
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = records_path.with_suffix(".tmp")
+        records.tofile(tmp)
+        os.replace(tmp, records_path)
+        meta_path.write_text(json.dumps({"version": version, "players": names}), encoding="utf-8")
+    except OSError:
+        pass  # Read-only cache directory; convert again next time
+    return records, names
+
+
+def _positions_from_events(events):
+    players = {}
+    rows = []
+    for e in events:
+        if e.get("event") != "PlayerTransform":
+            continue
+        player = e.get("body", {}).get("player", {})
+        name = player.get("name", "Unknown")
+        pos = player.get("position", {})
+        player_id = players.setdefault(name, len(players))
+        t = datetime.fromisoformat(e["timestamp"]).timestamp() if e.get("timestamp") else 0.0
+        rows.append((t, player_id, pos.get("x", 0), pos.get("y", 0), pos.get("z", 0), player.get("yRot", 0)))
+    return np.array(rows, dtype=POSITION_DTYPE), list(players)
+
+
+_merged = OrderedDict()
+_merged_lock = threading.Lock()
+
+
+def _merged_positions(path, shards, cache_dir):
+    # All shards' records in one time-ordered array, with player ids remapped to one name list
+    key = (str(path), session_version(path))
+    with _merged_lock:
+        if key in _merged:
+            _merged.move_to_end(key)
+            return _merged[key]
+
+    names, parts = [], []
+    for shard in shards:
+        records, shard_names = load_positions(shard, cache_dir)
+        ids = {}
+        for name in shard_names:
+            if name not in names:
+                names.append(name)
+            ids[name] = names.index(name)
+        remap = np.array([ids[name] for name in shard_names] or [0], dtype=np.uint16)
+        part = np.array(records)
+        if len(part):
+            part["player"] = remap[part["player"]]
+        parts.append(part)
+    records = np.concatenate(parts) if parts else np.empty(0, dtype=POSITION_DTYPE)
+    records = records[np.argsort(records["t"], kind="stable")]
+
+    with _merged_lock:
+        _merged[key] = (records, names)
+        while len(_merged) > MERGED_CACHE_SIZE:
+            _merged.popitem(last=False)
+    return records, names
@@ -0,0 +1,171 @@
+import io
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from matplotlib.figure import Figure
+
+from event_store import load_positions, session_version
+from catalog import seek_positions
+
+# Heatmap engine for player movement.
+#
+# Each (session version, player, time window) gets a base density grid built
+# in one vectorized pass over the memory-mapped position columns, at one
+# block per cell (coarser only for sessions spread over a huge area). Every
+# zoom level or bin size is then cut out of that cached grid and re-binned by
+# summing blocks of cells, so panning and zooming never touch the session
+# files again. Rendered PNGs are cached on top, keyed by the same inputs.
+
+DEFAULT_BINS = 100             # Bins across the widest axis when no bin size is asked for
+MAX_BASE_CELLS = 4_000_000     # Caps base grid memory (~16 MB of int32 counts)
+GRID_CACHE_SIZE = 16
+PNG_CACHE_SIZE = 64
+
+
+class _LRUCache:
+    def __init__(self, max_items):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+
+_base_grids = _LRUCache(GRID_CACHE_SIZE)
+_pngs = _LRUCache(PNG_CACHE_SIZE)
+
+
+class BaseGrid:
+    def __init__(self, counts, x0, z0, cell):
+        self.counts = counts  # counts[i, j] covers x0 + i*cell, z0 + j*cell
+        self.x0 = x0
+        self.z0 = z0
+        self.cell = cell
+
+
+def _build_base_grid(path, player, start, end, positions_cache):
+    records, names = load_positions(path, positions_cache)
+    if start is not None:
+        records = seek_positions(path, records, start)  # Skip straight to the window
+    mask = np.ones(len(records), dtype=bool)
+    if player is not None:
+        if player not in names:
+            return None
+        mask &= records["player"] == names.index(player)
+    if start is not None:
+        mask &= records["t"] >= start
+    if end is not None:
+        mask &= records["t"] < end
+
+    xs = np.round(records["x"][mask]).astype(np.int64)
+    zs = np.round(records["z"][mask]).astype(np.int64)
+    if not len(xs):
+        return None
+
+    x0, z0 = int(xs.min()), int(zs.min())
+    width, depth = int(xs.max()) - x0 + 1, int(zs.max()) - z0 + 1
+    cell = 1
+    while math.ceil(width / cell) * math.ceil(depth / cell) > MAX_BASE_CELLS:
+        cell *= 2
+    nx, nz = math.ceil(width / cell), math.ceil(depth / cell)
+
+    flat = ((xs - x0) // cell) * nz + (zs - z0) // cell
+    counts = np.bincount(flat, minlength=nx * nz).astype(np.int32).reshape(nx, nz)
+    return BaseGrid(counts, x0, z0, cell)
+
+
+def _base_grid(path, version, player, start, end, positions_cache):
+    key = (str(path), version, player, start, end)
+    grid = _base_grids.get(key)
+    if grid is None:
+        grid = _build_base_grid(path, player, start, end, positions_cache)
+        _base_grids.put(key, grid)
+    return grid
+
+
+def heatmap_grid(path, bounds=None, bin_size=None, player=None, start=None, end=None, version=None,
+                 positions_cache=None):
+    # Returns (counts, extent, bin_size) or None when nothing matches; positions_cache as for load_positions
+    if version is None:
+        version = session_version(path)
+    base = _base_grid(path, version, player, start, end, positions_cache)
+    if base is None:
+        return None
+
+    nx, nz = base.counts.shape
+    i0, i1, j0, j1 = 0, nx, 0, nz
+    if bounds is not None:
+        xmin, xmax, zmin, zmax = bounds
+        i0 = max(0, math.floor((xmin - base.x0) / base.cell))
+        i1 = min(nx, math.ceil((xmax - base.x0) / base.cell) + 1)
+        j0 = max(0, math.floor((zmin - base.z0) / base.cell))
+        j1 = min(nz, math.ceil((zmax - base.z0) / base.cell) + 1)
+        if i0 >= i1 or j0 >= j1:
+            return None
+    window = base.counts[i0:i1, j0:j1]
+
+    if bin_size:
+        factor = max(1, math.ceil(bin_size / base.cell))
+    else:
+        factor = max(1, math.ceil(max(window.shape) / DEFAULT_BINS))
+
+    # Pad to whole bins, then sum each factor x factor block of cells
+    pad_x = -window.shape[0] % factor
+    pad_z = -window.shape[1] % factor
+    if pad_x or pad_z:
+        window = np.pad(window, ((0, pad_x), (0, pad_z)))
+    bx, bz = window.shape[0] // factor, window.shape[1] // factor
+    counts = window.reshape(bx, factor, bz, factor).sum(axis=(1, 3))
+
+    size = factor * base.cell
+    x_start = base.x0 + i0 * base.cell
+    z_start = base.z0 + j0 * base.cell
+    extent = [x_start, x_start + bx * size, z_start, z_start + bz * size]
+    return counts, extent, size
+
+
+def heatmap_png(path, positions_cache=None, **params):
+    version = session_version(path)
+    key = (str(path), version, tuple(sorted(params.items())))
+    png = _pngs.get(key)
+    if png is not None:
+        return png
+
+    result = heatmap_grid(path, version=version, positions_cache=positions_cache, **params)
+    if result is None:
+        return None
+    counts, extent, _ = result
+
+    fig = Figure()
+    ax = fig.subplots()
+    cax = ax.imshow(
+        counts.T,
+        extent=extent,
+        origin='lower',
+        cmap='hot',
+        interpolation='nearest'
+    )
+    ax.set_title('Player Movement Heatmap')
+    ax.set_xlabel('X')
+    ax.set_ylabel('Z')
+    fig.colorbar(cax, ax=ax, label='Movement Density')
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png')
+    png = buf.getvalue()
+    _pngs.put(key, png)
+    return png
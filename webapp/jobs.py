@@ -0,0 +1,100 @@
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Minimal background job runner for long analyses.
+#
+# A job is a function called as fn(job, *args). It reports progress through
+# job.update() and should return early when job.cancelled is set. Finished
+# jobs are kept (up to MAX_FINISHED_JOBS) so the browser can collect results.
+
+MAX_CONCURRENT_JOBS = 2
+MAX_FINISHED_JOBS = 100
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.progress = 0.0
+        self.message = ""
+        self.result = None
+        self.error = None
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def update(self, progress=None, message=None):
+        if self._cancel.is_set():
+            raise JobCancelled()
+        if progress is not None:
+            self.progress = round(progress, 3)
+        if message is not None:
+            self.message = message
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    def __init__(self, max_workers=MAX_CONCURRENT_JOBS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, *args):
+        job = Job(kind)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, fn, args)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job._cancel.set()
+        if job.status == "queued":
+            job.status = "cancelled"
+        return job
+
+    def _run(self, job, fn, args):
+        if job.cancelled:
+            return
+        job.status = "running"
+        try:
+            job.result = fn(job, *args)
+            job.progress = 1.0
+            job.status = "done"
+        except JobCancelled:
+            job.status = "cancelled"
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e)
+            job.status = "failed"
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if j.status in ("done", "failed", "cancelled")]
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job.id]
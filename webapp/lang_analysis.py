@@ -0,0 +1,217 @@
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from pathlib import Path
+
+import textstat
+from matplotlib.figure import Figure
+
+from lang_parser import parse_file, parse_text
+from readability import line_grades, text_metrics
+
+# Readability analysis of a .lang file, shared by the synchronous
+# /analyze-lang-file route and its background-job variant.
+#
+# Scores come from the batch readability engine (readability.py), which
+# matches textstat line for line. Large files are scored in chunks across a
+# process pool while the whole-file metrics are computed alongside them.
+# Reports are identical to a serial run.
+#
+# With a LangResultCache, unchanged files skip straight to writing the
+# reports and unchanged lines skip scoring. Bump ANALYZER_VERSION whenever a
+# change here would alter the results.
+
+ANALYZER_VERSION = f"3/textstat-{getattr(textstat, '__version__', '?')}"
+
+LINE_CHUNK = 5000  # Lines per pool task
+INLINE_CHUNK = 250  # Lines scored between progress reports (and cancel checks) when not using the pool
+SCORING_PROCESSES = max(1, (os.cpu_count() or 2) - 1)
+
+_pool = None
+
+
+def extract_entries(text):
+    # (line number, value) for every line with text worth scoring
+    return [(entry.line, entry.value) for entry in parse_text(text) if entry.is_text]
+
+
+def find_world_filename(path, root):
+    # Walk up from the lang file to find the original .mcworld filename
+    current_dir = path.parent
+    while current_dir != root and root in current_dir.parents:
+        candidate = current_dir / "source_world_name.txt"
+        if candidate.exists():
+            with open(candidate, "r", encoding="utf-8") as f:
+                return f.read().strip()
+        current_dir = current_dir.parent
+    return "(unknown)"
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=SCORING_PROCESSES)
+    return _pool
+
+
+def _score_in_pool(values, joined_text, progress):
+    # Returns (per-line scores, whole-file metrics)
+    pool = _get_pool()
+    metrics_future = pool.submit(text_metrics, joined_text)
+    chunks = {}
+    for start in range(0, len(values), LINE_CHUNK):
+        chunks[pool.submit(line_grades, values[start:start + LINE_CHUNK])] = start
+
+    scores = [None] * len(values)
+    pending = set(chunks) | {metrics_future}
+    done_lines = 0
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future is metrics_future:
+                    continue
+                start = chunks[future]
+                chunk_scores = future.result()
+                scores[start:start + len(chunk_scores)] = chunk_scores
+                done_lines += len(chunk_scores)
+            if progress:
+                progress(done_lines / max(1, len(values)), f"Scored {done_lines}/{len(values)} lines")
+    except BaseException:
+        for future in pending:
+            future.cancel()
+        raise
+    return scores, metrics_future.result()
+
+
+def _score_inline(values, progress):
+    # Small files: scored in this thread, a chunk at a time so a job can still report progress and be cancelled
+    scores = []
+    for start in range(0, len(values), INLINE_CHUNK):
+        scores.extend(line_grades(values[start:start + INLINE_CHUNK]))
+        if progress:
+            progress(len(scores) / max(1, len(values)), f"Scored {len(scores)}/{len(values)} lines")
+    return scores
+
+
+def _compute(path, progress, cache):
+    # Returns (analysis, line_analysis) for the lang file
+    entries = [(entry.line, entry.value) for entry in parse_file(path) if entry.is_text]
+    texts = [value for _, value in entries]
+    joined_text = "\n".join(texts)
+
+    # Only lines never seen before need scoring
+    known = cache.get_line_scores(texts) if cache else {}
+    to_score = list(dict.fromkeys(text for text in texts if text not in known))
+
+    if progress:
+        progress(0.0, f"Scoring {len(to_score)} of {len(texts)} lines")
+    if len(to_score) <= LINE_CHUNK:
+        new_scores = _score_inline(to_score, progress)
+        analysis = text_metrics(joined_text)
+    else:
+        new_scores, analysis = _score_in_pool(to_score, joined_text, progress)
+    analysis["Line Count"] = len(texts)
+    analysis["Difficult Words"] = analysis.pop("Difficult Words")  # Keep it last in the report
+
+    scored = dict(zip(to_score, new_scores))
+    if cache and scored:
+        cache.put_line_scores(scored)
+    known.update(scored)
+
+    line_analysis = []
+    for i, value in entries:
+        reading_age = known[value]
+        line_analysis.append({
+            "line": i,
+            "text": value if reading_age is not None else "",
+            "reading_age": reading_age
+        })
+    return analysis, line_analysis
+
+
+def _render_chart(line_analysis):
+    # Histogram of reading ages > 0 as PNG bytes, or None if there are none
+    filtered_reading_ages = [
+        entry["reading_age"] for entry in line_analysis
+        if isinstance(entry["reading_age"], (int, float)) and entry["reading_age"] > 0
+    ]
+    if not filtered_reading_ages:
+        return None
+
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    ax.hist(filtered_reading_ages, bins=30, color='orange', edgecolor='black')
+    ax.set_title("Distribution of Reading Age")
+    ax.set_xlabel("Reading Age")
+    ax.set_ylabel("Frequency")
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png')
+    return buf.getvalue()
+
+
+def analyze_lang_file(path, world_filename, progress=None, cache=None):
+    # Writes the four reports next to the lang file and returns their paths
+    content = path.read_bytes()
+    cache_key = cache.key(content) if cache else None
+    cached = cache.get(cache_key) if cache else None
+
+    if cached is not None:
+        analysis, line_analysis, chart = cached["analysis"], cached["line_analysis"], cached["chart"]
+    else:
+        analysis, line_analysis = _compute(path, progress, cache)
+        chart = _render_chart(line_analysis)
+        if cache:
+            cache.put(cache_key, analysis, line_analysis, chart)
+
+    if progress:
+        progress(None, "Writing reports")
+    stem = Path(path).stem
+
+    # ── Save main summary .txt report ─────────────────────────────
+    analysis_file = path.parent / f"analysis_{stem}.txt"
+    with open(analysis_file, "w", encoding="utf-8") as f:
+        f.write(f"World File: {world_filename}\n")
+        f.write(f"Language File: {path.name}\n")
+        f.write(f"Analysis Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write("-" * 50 + "\n\n")
+        for key, value in analysis.items():
+            if isinstance(value, dict):
+                f.write(f"\n{key}:\n")
+                for word, count in sorted(value.items()):
+                    f.write(f"  - {word} ({count})\n")
+            else:
+                f.write(f"{key}: {value}\n")
+
+    # ── Save per-line reading age .json ──────────────────────────
+    json_path = path.parent / f"line_analysis_{stem}.json"
+    with open(json_path, "w", encoding="utf-8") as jf:
+        json.dump(line_analysis, jf, indent=2)
+
+    # ── Save histogram chart (only reading_age > 0) ──────────────
+    chart_path = path.parent / f"reading_age_distribution_{stem}.png"
+    if chart is not None:
+        chart_path.write_bytes(chart)
+
+    # ── Save lines with reading_age > 16 ─────────────────────────
+    high_reading_lines = [
+        f"Line {entry['line']}: {entry['text']} (Reading Age: {entry['reading_age']})"
+        for entry in line_analysis
+        if isinstance(entry["reading_age"], (int, float)) and entry["reading_age"] > 16
+    ]
+
+    high_reading_path = path.parent / f"above_reading_age_16_{stem}.txt"
+    with open(high_reading_path, "w", encoding="utf-8") as f:
+        f.write("Lines with Reading Age > 16\n")
+        f.write("=" * 40 + "\n\n")
+        for line in high_reading_lines:
+            f.write(line + "\n")
+
+    return {
+        "file_url": analysis_file,
+        "json_url": json_path,
+        "chart_url": chart_path,
+        "high_reading_url": high_reading_path,
+    }
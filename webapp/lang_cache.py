@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+# Content-addressed cache for .lang readability results.
+#
+# Whole-file results are stored under the SHA-256 of the file contents plus
+# the analyzer version, so the same lang file shipped in another .mcworld is
+# served without recomputing anything. Entries are evicted least recently
+# used first once the cache grows past max_bytes.
+#
+# Per-line reading ages are also cached, keyed by the hash of the line text,
+# so a world where only a few strings changed only re-scores those lines.
+
+MAX_CACHE_BYTES = 200 * 1024 * 1024
+MAX_LINE_ENTRIES = 500_000
+
+RESULT_FILE = "result.json"
+CHART_FILE = "chart.png"
+
+
+class LangResultCache:
+    def __init__(self, directory, version, max_bytes=MAX_CACHE_BYTES, max_line_entries=MAX_LINE_ENTRIES):
+        self.directory = directory
+        self.version = version
+        self.max_bytes = max_bytes
+        self.max_line_entries = max_line_entries
+        self._lock = threading.Lock()
+        (directory / "results").mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS line_scores (hash TEXT PRIMARY KEY, score REAL, used REAL)")
+
+    def key(self, content):
+        return hashlib.sha256(self.version.encode("utf-8") + b"\0" + content).hexdigest()
+
+    # ── Whole-file results ───────────────────────────────────────
+
+    def get(self, key):
+        entry = self.directory / "results" / key
+        try:
+            with open(entry / RESULT_FILE, encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+        chart_path = entry / CHART_FILE
+        result["chart"] = chart_path.read_bytes() if chart_path.exists() else None
+        os.utime(entry)  # Mark as recently used
+        return result
+
+    def put(self, key, analysis, line_analysis, chart):
+        entry = self.directory / "results" / key
+        tmp = self.directory / "results" / f".tmp-{uuid.uuid4().hex}"
+        tmp.mkdir()
+        with open(tmp / RESULT_FILE, "w", encoding="utf-8") as f:
+            json.dump({"analysis": analysis, "line_analysis": line_analysis}, f)
+        if chart is not None:
+            (tmp / CHART_FILE).write_bytes(chart)
+        try:
+            os.replace(tmp, entry)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)  # Another job stored the same result first
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in (self.directory / "results").iterdir():
+                if entry.name.startswith(".tmp-"):
+                    continue
+                size = sum(f.stat().st_size for f in entry.iterdir())
+                entries.append((entry.stat().st_mtime, size, entry))
+                total += size
+            entries.sort()
+            while total > self.max_bytes and entries:
+                _, size, entry = entries.pop(0)
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+
+    # ── Per-line scores ──────────────────────────────────────────
+
+    def _connect(self):
+        return sqlite3.connect(self.directory / "lines.sqlite", timeout=30)
+
+    def _line_hash(self, text):
+        return hashlib.sha256((self.version + "\0" + text).encode("utf-8")).hexdigest()
+
+    def get_line_scores(self, texts):
+        # Returns {text: reading_age} for the texts already scored
+        hashes = {self._line_hash(text): text for text in set(texts)}
+        found = {}
+        with self._connect() as db:
+            keys = list(hashes)
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                rows = db.execute(
+                    f"SELECT hash, score FROM line_scores WHERE hash IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for line_hash, score in rows:
+                    found[hashes[line_hash]] = score
+            if found:
+                now = time.time()
+                db.executemany("UPDATE line_scores SET used = ? WHERE hash = ?",
+                               [(now, self._line_hash(text)) for text in found])
+        return found
+
+    def put_line_scores(self, scores):
+        now = time.time()
+        with self._connect() as db:
+            db.executemany("INSERT OR REPLACE INTO line_scores (hash, score, used) VALUES (?, ?, ?)",
+                           [(self._line_hash(text), score, now) for text, score in scores.items()])
+            count = db.execute("SELECT COUNT(*) FROM line_scores").fetchone()[0]
+            if count > self.max_line_entries:
+                db.execute("DELETE FROM line_scores WHERE hash IN "
+                           "(SELECT hash FROM line_scores ORDER BY used LIMIT ?)", (count - self.max_line_entries,))
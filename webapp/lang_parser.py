@@ -0,0 +1,90 @@
+import io
+import os
+import re
+import threading
+from collections import OrderedDict
+
+# Single-pass parser for Minecraft .lang files.
+#
+# Every language route reads lang files through here: one streaming pass
+# yields a LangEntry per key or comment line, with the placeholder-free text
+# already computed. Lines starting with "#" are comments, and a tab followed
+# by "#" starts a trailing comment after the value (key=value\t## note).
+# Parsed files are memoized by (path, size, mtime), so analysing a file and
+# then sending it to the LLM only parses it once.
+
+PLACEHOLDER_PATTERN = r"(%\d*\$?[sd]|\\n|\u00a7.)"
+PLACEHOLDER_RE = re.compile(PLACEHOLDER_PATTERN)
+TRAILING_COMMENT_RE = re.compile(r"\t+#")
+
+PARSE_CACHE_SIZE = 16
+
+
+class LangEntry:
+    __slots__ = ("line", "key", "value", "cleaned", "comment", "is_comment", "is_formatting")
+
+    def __init__(self, line, key, value, cleaned, comment, is_comment, is_formatting):
+        self.line = line                    # 1-based line number in the file
+        self.key = key                      # None for comment lines
+        self.value = value                  # Text after "=", trailing comment removed
+        self.cleaned = cleaned              # Value without placeholders or colour codes
+        self.comment = comment              # Comment text, or None
+        self.is_comment = is_comment        # The whole line is a comment
+        self.is_formatting = is_formatting  # Nothing left once placeholders are removed
+
+    @property
+    def is_text(self):
+        # A translation with words worth analysing
+        return not self.is_comment and not self.is_formatting
+
+
+def parse_lines(lines):
+    # Yields a LangEntry for each comment or key=value line of an iterable of lines
+    for number, line in enumerate(lines, 1):
+        if number == 1:
+            line = line.lstrip("\ufeff")
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("#"):
+            yield LangEntry(number, None, "", "", line.lstrip("#").strip(), True, True)
+            continue
+        if "=" not in line:
+            continue
+
+        key, value = line.split("=", 1)
+        comment = None
+        match = TRAILING_COMMENT_RE.search(value)
+        if match:
+            comment = value[match.end():].lstrip("#").strip()
+            value = value[:match.start()]
+        value = value.strip()
+        cleaned = PLACEHOLDER_RE.sub("", value).strip()
+        yield LangEntry(number, key.strip(), value, cleaned, comment, False, not cleaned)
+
+
+def parse_text(text):
+    return parse_lines(io.StringIO(text, newline=None))
+
+
+_parsed = OrderedDict()
+_parsed_lock = threading.Lock()
+
+
+def parse_file(path):
+    # All entries of a lang file as a tuple, memoized per file version
+    stat = os.stat(path)
+    version = (str(path), stat.st_size, stat.st_mtime_ns)
+    with _parsed_lock:
+        if version in _parsed:
+            _parsed.move_to_end(version)
+            return _parsed[version]
+
+    with open(path, "r", encoding="utf-8-sig", errors="replace", newline=None) as f:
+        entries = tuple(parse_lines(f))
+
+    with _parsed_lock:
+        _parsed[version] = entries
+        while len(_parsed) > PARSE_CACHE_SIZE:
+            _parsed.popitem(last=False)
+    return entries
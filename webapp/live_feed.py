@@ -0,0 +1,139 @@
+import json
+import queue
+import socket
+import threading
+import time
+
+# Receives the live aggregates published by websocket_server/live_feed.py and
+# fans them out to browsers connected to /live-feed.
+#
+# One background thread listens on a localhost UDP port and merges every
+# update into a running snapshot. Each browser gets the snapshot once when it
+# connects and then only the per-second deltas, so the cost of live
+# monitoring follows the event rate, not the session size or viewer count.
+# The server's runtime metrics arrive the same way and are kept for /metrics.
+#
+# A multi-worker server (websocket_server/sharding.py) publishes one stream
+# per worker, tagged with its shard. Client counts, totals and rates are kept
+# per shard and summed, so browsers see one session either way.
+
+LIVE_FEED_HOST = "127.0.0.1"
+LIVE_FEED_PORT = 19140
+SUBSCRIBER_QUEUE = 100
+
+
+def _empty_snapshot():
+    return {"session": None, "clients": 0, "totals": {}, "rates": {}, "positions": {}}
+
+
+class LiveFeed:
+    def __init__(self, host=LIVE_FEED_HOST, port=LIVE_FEED_PORT):
+        self.address = (host, port)
+        self.error = None
+        self._snapshot = _empty_snapshot()
+        self._shards = {}    # Shard -> its latest clients, totals and rates
+        self._metrics = {}   # Shard -> (latest metrics snapshot, time received)
+        self._metrics_session = None
+        self._command_ports = {}  # Shard -> port where it takes commands (see webapp/commands.py)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                sock.bind(self.address)
+            except OSError as e:
+                sock.close()
+                self.error = f"Live feed unavailable: {e}"
+                return
+            self._thread = threading.Thread(target=self._run, args=(sock,), name="live-feed", daemon=True)
+            self._thread.start()
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=SUBSCRIBER_QUEUE)
+        with self._lock:
+            self._subscribers.add(q)
+            snapshot = json.loads(json.dumps(self._snapshot))
+        return q, snapshot
+
+    def metrics(self):
+        # Shard (None for a single-process server) -> (latest metrics snapshot, seconds since it arrived)
+        now = time.monotonic()
+        with self._lock:
+            return {shard: (snapshot, now - received) for shard, (snapshot, received) in self._metrics.items()}
+
+    def command_ports(self, max_age):
+        # Command ports of the server processes heard from in the last max_age seconds
+        now = time.monotonic()
+        with self._lock:
+            return [port for shard, port in self._command_ports.items() if now - self._metrics[shard][1] < max_age]
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def _run(self, sock):
+        while True:
+            data, _ = sock.recvfrom(65535)
+            try:
+                update = json.loads(data)
+            except ValueError:
+                continue
+
+            if "metrics" in update:
+                # Runtime metrics are read through /metrics, not pushed to browsers
+                with self._lock:
+                    if update.get("session") != self._metrics_session:
+                        self._metrics = {}  # A new server run; drop the previous run's workers
+                        self._command_ports = {}
+                        self._metrics_session = update.get("session")
+                    self._metrics[update.get("shard")] = (update["metrics"], time.monotonic())
+                    if update.get("command_port"):
+                        self._command_ports[update.get("shard")] = update["command_port"]
+                continue
+
+            with self._lock:
+                self._merge(update)
+                subscribers = list(self._subscribers)
+            for q in subscribers:
+                try:
+                    q.put_nowait(update)
+                except queue.Full:
+                    pass  # Slow browser; it still has the totals from the next update
+
+    def _merge(self, update):
+        snapshot = self._snapshot
+        if update.get("session") != snapshot["session"]:
+            # A new server run started; forget the previous session's players
+            self._snapshot = snapshot = _empty_snapshot()
+            snapshot["session"] = update.get("session")
+            self._shards = {}
+        if update.get("shard") is not None:
+            self._combine_shards(update)
+        for key in ("clients", "totals", "rates"):
+            if key in update:
+                snapshot[key] = update[key]
+        snapshot["positions"].update(update.get("positions", {}))
+        for name in update.get("left", []):
+            snapshot["positions"].pop(name, None)
+
+    def _combine_shards(self, update):
+        # Replace this worker's clients, totals and rates with the sums over all workers
+        shard = self._shards.setdefault(update["shard"], {})
+        keys = [key for key in ("clients", "totals", "rates") if key in update]
+        for key in keys:
+            shard[key] = update[key]
+        for key in keys:
+            parts = [s[key] for s in self._shards.values() if key in s]
+            if key == "clients":
+                update[key] = sum(parts)
+            else:
+                combined = {}
+                for part in parts:
+                    for name, value in part.items():
+                        combined[name] = combined.get(name, 0) + value
+                update[key] = {name: round(value, 2) for name, value in combined.items()} if key == "rates" else combined
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Client for a local Ollama server.
+#
+# Rather than spawning `ollama run` (and reloading the model) for every
+# prompt, requests go to the long-running server's HTTP API over a pooled
+# keep-alive session, with the model kept loaded between calls. Prompts run
+# concurrently up to `parallelism`, and responses are cached on disk by
+# (model, prompt hash), so repeat analyses of the same text are instant. The
+# cache is trimmed least recently used first once it grows past max_cache_bytes.
+# generate_stream() yields tokens from all in-flight prompts as they arrive.
+# Point OLLAMA_URL at any server speaking /api/generate (e.g. a stub) to test.
+
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
+LLM_PARALLELISM = int(os.environ.get("LLM_PARALLELISM", 2))
+LLM_TIMEOUT = 600        # Seconds for one generation
+KEEP_ALIVE = "30m"       # How long Ollama keeps the model loaded after a call
+MAX_CACHE_BYTES = 50 * 1024 * 1024
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMClient:
+    def __init__(self, base_url=OLLAMA_URL, parallelism=LLM_PARALLELISM, cache_dir=None, timeout=LLM_TIMEOUT,
+                 max_cache_bytes=MAX_CACHE_BYTES):
+        self.base_url = base_url.rstrip("/")
+        self.parallelism = parallelism
+        self.cache_dir = cache_dir
+        self.max_cache_bytes = max_cache_bytes
+        self._cache_lock = threading.Lock()
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=parallelism))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=parallelism))
+        self._executor = ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix="llm")
+        if cache_dir is not None:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+
+    # ── Cache ────────────────────────────────────────────────────
+
+    def _cache_path(self, model, prompt):
+        if self.cache_dir is None:
+            return None
+        digest = hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{digest}.txt"
+
+    def cached(self, model, prompt):
+        path = self._cache_path(model, prompt)
+        if path is None:
+            return None
+        try:
+            output = path.read_text(encoding="utf-8")
+            os.utime(path)  # Mark as recently used
+        except OSError:
+            return None  # Not cached, or evicted meanwhile
+        return output
+
+    def _store(self, model, prompt, output):
+        path = self._cache_path(model, prompt)
+        if path is None:
+            return
+        tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        tmp_path.write_text(output, encoding="utf-8")
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        with self._cache_lock:
+            entries = []
+            total = 0
+            for entry in self.cache_dir.glob("*.txt"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry))
+                total += stat.st_size
+            entries.sort()
+            while total > self.max_cache_bytes and entries:
+                _, size, entry = entries.pop(0)
+                entry.unlink(missing_ok=True)
+                total -= size
+
+    # ── Generation ───────────────────────────────────────────────
+
+    def generate(self, model, prompt):
+        output = self.cached(model, prompt)
+        if output is not None:
+            return output
+
+        try:
+            res = self.session.post(
+                f"{self.base_url}/api/generate",
+                json={"model": model, "prompt": prompt, "stream": False, "keep_alive": KEEP_ALIVE},
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            raise LLMError(f"Cannot reach Ollama at {self.base_url}: {e}") from e
+        if res.status_code != 200:
+            raise LLMError(res.text.strip() or f"HTTP {res.status_code}")
+
+        output = res.json().get("response", "").strip()
+        self._store(model, prompt, output)
+        return output
+
+    def generate_many(self, model, prompts):
+        # Outputs in prompt order; at most `parallelism` requests in flight
+        futures = [self._executor.submit(self.generate, model, prompt) for prompt in prompts]
+        try:
+            return [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    # ── Streaming ────────────────────────────────────────────────
+
+    def _stream_tokens(self, model, prompt, cancelled):
+        # Yields response fragments as Ollama produces them
+        try:
+            res = self.session.post(
+                f"{self.base_url}/api/generate",
+                json={"model": model, "prompt": prompt, "stream": True, "keep_alive": KEEP_ALIVE},
+                timeout=self.timeout,
+                stream=True,
+            )
+        except requests.RequestException as e:
+            raise LLMError(f"Cannot reach Ollama at {self.base_url}: {e}") from e
+
+        with res:
+            if res.status_code != 200:
+                raise LLMError(res.text.strip() or f"HTTP {res.status_code}")
+            try:
+                for line in res.iter_lines():
+                    if cancelled.is_set():
+                        return
+                    if not line:
+                        continue
+                    message = json.loads(line)
+                    if message.get("error"):
+                        raise LLMError(message["error"])
+                    if message.get("response"):
+                        yield message["response"]
+                    if message.get("done"):
+                        return
+            except requests.RequestException as e:
+                raise LLMError(f"Lost connection to Ollama: {e}") from e
+
+    def generate_stream(self, model, prompts):
+        # Yields ("token", index, text) as tokens arrive from any prompt, then
+        # ("done", index, output) or ("error", index, message) once per prompt.
+        # Closing the generator abandons the prompts still running or queued.
+        events = queue.Queue()
+        cancelled = threading.Event()
+
+        def run(index, prompt):
+            try:
+                output = self.cached(model, prompt)
+                if output is None:
+                    parts = []
+                    for text in self._stream_tokens(model, prompt, cancelled):
+                        parts.append(text)
+                        events.put(("token", index, text))
+                    if cancelled.is_set():
+                        return
+                    output = "".join(parts).strip()
+                    self._store(model, prompt, output)
+                else:
+                    events.put(("token", index, output))
+                events.put(("done", index, output))
+            except Exception as e:
+                events.put(("error", index, str(e)))
+
+        futures = [self._executor.submit(run, index, prompt) for index, prompt in enumerate(prompts)]
+        try:
+            remaining = len(prompts)
+            while remaining:
+                event = events.get()
+                if event[0] != "token":
+                    remaining -= 1
+                yield event
+        finally:
+            cancelled.set()
+            for future in futures:
+                future.cancel()
@@ -0,0 +1,266 @@
+import bisect
+import math
+import threading
+from collections import Counter
+
+# Runtime metrics for the dashboard and the ingest server.
+#
+# Flask routes are timed by before/after request hooks into one latency
+# histogram per route. The ingest server's own metrics (see
+# websocket_server/metrics.py) arrive once a second over the live feed. Both
+# are served at /metrics in the Prometheus text format and at /metrics/json,
+# where histograms also come with estimated percentiles for the dashboard.
+#
+# A multi-worker server reports once per worker (shard). /metrics labels each
+# worker's series with its shard; /metrics/json adds the workers up into one
+# server view, with a short per-shard summary alongside.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SERVER_STALE_AFTER = 10.0  # Seconds without a server snapshot before it counts as down
+QUANTILES = (0.5, 0.9, 0.99)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    # Prometheus-style histogram, as in websocket_server/metrics.py
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        return {"buckets": list(self.buckets), "counts": list(self.counts), "sum": self.sum, "count": self.count}
+
+
+def quantile(histogram, q):
+    # Estimate from a histogram snapshot, interpolating inside the bucket like histogram_quantile()
+    if not histogram or not histogram["count"]:
+        return None
+    rank = q * histogram["count"]
+    seen = 0
+    lower = 0.0
+    for bound, count in zip(histogram["buckets"] + [math.inf], histogram["counts"]):
+        if count and seen + count >= rank:
+            if bound == math.inf:
+                return lower  # Above the largest bucket; the best we can say
+            return lower + (bound - lower) * (rank - seen) / count
+        seen += count
+        lower = bound
+    return lower
+
+
+def summarize(histogram):
+    # Count, mean and percentiles of a histogram snapshot, in seconds
+    if not histogram:
+        return None
+    count = histogram["count"]
+    summary = {"count": count, "mean": histogram["sum"] / count if count else None}
+    for q in QUANTILES:
+        summary[f"p{round(q * 100)}"] = quantile(histogram, q)
+    return summary
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.latency = {}           # (route, method) -> Histogram
+        self.responses = Counter()  # (route, method, status) -> count
+        self._lock = threading.Lock()
+
+    def observe(self, route, method, status, seconds):
+        with self._lock:
+            histogram = self.latency.get((route, method))
+            if histogram is None:
+                histogram = self.latency[(route, method)] = Histogram()
+            histogram.observe(seconds)
+            self.responses[(route, method, status)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return ({key: histogram.snapshot() for key, histogram in self.latency.items()}, dict(self.responses))
+
+
+# ── Views ────────────────────────────────────────────────────────
+
+def _server_up(server, server_age):
+    return server is not None and server_age is not None and server_age < SERVER_STALE_AFTER
+
+
+def _add_histograms(histograms):
+    # Bucket-wise sum; every snapshot comes from the same server code, so buckets line up
+    merged = {"buckets": list(histograms[0]["buckets"]), "counts": [0] * len(histograms[0]["counts"]),
+              "sum": 0.0, "count": 0}
+    for histogram in histograms:
+        merged["counts"] = [a + b for a, b in zip(merged["counts"], histogram["counts"])]
+        merged["sum"] += histogram["sum"]
+        merged["count"] += histogram["count"]
+    return merged
+
+
+def _add_counts(dicts):
+    merged = Counter()
+    for counts in dicts:
+        merged.update(counts)
+    return {key: round(value, 2) if isinstance(value, float) else value for key, value in merged.items()}
+
+
+def merge_servers(snapshots):
+    # One server snapshot from the snapshots of several workers
+    if len(snapshots) == 1:
+        return snapshots[0]
+    merged = {key: sum(s[key] for s in snapshots)
+              for key in ("clients", "messages", "json_parse_failures", "cpu_seconds", "backpressure_waits")}
+    for key in ("events_received", "events_accepted", "event_rates", "received_rates", "client_rates",
+                "persisted", "queue_depth", "shed"):
+        merged[key] = _add_counts(s[key] for s in snapshots)
+    for key in ("persist_seconds", "queue_wait_seconds"):
+        names = {name for s in snapshots for name in s[key]}
+        merged[key] = {name: _add_histograms([s[key][name] for s in snapshots if name in s[key]]) for name in names}
+    merged["loop_lag_seconds"] = _add_histograms([s["loop_lag_seconds"] for s in snapshots])
+    merged["loop_lag_last"] = max(s["loop_lag_last"] for s in snapshots)  # The worst worker
+    merged["time"] = max(s["time"] for s in snapshots)
+    return merged
+
+
+def json_view(routes, servers):
+    latency, responses = routes.snapshot()
+    route_view = {}
+    for (route, method), histogram in sorted(latency.items()):
+        entry = summarize(histogram)
+        entry["statuses"] = {str(status): count for (r, m, status), count in responses.items() if (r, m) == (route, method)}
+        route_view[f"{method} {route}"] = entry
+
+    server_view = None
+    server_age = min((age for _, age in servers.values()), default=None)
+    if servers:
+        # Workers that stopped reporting still count towards totals but not towards current gauges
+        live = [server for server, age in servers.values() if _server_up(server, age)]
+        server_view = dict(merge_servers([server for server, _ in servers.values()]))
+        if live and len(live) < len(servers):
+            current = merge_servers(live)
+            for key in ("clients", "event_rates", "received_rates", "client_rates", "queue_depth", "loop_lag_last"):
+                server_view[key] = current[key]
+        server_view["loop_lag"] = summarize(server_view.get("loop_lag_seconds"))
+        server_view["persist"] = {store: summarize(h) for store, h in server_view.get("persist_seconds", {}).items()}
+        server_view["queue_wait"] = {priority: summarize(h)
+                                     for priority, h in server_view.get("queue_wait_seconds", {}).items()}
+    shards = None
+    if any(shard is not None for shard in servers):
+        shards = {str(shard): {"up": _server_up(server, age), "age_seconds": age, "clients": server["clients"],
+                               "event_rate": round(sum(server["event_rates"].values()), 2)}
+                  for shard, (server, age) in sorted(servers.items(), key=lambda item: str(item[0]))}
+    return {
+        "server_up": any(_server_up(server, age) for server, age in servers.values()),
+        "server_age_seconds": server_age,
+        "server": server_view,
+        "shards": shards,
+        "routes": route_view,
+    }
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Exposition:
+    def __init__(self):
+        self.lines = []
+
+    def metric(self, name, kind, help_text, samples):
+        # samples: [(labels, value)]
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            self.lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+    def histogram(self, name, help_text, histograms):
+        # histograms: [(labels, snapshot)]
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} histogram")
+        for labels, histogram in histograms:
+            cumulative = 0
+            for bound, count in zip(histogram["buckets"] + [math.inf], histogram["counts"]):
+                cumulative += count
+                self.lines.append(f"{name}_bucket{_labels({**labels, 'le': _number(float(bound))})} {cumulative}")
+            self.lines.append(f"{name}_sum{_labels(labels)} {_number(float(histogram['sum']))}")
+            self.lines.append(f"{name}_count{_labels(labels)} {histogram['count']}")
+
+    def text(self):
+        return "\n".join(self.lines) + "\n"
+
+
+def _shard_labels(shard):
+    return {} if shard is None else {"shard": str(shard)}
+
+
+def prometheus_text(routes, servers):
+    out = _Exposition()
+    latency, responses = routes.snapshot()
+    out.histogram("mc_webapp_request_duration_seconds", "Dashboard request latency by route.",
+                  [({"route": route, "method": method}, h) for (route, method), h in sorted(latency.items())])
+    out.metric("mc_webapp_requests_total", "counter", "Dashboard responses by route and status.",
+               [({"route": route, "method": method, "status": status}, count)
+                for (route, method, status), count in sorted(responses.items())])
+
+    # One series per worker, labelled with its shard when the server runs several
+    workers = [(_shard_labels(shard), server, age)
+               for shard, (server, age) in sorted(servers.items(), key=lambda item: str(item[0]))]
+    out.metric("mc_server_up", "gauge", "1 if the ingest server reported metrics in the last "
+               f"{SERVER_STALE_AFTER:g} seconds.",
+               [(labels, int(_server_up(server, age))) for labels, server, age in workers] or [({}, 0)])
+    if not workers:
+        return out.text()
+
+    def each(key, label=None):
+        # Samples of one metric across workers; `label` names the key of a per-item dict
+        if label is None:
+            return [(labels, server[key]) for labels, server, _ in workers]
+        return [({**labels, label: item}, n) for labels, server, _ in workers for item, n in sorted(server[key].items())]
+
+    out.metric("mc_server_metrics_age_seconds", "gauge", "Seconds since the last server metrics snapshot.",
+               [(labels, round(age, 3)) for labels, _, age in workers])
+    out.metric("mc_server_clients", "gauge", "Connected Minecraft clients.", each("clients"))
+    out.metric("mc_server_messages_total", "counter", "WebSocket messages received.", each("messages"))
+    out.metric("mc_server_json_parse_failures_total", "counter", "Messages that were not valid JSON.",
+               each("json_parse_failures"))
+    out.metric("mc_server_events_received_total", "counter", "Event messages received, before the ingest filter.",
+               each("events_received", "event"))
+    out.metric("mc_server_events_total", "counter", "Events accepted and stored.", each("events_accepted", "event"))
+    out.metric("mc_server_event_rate", "gauge", "Events stored per second over the last interval.",
+               each("event_rates", "event"))
+    out.metric("mc_server_client_message_rate", "gauge", "Messages per second from each of the busiest clients.",
+               each("client_rates", "client"))
+    out.metric("mc_server_persisted_total", "counter", "Items written by each store.", each("persisted", "store"))
+    out.histogram("mc_server_persist_duration_seconds", "Time per write, by store.", each("persist_seconds", "store"))
+    out.metric("mc_server_writer_queue_depth", "gauge", "Items waiting to be written, by store.",
+               each("queue_depth", "store"))
+    out.metric("mc_server_shed_total", "counter", "Events dropped by the ingest queues under load.",
+               each("shed", "event"))
+    out.metric("mc_server_backpressure_waits_total", "counter", "Times a client's reads paused for the ingest consumer.",
+               each("backpressure_waits"))
+    out.histogram("mc_server_ingest_wait_seconds", "Time a message waited in its client's ingest queue, by priority.",
+                  each("queue_wait_seconds", "priority"))
+    out.histogram("mc_server_event_loop_lag_seconds", "How late the event loop wakes from a sleep.",
+                  each("loop_lag_seconds"))
+    out.metric("mc_server_event_loop_lag_last_seconds", "gauge", "Most recent event-loop lag probe.",
+               each("loop_lag_last"))
+    out.metric("mc_server_cpu_seconds_total", "counter", "CPU time used by the ingest server.",
+               [(labels, round(server["cpu_seconds"], 3)) for labels, server, _ in workers])
+    return out.text()
@@ -0,0 +1,203 @@
+import argparse
+import re
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+import textstat
+
+# Batch readability engine with textstat's (en) formulas.
+#
+# textstat re-tokenizes and re-syllabifies a text on every call, and its
+# per-call caches hold only 128 texts, so scoring a lang file line by line
+# hyphenates the same few hundred words thousands of times. Here all lines
+# are tokenized together in a few regex passes over the joined text,
+# syllable counts and difficult-word status are memoized per unique word for
+# the life of the process, and per-line Flesch-Kincaid grades come out of
+# NumPy arrays of word, sentence and syllable counts. Results follow
+# textstat's rounding, so they match it line for line.
+#
+# Benchmark against textstat on real files:
+#   python readability.py path/to/en_US.lang [more.lang ...]
+
+FRE_BASE = 206.835
+FRE_SENTENCE_LENGTH = 1.015
+FRE_SYLL_PER_WORD = 84.6
+DIFFICULT_SYLLABLES = 2
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_SENTENCE_RE = re.compile(r"\b[^.!?]+[.!?]*")
+_LINE_FRAGMENT_RE = re.compile(r"\b[^.!?\n]+[.!?]*|\n")
+_DIFFICULT_TOKEN_RE = re.compile(r"[\w\='‘’]+")
+
+_syllables = {}
+_difficult = {}
+
+
+def _legacy_round(number, points):
+    # textstat's half-away-from-zero rounding, for scalars or arrays
+    p = 10 ** points
+    return np.floor(number * p + np.copysign(0.5, number)) / p
+
+
+def _syllable_counts(words):
+    # Syllables of each word; only words never seen before are hyphenated
+    for word in dict.fromkeys(words):
+        if word not in _syllables:
+            _syllables[word] = textstat.syllable_count(word)
+    return np.fromiter(map(_syllables.__getitem__, words), dtype=np.int64, count=len(words))
+
+
+def _is_difficult(word, syllable_threshold=DIFFICULT_SYLLABLES):
+    key = (word, syllable_threshold)
+    difficult = _difficult.get(key)
+    if difficult is None:
+        difficult = _difficult[key] = textstat.is_difficult_word(word, syllable_threshold)
+    return difficult
+
+
+def _fragment_words(fragments):
+    # Word count of each sentence fragment, with one regex pass over all of them
+    cleaned = _PUNCT_RE.sub("", "\n".join(fragments)).split("\n")
+    return np.fromiter((len(fragment.split()) for fragment in cleaned), dtype=np.int64, count=len(fragments))
+
+
+def _sentence_count(text):
+    # Fragments of two words or fewer don't count as sentences. A newline
+    # splits words the same as a space, so fragments are kept on one line.
+    sentences = _SENTENCE_RE.findall(text.replace("\n", " "))
+    if not sentences:
+        return 1
+    return max(1, int((_fragment_words(sentences) > 2).sum()))
+
+
+def _line_sentence_counts(text, line_count):
+    # _sentence_count of every line of a newline-joined text, in one pass
+    pieces = _LINE_FRAGMENT_RE.findall(text)
+    is_break = np.fromiter((piece == "\n" for piece in pieces), dtype=bool, count=len(pieces))
+    fragments = [piece for piece in pieces if piece != "\n"]
+    if not fragments:
+        return np.ones(line_count, dtype=np.int64)
+    owners = np.cumsum(is_break)[~is_break]
+    sentences = owners[_fragment_words(fragments) > 2]
+    return np.maximum(1, np.bincount(sentences, minlength=line_count))
+
+
+def _averages(words, sentences, syllables):
+    # Rounded words per sentence and syllables per word, 0 where there are no words
+    has_words = words > 0
+    safe_words = np.where(has_words, words, 1)
+    sentence_length = np.where(has_words, _legacy_round(words / sentences, 1), 0.0)
+    syllables_per_word = np.where(has_words, _legacy_round(syllables / safe_words, 1), 0.0)
+    return sentence_length, syllables_per_word
+
+
+def _grade(sentence_length, syllables_per_word):
+    return _legacy_round(0.39 * sentence_length + 11.8 * syllables_per_word - 15.59, 1)
+
+
+def line_grades(lines):
+    # Flesch-Kincaid grade of every line, as textstat.flesch_kincaid_grade(line) would give
+    if not lines:
+        return []
+    text = "\n".join(lines)
+    if text.count("\n") != len(lines) - 1:
+        # A newline inside a line scores the same as a space
+        text = "\n".join(line.replace("\n", " ") for line in lines)
+
+    lowered_lines = _PUNCT_RE.sub("", text.lower()).split("\n")
+    word_counts = np.fromiter((len(line.split()) for line in lowered_lines), dtype=np.int64, count=len(lines))
+    syllables = _syllable_counts(" ".join(lowered_lines).split())
+    owners = np.repeat(np.arange(len(lines)), word_counts)
+    line_syllables = np.bincount(owners, weights=syllables, minlength=len(lines))
+    sentence_counts = _line_sentence_counts(text, len(lines))
+    return _grade(*_averages(word_counts, sentence_counts, line_syllables)).tolist()
+
+
+def text_metrics(text):
+    # Whole-text metrics with the same names and values as the textstat functions
+    word_syllables = _syllable_counts(_PUNCT_RE.sub("", text.lower()).split())
+    words = len(word_syllables)
+    sentences = _sentence_count(text)
+    sentence_length, syllables_per_word = (
+        float(value) for value in _averages(np.array(words), np.array(sentences), word_syllables.sum()))
+
+    reading_ease = FRE_BASE - FRE_SENTENCE_LENGTH * sentence_length - FRE_SYLL_PER_WORD * syllables_per_word
+
+    smog = 0.0
+    if sentences >= 3:
+        polysyllables = int((word_syllables >= 3).sum())
+        smog = _legacy_round(1.043 * (30 * (polysyllables / sentences)) ** .5 + 3.1291, 1)
+
+    # Occurrences of each distinct word, as textstat's difficult-word checks see them
+    frequencies = Counter(_DIFFICULT_TOKEN_RE.findall(text.lower()))
+    difficult_words = {word: count for word, count in frequencies.items() if _is_difficult(word)}
+
+    dale_chall = 0.0
+    ari = 0.0
+    if words:
+        not_easy = sum(1 for word in frequencies if _is_difficult(word, 0))
+        percent_difficult = 100 - float(words - not_easy) / float(words) * 100
+        dale_chall = 0.1579 * percent_difficult + 0.0496 * sentence_length
+        if percent_difficult > 5:
+            dale_chall += 3.6365
+        dale_chall = _legacy_round(dale_chall, 2)
+
+        characters = len("".join(text.split()))
+        ari = _legacy_round(4.71 * _legacy_round(characters / words, 2)
+                            + 0.5 * _legacy_round(words / sentences, 2) - 21.43, 1)
+
+    return {
+        "Flesch Reading Ease": float(_legacy_round(reading_ease, 2)),
+        "Flesch-Kincaid Grade": float(_grade(sentence_length, syllables_per_word)),
+        "SMOG Index": float(smog),
+        "Dale-Chall Score": float(dale_chall),
+        "Automated Readability Index": float(ari),
+        "Difficult Word Count": len(difficult_words),
+        "Difficult Words": difficult_words,
+    }
+
+
+def _benchmark(values):
+    # Returns (textstat seconds, cold engine seconds, warm engine seconds, largest per-line difference)
+    joined = "\n".join(values)
+    started = time.perf_counter()
+    expected = [textstat.flesch_kincaid_grade(value) for value in values]
+    for metric in (textstat.flesch_reading_ease, textstat.flesch_kincaid_grade, textstat.smog_index,
+                   textstat.dale_chall_readability_score, textstat.automated_readability_index,
+                   textstat.difficult_words_list):
+        metric(joined)
+    reference_seconds = time.perf_counter() - started
+
+    _syllables.clear()
+    _difficult.clear()
+    timings = []
+    for _ in range(2):
+        started = time.perf_counter()
+        grades = line_grades(values)
+        text_metrics(joined)
+        timings.append(time.perf_counter() - started)
+
+    difference = max((abs(a - b) for a, b in zip(expected, grades)), default=0.0)
+    return reference_seconds, timings[0], timings[1], difference
+
+
+def main(argv=None):
+    from lang_parser import parse_file
+
+    parser = argparse.ArgumentParser(description="Benchmark the readability engine against textstat")
+    parser.add_argument("files", nargs="+", help=".lang files")
+    args = parser.parse_args(argv)
+
+    print(f"{'File':40} {'Lines':>7} {'textstat':>9} {'cold':>7} {'warm':>7} {'speedup':>8} {'max diff':>9}")
+    for path in args.files:
+        values = [entry.value for entry in parse_file(path) if entry.is_text]
+        reference, cold, warm, difference = _benchmark(values)
+        print(f"{path[-40:]:40} {len(values):>7} {reference:>8.2f}s {cold:>6.2f}s {warm:>6.2f}s "
+              f"{reference / max(cold, 1e-9):>7.1f}x {difference:>9.3g}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,348 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from event_store import session_segments, segment_name, iter_events, load_positions
+from catalog import seek_positions
+
+# Time-windowed queries over a session.
+#
+# Each session gets a time index: one fixed-width record per journaled event
+# holding its timestamp, event type, player, segment and byte offset. Like the
+# /analyze aggregates it is built incrementally (only events appended since
+# the last query are parsed) and kept on disk under DATA_DIR/.cache/query/.
+# Queries binary-search the sorted timestamps for the window and aggregate
+# the matching slice with NumPy; PlayerTransform samples are counted straight
+# from the memory-mapped positions.bin, from the catalog checkpoint before the
+# window on. Raw events are only read back, by offset, when a query asks for
+# a few of them.
+
+INDEX_VERSION = 1
+INDEX_DTYPE = np.dtype([
+    ("t", "<f8"),
+    ("event", "<u2"),
+    ("player", "<u2"),
+    ("segment", "<u2"),
+    ("offset", "<u8"),
+])
+NO_PLAYER = 0xFFFF
+
+MAX_BUCKETS = 2000
+MAX_EVENTS = 200
+
+_lock = threading.Lock()
+_indexes = {}
+
+
+class QueryError(Exception):
+    pass
+
+
+class SessionIndex:
+    def __init__(self):
+        self.segments = {}        # Segment name -> byte offset indexed up to (or [size, mtime_ns] for .json)
+        self.segment_names = []
+        self.event_names = []
+        self.player_names = []
+        self.records = np.empty(0, dtype=INDEX_DTYPE)
+        self.sorted_records = self.records
+
+    def _id(self, names, name):
+        try:
+            return names.index(name)
+        except ValueError:
+            names.append(name)
+            return len(names) - 1
+
+    def add(self, segment, offset, event):
+        body = event.get("body") or {}
+        player = (body.get("player") or {}).get("name") or body.get("sender")
+        timestamp = event.get("timestamp")
+        t = datetime.fromisoformat(timestamp).timestamp() if timestamp else 0.0
+        return (t, self._id(self.event_names, event.get("event")),
+                self._id(self.player_names, player) if player else NO_PLAYER,
+                self._id(self.segment_names, segment), offset)
+
+    def extend(self, rows):
+        if not rows:
+            return
+        self.records = np.concatenate([self.records, np.array(rows, dtype=INDEX_DTYPE)])
+        self._sort()
+
+    def _sort(self):
+        t = self.records["t"]
+        if len(t) > 1 and (np.diff(t) < 0).any():
+            self.sorted_records = self.records[np.argsort(t, kind="stable")]
+        else:
+            self.sorted_records = self.records
+
+    def meta(self):
+        return {
+            "version": INDEX_VERSION,
+            "count": len(self.records),
+            "segments": self.segments,
+            "segment_names": self.segment_names,
+            "event_names": self.event_names,
+            "player_names": self.player_names,
+        }
+
+
+# ── Building ─────────────────────────────────────────────────────
+
+def _index_paths(cache_dir, path):
+    return cache_dir / f"{path.name}.idx", cache_dir / f"{path.name}.json"
+
+
+def _load_index(cache_dir, path):
+    index = _indexes.get(path)
+    if index is not None:
+        return index
+    index = SessionIndex()
+    records_path, meta_path = _index_paths(cache_dir, path)
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_VERSION:
+            return index
+        records = np.fromfile(records_path, dtype=INDEX_DTYPE, count=meta["count"])
+    except (OSError, ValueError, KeyError):
+        return index
+    if len(records) != meta["count"]:
+        return index
+    index.segments = meta["segments"]
+    index.segment_names = meta["segment_names"]
+    index.event_names = meta["event_names"]
+    index.player_names = meta["player_names"]
+    index.records = records
+    index._sort()
+    return index
+
+
+def _save_index(cache_dir, path, index, new_rows, rebuilt):
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    records_path, meta_path = _index_paths(cache_dir, path)
+    # Records first, then the meta that says how many of them are valid
+    if rebuilt:
+        index.records.tofile(records_path)
+    elif new_rows:
+        with open(records_path, "ab") as f:
+            f.write(np.array(new_rows, dtype=INDEX_DTYPE).tobytes())
+    tmp_path = meta_path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index.meta(), f)
+    os.replace(tmp_path, meta_path)
+
+
+def _is_stale(index, path, segments):
+    current = {segment_name(path, segment): segment for segment in segments}
+    if set(index.segments) - set(current):
+        return True
+    for name, mark in index.segments.items():
+        stat = current[name].stat()
+        if isinstance(mark, list):
+            if mark != [stat.st_size, stat.st_mtime_ns]:
+                return True
+        elif stat.st_size < mark:
+            return True
+    return False
+
+
+def _read_indexed(index, segment, name, offset):
+    # Index rows for complete JSONL lines after `offset`, and the new offset
+    rows = []
+    with segment.open("rb") as f:
+        f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            line = raw.strip()
+            if line:
+                try:
+                    event = json.loads(line)
+                    # PlayerTransform samples are counted from the position records instead
+                    if event.get("event") != "PlayerTransform":
+                        rows.append(index.add(name, offset, event))
+                except (json.JSONDecodeError, ValueError, TypeError, AttributeError):
+                    pass
+            offset += len(raw)
+    return rows, offset
+
+
+def session_index(cache_dir, path):
+    with _lock:
+        index = _load_index(cache_dir, path)
+        segments = session_segments(path)
+        rebuilt = _is_stale(index, path, segments)
+        if rebuilt:
+            index = SessionIndex()
+
+        new_rows = []
+        changed = rebuilt
+        for segment in segments:
+            name = segment_name(path, segment)
+            mark = index.segments.get(name)
+            if segment.suffix == ".json":
+                if mark is not None:
+                    continue
+                stat = segment.stat()
+                # Legacy arrays have no byte offsets; the offset is the position in the array
+                for position, event in enumerate(iter_events(segment)):
+                    if isinstance(event, dict) and event.get("event") != "PlayerTransform":
+                        new_rows.append(index.add(name, position, event))
+                index.segments[name] = [stat.st_size, stat.st_mtime_ns]
+                changed = True
+            else:
+                offset = mark or 0
+                if segment.stat().st_size == offset:
+                    continue
+                rows, offset = _read_indexed(index, segment, name, offset)
+                new_rows.extend(rows)
+                index.segments[name] = offset
+                changed = True
+
+        if changed:
+            index.extend(new_rows)
+            _save_index(cache_dir, path, index, new_rows, rebuilt)
+        _indexes[path] = index
+        return index
+
+
+# ── Queries ──────────────────────────────────────────────────────
+
+def _window(t, start, end):
+    # Slice of sorted timestamps t in [start, end)
+    lo = 0 if start is None else int(np.searchsorted(t, start, side="left"))
+    hi = len(t) if end is None else int(np.searchsorted(t, end, side="left"))
+    return slice(lo, max(lo, hi))
+
+
+def _sorted_positions(records):
+    t = records["t"]
+    if len(t) > 1 and (np.diff(t) < 0).any():
+        return records[np.argsort(t, kind="stable")]
+    return records
+
+
+def _read_events(path, index, rows):
+    events = []
+    arrays = {}
+    for row in rows:
+        segment = path / index.segment_names[row["segment"]] if path.is_dir() else path
+        if segment.suffix == ".json":
+            if segment not in arrays:
+                arrays[segment] = list(iter_events(segment))
+            events.append(arrays[segment][row["offset"]])
+            continue
+        with segment.open("rb") as f:
+            f.seek(int(row["offset"]))
+            events.append(json.loads(f.readline()))
+    return events
+
+
+def query_session(cache_dir, path, start=None, end=None, player=None, event=None, bucket=None, limit=0,
+                  positions_cache=None):
+    index = session_index(cache_dir, path)
+    records = index.sorted_records
+    recorded, position_names = load_positions(path, positions_cache)
+    # From start on, only samples after the catalog checkpoint before it can be in the window.
+    # Samples are stored in the order the ingest queues released them, which is not quite time
+    # order, so the session's bounds are the minimum and maximum over all of them.
+    positions = _sorted_positions(seek_positions(path, recorded, start) if start is not None else recorded)
+    if start is None:
+        bounds = (positions["t"][:1], positions["t"][-1:])
+    elif len(recorded):
+        bounds = (np.array([recorded["t"].min()]), np.array([recorded["t"].max()]))
+    else:
+        bounds = ()
+
+    # Session range, over events and position samples
+    times = [a for a in (records["t"][:1], records["t"][-1:], *bounds) if len(a)]
+    session_start = float(min(a[0] for a in times)) if times else None
+    session_end = float(max(a[0] for a in times)) if times else None
+    window_start = start if start is not None else session_start
+    window_end = end if end is not None else (session_end + 1e-6 if session_end is not None else None)
+
+    selected = records[_window(records["t"], start, end)]
+    samples = positions[_window(positions["t"], start, end)]
+
+    if player is not None:
+        player_id = index.player_names.index(player) if player in index.player_names else -1
+        selected = selected[selected["player"] == player_id]
+        position_id = position_names.index(player) if player in position_names else -1
+        samples = samples[samples["player"] == position_id]
+
+    event_names = list(index.event_names)
+    event_ids = selected["event"].astype(np.int64)
+    player_ids = selected["player"].astype(np.int64)
+    if event is not None:
+        keep = event_ids == (event_names.index(event) if event in event_names else -1)
+        selected, event_ids, player_ids = selected[keep], event_ids[keep], player_ids[keep]
+    include_positions = event in (None, "PlayerTransform") and len(samples)
+
+    # Totals per event type, and per player per event type
+    type_counts = np.bincount(event_ids, minlength=len(event_names))
+    event_types = {event_names[i]: int(n) for i, n in enumerate(type_counts) if n}
+    by_player = {}
+    if len(selected):
+        pairs, counts = np.unique(player_ids * len(event_names) + event_ids, return_counts=True)
+        for pair, count in zip(pairs.tolist(), counts.tolist()):
+            player_id, event_id = divmod(pair, len(event_names))
+            name = index.player_names[player_id] if player_id != NO_PLAYER else "(none)"
+            by_player.setdefault(name, {})[event_names[event_id]] = count
+    if include_positions:
+        event_types["PlayerTransform"] = len(samples)
+        sample_counts = np.bincount(samples["player"], minlength=len(position_names))
+        for player_id, count in enumerate(sample_counts.tolist()):
+            if count:
+                by_player.setdefault(position_names[player_id], {})["PlayerTransform"] = count
+
+    seconds = max(0.0, window_end - window_start) if window_start is not None and window_end is not None else 0
+    result = {
+        "session": {"start": session_start, "end": session_end},
+        "window": {"start": window_start, "end": window_end, "seconds": seconds},
+        "total_events": sum(event_types.values()),
+        "event_types": event_types,
+        "players": by_player,
+        "rates_per_minute": {name: round(count / seconds * 60, 3) for name, count in event_types.items()} if seconds > 0 else {},
+    }
+
+    if bucket:
+        if window_start is None or window_end is None:
+            result["buckets"] = None  # No window to divide: an empty session with an open-ended window
+        else:
+            result["buckets"] = _bucketed(selected["t"], event_ids, event_names,
+                                          samples["t"] if include_positions else None,
+                                          window_start, window_end, bucket)
+
+    if limit:
+        # The most recent matching events, read back by offset
+        result["events"] = _read_events(path, index, selected[-min(limit, MAX_EVENTS):])
+    return result
+
+
+def _bucketed(t, event_ids, event_names, sample_t, start, end, size):
+    count = int(np.ceil((end - start) / size))
+    if count > MAX_BUCKETS:
+        raise QueryError(f"Too many buckets ({count}); use a larger bucket size or a shorter window")
+    count = max(1, count)
+
+    series = {}
+    cells = np.minimum(((t - start) // size).astype(np.int64), count - 1)
+    grid = np.bincount(event_ids * count + cells, minlength=len(event_names) * count).reshape(len(event_names), count)
+    for event_id, row in enumerate(grid):
+        if row.any():
+            series[event_names[event_id]] = row.tolist()
+    if sample_t is not None:
+        sample_cells = np.minimum(((sample_t - start) // size).astype(np.int64), count - 1)
+        series["PlayerTransform"] = np.bincount(sample_cells, minlength=count).tolist()
+
+    return {
+        "start": start,
+        "size": size,
+        "count": count,
+        "counts": series,
+        "per_minute": {name: [round(n / size * 60, 3) for n in row] for name, row in series.items()},
+    }
@@ -0,0 +1,52 @@
+import json
+
+from analysis_cache import session_aggregates
+from event_store import iter_events, read_new_events
+
+# Torn journal tails: a crash mid-write leaves a partial last line, which
+# readers skip until the rest of it arrives.
+
+
+def _line(event, player, second):
+    return json.dumps({"event": event, "timestamp": f"2026-01-01T10:00:{second:02d}",
+                       "body": {"player": {"name": player}}}) + "\n"
+
+
+def _session(tmp_path):
+    session = tmp_path / "events_2026-01-01_10-00-00"
+    session.mkdir()
+    segment = session / "segment_00001.jsonl"
+    complete = _line("PlayerJoin", "alex", 0) + _line("PlayerMessage", "alex", 1)
+    torn = _line("PlayerLeave", "alex", 2)
+    segment.write_text(complete + torn[:20], encoding="utf-8")
+    return session, segment, complete, torn
+
+
+def test_torn_tail_is_skipped(tmp_path):
+    session, _, _, _ = _session(tmp_path)
+    assert [e["event"] for e in iter_events(session)] == ["PlayerJoin", "PlayerMessage"]
+
+
+def test_torn_tail_is_read_once_complete(tmp_path):
+    _, segment, complete, torn = _session(tmp_path)
+    events, offset = read_new_events(segment, 0)
+    assert [e["event"] for e in events] == ["PlayerJoin", "PlayerMessage"]
+    assert offset == len(complete.encode("utf-8"))
+
+    with segment.open("a", encoding="utf-8") as f:
+        f.write(torn[20:])
+    events, offset = read_new_events(segment, offset)
+    assert [e["event"] for e in events] == ["PlayerLeave"]
+    assert offset == segment.stat().st_size
+
+
+def test_aggregates_pick_up_a_completed_tail(tmp_path):
+    session, segment, _, torn = _session(tmp_path)
+    cache_dir = tmp_path / "cache"
+    assert session_aggregates(cache_dir, session)["total_events"] == 2
+
+    with segment.open("a", encoding="utf-8") as f:
+        f.write(torn[20:])
+    aggregates = session_aggregates(cache_dir, session)
+    assert aggregates["total_events"] == 3
+    assert aggregates["event_types"] == {"PlayerJoin": 1, "PlayerMessage": 1, "PlayerLeave": 1}
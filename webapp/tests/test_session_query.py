@@ -0,0 +1,61 @@
+import json
+from datetime import datetime
+
+import numpy as np
+
+from event_store import POSITION_DTYPE
+from session_query import query_session
+
+# Windows are [start, end): an event exactly at the end belongs to the next
+# window. Buckets are cut from the window's start.
+
+BASE = datetime(2026, 1, 1, 10, 0, 0).timestamp()
+
+
+def _session(tmp_path, seconds, samples=()):
+    session = tmp_path / "events_2026-01-01_10-00-00"
+    session.mkdir()
+    with (session / "segment_00001.jsonl").open("w", encoding="utf-8") as f:
+        for second in seconds:
+            timestamp = datetime.fromtimestamp(BASE + second).isoformat()
+            f.write(json.dumps({"event": "PlayerMessage", "timestamp": timestamp,
+                                "body": {"sender": "alex", "message": "hi"}}) + "\n")
+    records = np.zeros(len(samples), dtype=POSITION_DTYPE)
+    records["t"] = [BASE + second for second in samples]
+    records.tofile(session / "positions.bin")
+    (session / "players.json").write_text(json.dumps(["alex"]), encoding="utf-8")
+    return session
+
+
+def test_window_includes_start_and_excludes_end(tmp_path):
+    session = _session(tmp_path, [0, 10, 15, 20, 30])
+    result = query_session(tmp_path / "cache", session, start=BASE + 10, end=BASE + 20)
+    assert result["event_types"] == {"PlayerMessage": 2}
+    assert result["players"] == {"alex": {"PlayerMessage": 2}}
+    assert result["window"]["seconds"] == 10
+    assert result["session"] == {"start": BASE, "end": BASE + 30}
+
+
+def test_bucket_boundaries(tmp_path):
+    session = _session(tmp_path, [10, 14.999, 15, 19.999], samples=[10, 16, 20])
+    result = query_session(tmp_path / "cache", session, start=BASE + 10, end=BASE + 20, bucket=5)
+    buckets = result["buckets"]
+    assert buckets["start"] == BASE + 10
+    assert buckets["count"] == 2
+    assert buckets["counts"] == {"PlayerMessage": [2, 2], "PlayerTransform": [1, 1]}
+    assert buckets["per_minute"]["PlayerMessage"] == [24.0, 24.0]
+
+
+def test_session_range_over_unordered_samples(tmp_path):
+    # Samples are stored in queue order, not time order
+    session = _session(tmp_path, [], samples=[5, 0, 9, 7])
+    result = query_session(tmp_path / "cache", session, start=BASE + 1, bucket=5)
+    assert result["session"] == {"start": BASE, "end": BASE + 9}
+    assert result["event_types"] == {"PlayerTransform": 3}
+
+
+def test_empty_session_with_open_window(tmp_path):
+    session = _session(tmp_path, [])
+    result = query_session(tmp_path / "cache", session, start=BASE, bucket=5)
+    assert result["total_events"] == 0
+    assert result["buckets"] is None
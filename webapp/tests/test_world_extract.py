@@ -0,0 +1,53 @@
+import io
+import zipfile
+
+import pytest
+
+from world_extract import UnsafeArchive, extract_world, read_world_texts
+
+# Unsafe archives are rejected before anything is written.
+
+
+def _archive(members, compression=zipfile.ZIP_DEFLATED):
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w", compression) as zf:
+        for name, content in members:
+            zf.writestr(name, content)
+    data.seek(0)
+    return data
+
+
+def test_extracts_only_text_members(tmp_path):
+    archive = _archive([("texts/en_US.lang", "a=Hello"), ("db/000001.ldb", b"\0" * 100), ("levelname.txt", "World")])
+    extracted = extract_world(archive, tmp_path)
+    assert sorted(p.relative_to(tmp_path).as_posix() for p in extracted) == ["levelname.txt", "texts/en_US.lang"]
+    assert (tmp_path / "texts" / "en_US.lang").read_text() == "a=Hello"
+
+
+@pytest.mark.parametrize("name", ["../evil.lang", "/abs/evil.lang", "texts/../../evil.lang", "C:/evil.lang",
+                                  "..\\evil.lang"])
+def test_traversal_after_valid_members_writes_nothing(tmp_path, name):
+    dest = tmp_path / "world"
+    dest.mkdir()
+    archive = _archive([("texts/en_US.lang", "a=Hello"), ("texts/de_DE.lang", "a=Hallo"), (name, "a=Gotcha")])
+    with pytest.raises(UnsafeArchive):
+        extract_world(archive, dest)
+    assert list(dest.iterdir()) == []
+    assert not (tmp_path / "evil.lang").exists()
+
+
+def test_zip_bomb_is_rejected(tmp_path):
+    archive = _archive([("texts/en_US.lang", "a=Hello"), ("texts/bomb.lang", b"\0" * (8 * 1024 * 1024))])
+    with pytest.raises(UnsafeArchive, match="compression ratio"):
+        extract_world(archive, tmp_path)
+    assert list(tmp_path.iterdir()) == []
+    with pytest.raises(UnsafeArchive):
+        read_world_texts(_archive([("texts/bomb.lang", b"\0" * (8 * 1024 * 1024))]))
+
+
+def test_oversized_member_is_rejected(tmp_path, monkeypatch):
+    monkeypatch.setattr("world_extract.MAX_MEMBER_SIZE", 1024)
+    archive = _archive([("texts/en_US.lang", "x" * 2048)], compression=zipfile.ZIP_STORED)
+    with pytest.raises(UnsafeArchive, match="too large"):
+        extract_world(archive, tmp_path)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,134 @@
+import heapq
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from event_store import load_positions, session_version
+
+# Simplified player paths for /analyze.
+#
+# Each player's samples are snapped to whole blocks and consecutive repeats
+# dropped, then ranked with Douglas-Peucker: every point gets the distance at
+# which the algorithm would first keep it (capped by its parent's, so any
+# threshold gives a valid simplification). Splits are taken best first and
+# stop at MAX_RANKED points per player. The ranking is cached per session
+# version, so any point budget or tolerance is then a cheap selection.
+# Paths are sent as [x0, z0, dx1, dz1, ...] with deltas between kept points.
+
+DEFAULT_POINTS = 500           # Per player
+MAX_RANKED = 5000              # Most points ever returned per player
+MIN_TOLERANCE = 0.5            # Blocks; detail finer than this is never kept
+RANKING_CACHE_SIZE = 16
+ENCODING = "xz-delta"
+
+_rankings = OrderedDict()
+_rankings_lock = threading.Lock()
+
+
+def _dedupe(xz):
+    # Whole-block path without consecutive repeats
+    blocks = np.round(xz).astype(np.int64)
+    if len(blocks) < 2:
+        return blocks
+    moved = np.ones(len(blocks), dtype=bool)
+    moved[1:] = (blocks[1:] != blocks[:-1]).any(axis=1)
+    return blocks[moved]
+
+
+def _split(xs, zs, first, last):
+    # (distance, index) of the point between first and last farthest from the chord
+    x0, z0 = xs[first], zs[first]
+    dx, dz = xs[last] - x0, zs[last] - z0
+    inner_x = xs[first + 1:last] - x0
+    inner_z = zs[first + 1:last] - z0
+    length = math.hypot(dx, dz)
+    if length == 0:
+        distances = np.hypot(inner_x, inner_z)
+    else:
+        distances = np.abs(dx * inner_z - dz * inner_x)
+    i = int(distances.argmax())
+    return distances[i] / (length or 1), first + 1 + i
+
+
+def _importance(points):
+    # Douglas-Peucker rank of every point: inf for the endpoints, 0 for points never kept.
+    # Splits happen best first, so ranking stops after the MAX_RANKED most important points.
+    importance = np.zeros(len(points))
+    if len(points) == 0:
+        return importance
+    importance[[0, -1]] = np.inf
+    xs = points[:, 0].astype(np.float64)
+    zs = points[:, 1].astype(np.float64)
+
+    heap = []
+
+    def push(first, last, ceiling):
+        if last - first < 2:
+            return
+        distance, split = _split(xs, zs, first, last)
+        if distance >= MIN_TOLERANCE:
+            heapq.heappush(heap, (-min(distance, ceiling), first, last, split))
+
+    push(0, len(points) - 1, np.inf)
+    for _ in range(MAX_RANKED):
+        if not heap:
+            break
+        rank, first, last, split = heapq.heappop(heap)
+        importance[split] = -rank
+        push(first, split, -rank)
+        push(split, last, -rank)
+    return importance
+
+
+def _player_rankings(path, version, positions_cache):
+    key = (str(path), version)
+    with _rankings_lock:
+        if key in _rankings:
+            _rankings.move_to_end(key)
+            return _rankings[key]
+
+    records, names = load_positions(path, positions_cache)
+    order = np.argsort(records["t"], kind="stable")
+    players = records["player"][order]
+    xz = np.column_stack([records["x"][order], records["z"][order]])
+    rankings = {}
+    for player_id, name in enumerate(names):
+        points = _dedupe(xz[players == player_id])
+        rankings[name] = (points, _importance(points), int((players == player_id).sum()))
+
+    with _rankings_lock:
+        _rankings[key] = rankings
+        while len(_rankings) > RANKING_CACHE_SIZE:
+            _rankings.popitem(last=False)
+    return rankings
+
+
+def _select(importance, points, tolerance):
+    keep = importance > max(tolerance or 0, 0)
+    if points is not None and keep.sum() > points:
+        candidates = np.flatnonzero(keep)
+        top = np.argpartition(importance[candidates], -points)[-points:]
+        keep = np.zeros(len(importance), dtype=bool)
+        keep[candidates[top]] = True
+    return keep
+
+
+def encode(points):
+    if len(points) == 0:
+        return []
+    deltas = np.diff(points, axis=0, prepend=[[0, 0]])
+    return deltas.ravel().tolist()
+
+
+def player_paths(path, points=DEFAULT_POINTS, tolerance=None, version=None, positions_cache=None):
+    # Returns ({name: encoded path}, {name: {"samples": n, "points": kept}})
+    if version is None:
+        version = session_version(path)
+    paths, stats = {}, {}
+    for name, (blocks, importance, samples) in _player_rankings(path, version, positions_cache).items():
+        kept = blocks[_select(importance, points, tolerance)]
+        paths[name] = encode(kept)
+        stats[name] = {"samples": samples, "points": len(kept)}
+    return paths, stats
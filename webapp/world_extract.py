@@ -0,0 +1,96 @@
+import zipfile
+from pathlib import PurePosixPath
+
+# Selective extraction of .mcworld archives.
+#
+# A world is mostly LevelDB chunk data (db/) that the language tools never
+# look at. The zip central directory is scanned first and only the text
+# members we need are extracted, streamed straight from the upload without
+# saving the archive to disk. In selective or full mode, every member to be
+# extracted is checked against path traversal and zip bombs before the first
+# one is written.
+
+TEXT_SUFFIXES = (".lang",)
+TEXT_NAMES = ("levelname.txt",)
+
+MAX_MEMBER_SIZE = 64 * 1024 * 1024         # Uncompressed, per file
+MAX_TOTAL_SIZE = 256 * 1024 * 1024         # Uncompressed, selective mode
+MAX_TOTAL_SIZE_FULL = 4 * 1024 * 1024 * 1024
+MAX_MEMBERS = 100_000
+MAX_RATIO = 200                            # Uncompressed / compressed, for members over 1 MB
+COPY_CHUNK = 1024 * 1024
+
+
+class UnsafeArchive(Exception):
+    pass
+
+
+def _is_wanted(name, suffixes, names):
+    lower = name.lower()
+    return lower.endswith(suffixes) or PurePosixPath(lower).name in names
+
+
+def _safe_relative(name):
+    # Zip member name -> relative path parts, rejecting anything that escapes the target
+    parts = PurePosixPath(name.replace("\\", "/")).parts
+    if not parts or parts[0] == "/" or ":" in parts[0] or ".." in parts:
+        raise UnsafeArchive(f"Unsafe path in archive: {name}")
+    return parts
+
+
+def _check_members(members, max_total):
+    if len(members) > MAX_MEMBERS:
+        raise UnsafeArchive("Archive has too many files")
+    total = 0
+    for info in members:
+        _safe_relative(info.filename)
+        if info.file_size > MAX_MEMBER_SIZE:
+            raise UnsafeArchive(f"{info.filename} is too large when uncompressed")
+        if info.file_size > COPY_CHUNK and info.file_size > MAX_RATIO * max(1, info.compress_size):
+            raise UnsafeArchive(f"{info.filename} has a suspicious compression ratio")
+        total += info.file_size
+    if total > max_total:
+        raise UnsafeArchive("Archive is too large when uncompressed")
+
+
+def extract_world(fileobj, dest, full=False, suffixes=TEXT_SUFFIXES, names=TEXT_NAMES):
+    # Extracts the wanted members of a .mcworld (a path or seekable file) into dest
+    extracted = []
+    with zipfile.ZipFile(fileobj) as zf:
+        members = [info for info in zf.infolist()
+                   if not info.is_dir() and (full or _is_wanted(info.filename, suffixes, names))]
+        _check_members(members, MAX_TOTAL_SIZE_FULL if full else MAX_TOTAL_SIZE)
+
+        for info in members:
+            target = dest.joinpath(*_safe_relative(info.filename))
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with zf.open(info) as src, open(target, "wb") as out:
+                # Never trust the declared size; stop if the stream runs past it
+                written = 0
+                while True:
+                    chunk = src.read(COPY_CHUNK)
+                    if not chunk:
+                        break
+                    written += len(chunk)
+                    if written > info.file_size:
+                        raise UnsafeArchive(f"{info.filename} is larger than declared")
+                    out.write(chunk)
+            extracted.append(target)
+    return extracted
+
+
+def read_world_texts(fileobj, suffixes=TEXT_SUFFIXES, names=TEXT_NAMES):
+    # Same selection as extract_world, returned in memory as {member name: text}
+    texts = {}
+    with zipfile.ZipFile(fileobj) as zf:
+        members = [info for info in zf.infolist()
+                   if not info.is_dir() and _is_wanted(info.filename, suffixes, names)]
+        _check_members(members, MAX_TOTAL_SIZE)
+        for info in members:
+            with zf.open(info) as src:
+                data = src.read(info.file_size + 1)
+            if len(data) > info.file_size:
+                raise UnsafeArchive(f"{info.filename} is larger than declared")
+            texts[info.filename] = data.decode("utf-8", errors="replace")
+    return texts
+
@@ -0,0 +1,141 @@
+import asyncio
+import sqlite3
+import time
+from collections import Counter
+from pathlib import Path
+
+# Cross-session catalog, written while events are ingested.
+#
+# One small SQLite database in DATA_DIR holds a row per session with its time
+# range and totals, the players seen and counts per event type, so the
+# dashboard can list and filter sessions without opening any of them. Every
+# CHECKPOINT_INTERVAL seconds the server also records a checkpoint: a time T
+# with the positions.bin record index written so far. Every record before it
+# was received before T, so a reader looking for samples from T onwards can
+# seek straight there. (Journaled events need no checkpoints: the dashboard's
+# time index already has the byte offset of each one.)
+#
+# The handler only bumps in-memory counters; the database is updated from a
+# worker thread every CATALOG_INTERVAL seconds and once more at shutdown.
+
+CATALOG_FILE = "catalog.sqlite"
+CATALOG_INTERVAL = 5.0
+CHECKPOINT_INTERVAL = 60.0
+
+# The one schema definition, shared with the dashboard
+SCHEMA = (Path(__file__).resolve().parent / "catalog_schema.sql").read_text(encoding="utf-8")
+
+
+def connect(path):
+    db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")  # The dashboard reads while the server writes
+    db.executescript(SCHEMA)
+    return db
+
+
+class SessionCatalog:
+    def __init__(self, path, session, interval=CATALOG_INTERVAL, checkpoint_interval=CHECKPOINT_INTERVAL, on_error=None, on_write=None):
+        self.path = path
+        self.session = session
+        self.interval = interval
+        self.checkpoint_interval = checkpoint_interval
+        self.on_error = on_error
+        self.on_write = on_write  # Called with (seconds, sessions) after each update
+        self.start_time = None
+        self.end_time = None
+        self.event_counts = Counter()
+        self.players = {}           # Name -> [first seen, last seen, events]
+        self._checkpoints = []      # Recorded but not yet written
+        self._next_checkpoint = 0.0
+        self._db = None
+        self._task = None
+        self._saving = None         # The write in progress on a worker thread
+
+    def record(self, event_name, body, now):
+        if self.start_time is None:
+            self.start_time = now
+        self.end_time = now
+        self.event_counts[event_name] += 1
+        name = (body.get("player") or {}).get("name") or body.get("sender")
+        if name:
+            seen = self.players.get(name)
+            if seen is None:
+                self.players[name] = [now, now, 1]
+            else:
+                seen[1] = now
+                seen[2] += 1
+
+    def checkpoint(self, now, positions):
+        # Only what has already been written: anything still queued was received after `now`
+        self._checkpoints.append((self.session, now, positions.samples_written))
+
+    async def start(self, positions):
+        self._db = await asyncio.to_thread(connect, self.path)
+        await self._save(live=True, positions=positions)
+        self._task = asyncio.create_task(self._run(positions))
+
+    async def close(self, positions):
+        # Call after the position store has flushed, so the last checkpoint covers everything
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._task = None
+        if self._saving is not None:
+            # A save cut short by the cancel is still running on the shared connection; let it finish
+            try:
+                await self._saving
+            except Exception:
+                pass  # Already reported, or covered by the final save
+        self.checkpoint(time.time(), positions)
+        await self._save(live=False, positions=positions)
+        self._db.close()
+
+    async def _run(self, positions):
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.time()
+            if now >= self._next_checkpoint:
+                self.checkpoint(now, positions)
+                self._next_checkpoint = now + self.checkpoint_interval
+            await self._save(live=True, positions=positions)
+
+    async def _save(self, live, positions):
+        started = time.perf_counter()
+        self._saving = asyncio.ensure_future(asyncio.to_thread(self._write, self._snapshot(live, positions)))
+        try:
+            await asyncio.shield(self._saving)  # Cancelling the loop must not abandon a write mid-way
+        except Exception as e:
+            if self.on_error:
+                self.on_error(f"Error updating session catalog: {e}")
+        else:
+            if self.on_write:
+                self.on_write(time.perf_counter() - started, 1)
+
+    def _snapshot(self, live, positions=None):
+        checkpoints, self._checkpoints = self._checkpoints, []
+        return {
+            "session": (self.session, self.start_time, self.end_time,
+                        sum(count for event, count in self.event_counts.items() if event != "PlayerTransform"),
+                        positions.samples_written if positions else 0, int(live), time.time()),
+            "players": [(self.session, name, *seen) for name, seen in self.players.items()],
+            "events": [(self.session, event, count) for event, count in self.event_counts.items()],
+            "checkpoints": checkpoints,
+        }
+
+    def _write(self, snapshot):
+        with self._db:
+            self._db.execute(
+                "INSERT INTO sessions (name, start_time, end_time, events, positions, live, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (name) DO UPDATE SET "
+                "start_time = excluded.start_time, end_time = excluded.end_time, events = excluded.events, "
+                "positions = excluded.positions, live = excluded.live, updated = excluded.updated",
+                snapshot["session"])
+            self._db.executemany(
+                "INSERT OR REPLACE INTO session_players (session, player, first_seen, last_seen, events) "
+                "VALUES (?, ?, ?, ?, ?)", snapshot["players"])
+            self._db.executemany(
+                "INSERT OR REPLACE INTO session_events (session, event, count) VALUES (?, ?, ?)",
+                snapshot["events"])
+            self._db.executemany(
+                "INSERT OR IGNORE INTO checkpoints (session, t, position_index) VALUES (?, ?, ?)",
+                snapshot["checkpoints"])
@@ -0,0 +1,32 @@
+-- Session catalog (DATA_DIR/catalog.sqlite), created by the WebSocket server
+-- (websocket_server/catalog.py) and the dashboard (webapp/catalog.py) alike.
+CREATE TABLE IF NOT EXISTS sessions (
+    name TEXT PRIMARY KEY,
+    start_time REAL,
+    end_time REAL,
+    events INTEGER NOT NULL DEFAULT 0,
+    positions INTEGER NOT NULL DEFAULT 0,
+    live INTEGER NOT NULL DEFAULT 0,
+    updated REAL
+);
+CREATE TABLE IF NOT EXISTS session_players (
+    session TEXT NOT NULL,
+    player TEXT NOT NULL,
+    first_seen REAL,
+    last_seen REAL,
+    events INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (session, player)
+);
+CREATE TABLE IF NOT EXISTS session_events (
+    session TEXT NOT NULL,
+    event TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (session, event)
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    session TEXT NOT NULL,
+    t REAL NOT NULL,
+    position_index INTEGER,
+    PRIMARY KEY (session, t)
+);
+CREATE INDEX IF NOT EXISTS session_players_by_player ON session_players (player);
@@ -0,0 +1,203 @@
+import asyncio
+import json
+import time
+import uuid
+
+# Commands sent to the connected Minecraft clients.
+#
+# Every commandRequest the server sends carries a fresh requestId. The game
+# answers with a commandResponse (or an error) that echoes it, and the
+# handler passes those to the client's ClientCommands, which resolves the
+# future waiting on that id. Requests are pipelined: a client can have up to
+# MAX_IN_FLIGHT commands outstanding, so a batch costs one round-trip rather
+# than one per command. A fan-out sends the whole batch to every client at
+# once and gathers the results, so commanding a full class also takes one
+# round-trip. Each command has a timeout, and a client that disconnects fails
+# its outstanding commands straight away.
+#
+# The dashboard reaches the dispatcher through a line-oriented JSON control
+# port on localhost (one request line in, one result line out). Each ingest
+# worker listens on its own port and reports it with its metrics, so the
+# dashboard can fan out to every worker.
+#
+# Event subscriptions go through the same path, so an error answer to a
+# subscribe request is matched back to its event type and logged.
+
+COMMAND_HOST = "127.0.0.1"  # Commands can /give and /tp; never expose the control port beyond this machine
+COMMAND_PORT = 19141
+COMMAND_TIMEOUT = 10.0
+MAX_TIMEOUT = 60.0
+MAX_IN_FLIGHT = 50   # Per client; the game rejects commands past about 100 outstanding
+MAX_COMMANDS = 100   # Per dashboard request
+MAX_REQUEST_BYTES = 64 * 1024
+
+
+class CommandError(Exception):
+    pass
+
+
+def _request(purpose, body):
+    request_id = str(uuid.uuid4())
+    return request_id, json.dumps({
+        "header": {
+            "version": 1,
+            "requestId": request_id,
+            "messagePurpose": purpose,
+            "messageType": "commandRequest"
+        },
+        "body": body
+    })
+
+
+class ClientCommands:
+    # Outstanding requests of one connection
+    def __init__(self, client, websocket, max_in_flight=MAX_IN_FLIGHT):
+        self.client = client
+        self.websocket = websocket
+        self.player = None            # Name of the player on this connection, once an event names it
+        self._pending = {}            # requestId -> Future of the response body
+        self._subscriptions = {}      # requestId -> event name, until answered
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._closed = False
+
+    @property
+    def in_flight(self):
+        return len(self._pending)
+
+    async def subscribe(self, event_name):
+        request_id, message = _request("subscribe", {"eventName": event_name})
+        self._subscriptions[request_id] = event_name
+        await self.websocket.send(message)
+
+    async def run(self, command_line, timeout=COMMAND_TIMEOUT):
+        # Result of one command; never raises, so one bad client can't spoil a fan-out
+        started = time.perf_counter()
+        result = {"command": command_line}
+        try:
+            body = await asyncio.wait_for(self._send(command_line), timeout)
+        except asyncio.TimeoutError:
+            result["status"] = "timeout"
+        except Exception as e:  # Disconnected, before or while sending
+            result.update(status="failed", message=str(e) or type(e).__name__)
+        else:
+            code = body.get("statusCode", 0)
+            result.update(status="ok" if code == 0 else "failed", statusCode=code,
+                          message=body.get("statusMessage", ""), body=body)
+        result["seconds"] = round(time.perf_counter() - started, 4)
+        return result
+
+    async def _send(self, command_line):
+        async with self._slots:
+            if self._closed:
+                raise CommandError("client disconnected")
+            request_id, message = _request("commandRequest", {
+                "version": 1,
+                "commandLine": command_line,
+                "origin": {"type": "player"}
+            })
+            future = self._pending[request_id] = asyncio.get_running_loop().create_future()
+            try:
+                await self.websocket.send(message)
+                return await future
+            finally:
+                self._pending.pop(request_id, None)
+
+    def answer(self, header, body):
+        # A commandResponse or error from the game. Returns the event name of a failed subscription, if it was one.
+        request_id = header.get("requestId")
+        future = self._pending.pop(request_id, None)
+        if future is not None:
+            if not future.done():
+                future.set_result(body)
+            return None
+        event_name = self._subscriptions.pop(request_id, None)
+        if event_name is not None and (header.get("messagePurpose") == "error" or body.get("statusCode", 0) != 0):
+            return event_name
+        return None
+
+    def close(self):
+        self._closed = True
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(CommandError("client disconnected"))
+        self._pending.clear()
+        self._subscriptions.clear()
+
+
+class CommandDispatcher:
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT, on_error=None):
+        self.max_in_flight = max_in_flight
+        self.on_error = on_error
+        self.clients = {}  # Client address -> ClientCommands
+        self._server = None
+
+    def attach(self, client, websocket):
+        commands = self.clients[client] = ClientCommands(client, websocket, self.max_in_flight)
+        return commands
+
+    def detach(self, client):
+        commands = self.clients.pop(client, None)
+        if commands is not None:
+            commands.close()
+
+    async def fan_out(self, command_lines, timeout=COMMAND_TIMEOUT, targets=None):
+        # Every command to every selected client at once; targets are client addresses or player names
+        selected = [c for c in self.clients.values()
+                    if targets is None or c.client in targets or c.player in targets]
+        started = time.perf_counter()
+        per_client = await asyncio.gather(*(asyncio.gather(*(c.run(line, timeout) for line in command_lines))
+                                            for c in selected))
+        results = [{"client": c.client, "player": c.player, "results": list(r)} for c, r in zip(selected, per_client)]
+        summary = {"ok": 0, "failed": 0, "timeout": 0}
+        for client in results:
+            for result in client["results"]:
+                summary[result["status"]] += 1
+        return {"clients": len(selected), "seconds": round(time.perf_counter() - started, 4),
+                "summary": summary, "results": results}
+
+    # ── Control port ──────────────────────────────────────────────
+
+    async def serve(self, host=COMMAND_HOST, port=COMMAND_PORT):
+        self._server = await asyncio.start_server(self._control, host, port, limit=MAX_REQUEST_BYTES)
+        return self._server
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _control(self, reader, writer):
+        try:
+            try:
+                line = await reader.readline()
+                reply = await self.fan_out(**_parse_control(line))
+            except (ValueError, CommandError) as e:
+                reply = {"error": str(e)}
+            writer.write(json.dumps(reply).encode("utf-8") + b"\n")
+            await writer.drain()
+        except Exception as e:
+            if self.on_error:
+                self.on_error(f"Error on the command port: {e}")
+        finally:
+            writer.close()
+
+
+def _parse_control(line):
+    # {"commands": ["say hi", ...], "timeout": seconds, "clients": [address or player, ...]}
+    request = json.loads(line)
+    if not isinstance(request, dict):
+        raise CommandError("request must be a JSON object")
+    lines = request.get("commands")
+    if not isinstance(lines, list) or not lines or not all(isinstance(c, str) and c.strip() for c in lines):
+        raise CommandError("commands must be a non-empty list of command lines")
+    if len(lines) > MAX_COMMANDS:
+        raise CommandError(f"at most {MAX_COMMANDS} commands per request")
+    timeout = request.get("timeout", COMMAND_TIMEOUT)
+    if not isinstance(timeout, (int, float)) or not 0 < timeout <= MAX_TIMEOUT:
+        raise CommandError(f"timeout must be between 0 and {MAX_TIMEOUT:g} seconds")
+    targets = request.get("clients")
+    if targets is not None and (not isinstance(targets, list) or not all(isinstance(t, str) for t in targets)):
+        raise CommandError("clients must be a list of client addresses or player names")
+    return {"command_lines": [c.strip().removeprefix("/") for c in lines], "timeout": timeout,
+            "targets": set(targets) if targets is not None else None}
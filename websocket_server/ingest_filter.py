@@ -0,0 +1,90 @@
+import json
+import math
+from collections import Counter
+
+# Ingest-stage sampling and deduplication.
+#
+# Minecraft streams PlayerTransform many times a second even when a player is
+# standing still or only turning their head. Rules are set per event type and
+# applied per player, so what gets stored scales with real movement rather
+# than with packet rate:
+#
+#   min_interval  seconds since the player's last accepted event of this type
+#   min_distance  blocks moved since the player's last accepted position
+#   dedupe        drop a body identical to the player's last accepted one
+#
+# Defaults can be overridden with a JSON file of the same shape, e.g.
+#   {"PlayerTransform": {"min_interval": 0.5}, "BlockPlaced": {"dedupe": true}}
+# and a rule set to null turns filtering off for that event type.
+
+DEFAULT_RULES = {
+    "PlayerTransform": {"min_interval": 0.2, "min_distance": 0.25, "dedupe": True},
+}
+
+
+def load_rules(path=None):
+    rules = {event: dict(rule) for event, rule in DEFAULT_RULES.items()}
+    if path is None or not path.exists():
+        return rules
+    with open(path, encoding="utf-8") as f:
+        overrides = json.load(f)
+    for event, rule in overrides.items():
+        if rule is None:
+            rules.pop(event, None)
+        else:
+            rules.setdefault(event, {}).update(rule)
+    return rules
+
+
+def _position(body):
+    pos = body.get("player", {}).get("position")
+    if not pos:
+        return None
+    return (pos.get("x", 0), pos.get("y", 0), pos.get("z", 0))
+
+
+class IngestFilter:
+    def __init__(self, rules=None):
+        self.rules = DEFAULT_RULES if rules is None else rules
+        self.accepted = Counter()  # event name -> count
+        self.dropped = Counter()   # (event name, reason) -> count
+        self._last = {}            # (event name, player) -> (time, position, body fingerprint)
+
+    def accept(self, event_name, body, now):
+        rule = self.rules.get(event_name)
+        if not rule:
+            self.accepted[event_name] += 1
+            return True
+
+        key = (event_name, body.get("player", {}).get("name"))
+        position = _position(body)
+        fingerprint = json.dumps(body, sort_keys=True) if rule.get("dedupe") else None
+        last = self._last.get(key)
+
+        if last is not None:
+            last_time, last_position, last_fingerprint = last
+            reason = None
+            if fingerprint is not None and fingerprint == last_fingerprint:
+                reason = "duplicate"
+            elif now - last_time < rule.get("min_interval", 0):
+                reason = "interval"
+            elif (rule.get("min_distance") and position is not None and last_position is not None
+                  and math.dist(position, last_position) < rule["min_distance"]):
+                reason = "distance"
+            if reason:
+                self.dropped[(event_name, reason)] += 1
+                return False
+
+        self._last[key] = (now, position, fingerprint)
+        self.accepted[event_name] += 1
+        return True
+
+    def forget_player(self, name):
+        for key in [k for k in self._last if k[1] == name]:
+            del self._last[key]
+
+    def stats(self):
+        dropped = {}
+        for (event_name, reason), count in self.dropped.items():
+            dropped.setdefault(event_name, {})[reason] = count
+        return {"accepted": dict(self.accepted), "dropped": dropped}
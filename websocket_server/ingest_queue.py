@@ -0,0 +1,164 @@
+import asyncio
+import time
+from collections import deque
+
+# Per-client ingest queues with a fair, prioritised consumer.
+#
+# A connection's handler only parses each message and queues it under its
+# client. One consumer task does the rest: filtering, recording and
+# persisting. The consumer takes one message from each client in turn (round
+# robin), so a chatty or reconnect-looping client gets the same share as
+# everyone else instead of starving them.
+#
+# Messages fall into two priority classes:
+#
+#   important  PlayerJoin, PlayerLeave, PlayerMessage and other discrete
+#              events. Never dropped, and served from every client before any
+#              sheddable message, so under load their wait grows with the
+#              number of clients rather than with the backlog.
+#   sheddable  PlayerTransform. Each client keeps at most MAX_SHEDDABLE and
+#              drops its oldest past that. While the total backlog is above
+#              SHED_THRESHOLD, new ones are dropped outright. A newer sample
+#              supersedes an old one anyway.
+#
+# Backpressure: once a client has MAX_IMPORTANT important messages waiting,
+# its handler stops reading until the consumer catches up. The socket
+# buffers then fill, so the client absorbs the burst instead of the server's
+# memory.
+
+SHEDDABLE_EVENTS = {"PlayerTransform"}
+MAX_IMPORTANT = 1000   # Per client, before its reads pause
+MAX_SHEDDABLE = 200    # Per client, before its oldest samples are dropped
+SHED_THRESHOLD = 5000  # Total queued messages above which sheddable ones are dropped on arrival
+
+
+class ClientQueue:
+    def __init__(self, client):
+        self.client = client
+        self.important = deque()  # (event name, body, received)
+        self.sheddable = deque()
+        self.closed = False
+        self.has_room = asyncio.Event()
+        self.has_room.set()
+
+
+class IngestQueues:
+    def __init__(self, consume, max_important=MAX_IMPORTANT, max_sheddable=MAX_SHEDDABLE,
+                 shed_threshold=SHED_THRESHOLD, metrics=None, on_error=None, on_overload=None):
+        self.consume = consume  # Awaited with (client, event name, body, received) for each message
+        self.max_important = max_important
+        self.max_sheddable = max_sheddable
+        self.shed_threshold = shed_threshold
+        self.metrics = metrics
+        self.on_error = on_error
+        self.on_overload = on_overload  # Called with True/False as shedding starts and stops
+        self.pending = 0
+        self.overloaded = False
+        self._queues = {}  # Client -> ClientQueue, in round-robin order
+        self._ready = asyncio.Event()
+        self._closing = False
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        # Call once the handlers are done; processes everything still queued
+        if self._task is None:
+            return
+        self._closing = True
+        self._ready.set()
+        await self._task
+        self._task = None
+
+    def open(self, client):
+        queue = self._queues[client] = ClientQueue(client)
+        return queue
+
+    def release(self, queue):
+        # The connection closed; the consumer forgets the queue once it is drained
+        queue.closed = True
+        self._ready.set()
+
+    async def put(self, queue, event_name, body, received):
+        item = (event_name, body, received)
+        if event_name in SHEDDABLE_EVENTS:
+            if self.pending >= self.shed_threshold:
+                self._set_overloaded(True)
+                self._shed(event_name)
+                return
+            if len(queue.sheddable) >= self.max_sheddable:
+                self._shed(queue.sheddable.popleft()[0])
+                self.pending -= 1
+            queue.sheddable.append(item)
+        else:
+            while len(queue.important) >= self.max_important:
+                if self.metrics:
+                    self.metrics.backpressure()
+                queue.has_room.clear()
+                await queue.has_room.wait()
+            if event_name == "PlayerLeave":
+                # Samples from before the leave go ahead of it, or they would put the player back on the map
+                queue.important.extend(queue.sheddable)
+                queue.sheddable.clear()
+            queue.important.append(item)
+        self.pending += 1
+        self._ready.set()
+
+    def _shed(self, event_name):
+        if self.metrics:
+            self.metrics.shed_event(event_name)
+
+    def _set_overloaded(self, overloaded):
+        if overloaded != self.overloaded:
+            self.overloaded = overloaded
+            if self.on_overload:
+                self.on_overload(overloaded)
+
+    # ── Consumer ──────────────────────────────────────────────────
+
+    async def _run(self):
+        while True:
+            if not self.pending:
+                self._take("important")  # Nothing to take; forgets closed queues
+                self._set_overloaded(False)
+                if self._closing:
+                    return
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            await self._round()
+            if self.pending < self.shed_threshold // 2:
+                self._set_overloaded(False)
+            await asyncio.sleep(0)  # Let the handlers read between rounds
+
+    def _take(self, priority):
+        # One message from each client that has one of this priority
+        taken = []
+        for client, queue in list(self._queues.items()):
+            if queue.closed and not queue.important and not queue.sheddable:
+                del self._queues[client]
+                continue
+            items = queue.important if priority == "important" else queue.sheddable
+            if items:
+                taken.append((queue, items.popleft()))
+                if priority == "important" and len(items) < self.max_important:
+                    queue.has_room.set()
+        return taken
+
+    async def _round(self):
+        priority = "important"
+        taken = self._take(priority)
+        if not taken:
+            priority = "sheddable"
+            taken = self._take(priority)
+        self.pending -= len(taken)
+        now = time.time()
+        for queue, (event_name, body, received) in taken:
+            if self.metrics:
+                self.metrics.queued(priority, now - received)
+            try:
+                await self.consume(queue.client, event_name, body, received)
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(f"Error ingesting {event_name} from {queue.client}: {e}")
@@ -0,0 +1,120 @@
+import asyncio
+import json
+import os
+
+# Append-only JSON Lines journal for incoming events.
+#
+# Events are queued by the handler and written by a single background task in
+# batches, so the cost of recording an event stays constant however long the
+# session runs. Each batch is flushed and fsync'd; a crash can at worst lose
+# the batch in flight and leave one torn trailing line, which readers skip.
+#
+# A session is a directory of numbered segment files. Once a segment reaches
+# SEGMENT_MAX_BYTES it is sealed and never touched again, and the pending
+# queue is bounded, so the server's memory stays flat for all-day sessions.
+
+FLUSH_INTERVAL = 1.0  # Max seconds an event waits before being written
+FLUSH_BATCH = 256     # Write early once this many events are pending
+BUFFER_MAX = 10000    # Max events held in memory before handlers wait on the writer
+SEGMENT_MAX_BYTES = 16 * 1024 * 1024
+
+_STOP = object()
+
+
+class EventJournal:
+    def __init__(self, directory, flush_interval=FLUSH_INTERVAL, batch_size=FLUSH_BATCH,
+                 buffer_max=BUFFER_MAX, segment_max_bytes=SEGMENT_MAX_BYTES, fsync=True, on_error=None, on_write=None):
+        self.directory = directory
+        self.on_error = on_error
+        self.on_write = on_write  # Called with (seconds, events) after each batch
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync = fsync
+        self.events_written = 0
+        self.segment_index = 0
+        self._segment_bytes = 0
+        self.position = None  # (segment name, bytes written), replaced as one value for other readers
+        self._queue = asyncio.Queue(maxsize=buffer_max)
+        self._file = None
+        self._task = None
+
+    @property
+    def segment_path(self):
+        return self.directory / f"segment_{self.segment_index:05d}.jsonl"
+
+    def start(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._open_next_segment()
+        self._task = asyncio.create_task(self._run())
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    async def append(self, entry):
+        # Waits only when the writer has fallen BUFFER_MAX events behind
+        await self._queue.put(entry)
+
+    async def close(self):
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        self._file.close()
+
+    def _open_next_segment(self):
+        if self._file is not None:
+            self._file.close()
+        self.segment_index += 1
+        self._file = open(self.segment_path, "a", encoding="utf-8")
+        self._segment_bytes = self._file.tell()
+        self.position = (self.segment_path.name, self._segment_bytes)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                # Drain whatever is already queued before waiting on the clock
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self._queue.get_nowait()
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            started = loop.time()
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(f"Error saving events: {e}")
+            else:
+                if self.on_write:
+                    self.on_write(loop.time() - started, len(batch))
+
+    def _write_batch(self, batch):
+        data = "".join(json.dumps(entry) + "\n" for entry in batch)
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.events_written += len(batch)
+        self._segment_bytes = self._file.tell()
+        self.position = (self.segment_path.name, self._segment_bytes)
+        if self._segment_bytes >= self.segment_max_bytes:
+            self._open_next_segment()
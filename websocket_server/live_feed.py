@@ -0,0 +1,101 @@
+import asyncio
+import json
+import socket
+from collections import Counter
+
+# Live aggregates for the dashboard.
+#
+# Once a second the server sends one UDP datagram to the Flask app on
+# localhost with what changed since the previous one: event counts and rates,
+# joins/leaves, and the latest position of every player who moved. Nothing is
+# sent back, so a dashboard that is not running costs the server nothing.
+# Runtime metrics (metrics.py) ride along in a separate datagram, with the
+# port where this process takes dashboard commands.
+
+LIVE_FEED_HOST = "127.0.0.1"
+LIVE_FEED_PORT = 19140
+PUBLISH_INTERVAL = 1.0
+MAX_DATAGRAM = 60000
+
+
+class LiveStats:
+    def __init__(self, session, client_count, host=LIVE_FEED_HOST, port=LIVE_FEED_PORT, interval=PUBLISH_INTERVAL, metrics=None, shard=None, command_port=None):
+        self.session = session
+        self.shard = shard                # Ingest worker index, when the session is sharded
+        self.command_port = command_port  # Where this process takes dashboard commands (commands.py)
+        self.client_count = client_count  # Callable returning the number of connected clients
+        self.metrics = metrics            # ServerMetrics, sent in a datagram of its own each tick
+        self.address = (host, port)
+        self.interval = interval
+        self.totals = Counter()
+        self._tick_counts = Counter()
+        self._tick_positions = {}
+        self._tick_joined = []
+        self._tick_left = []
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+
+    def record(self, event_name, body, now):
+        self._tick_counts[event_name] += 1
+        player = body.get("player", {})
+        name = player.get("name")
+        if event_name == "PlayerTransform":
+            pos = player.get("position", {})
+            self._tick_positions[name] = [round(pos.get("x", 0), 1), round(pos.get("y", 0), 1), round(pos.get("z", 0), 1), now]
+        elif event_name == "PlayerJoin":
+            self._tick_joined.append(name)
+        elif event_name == "PlayerLeave":
+            self._tick_left.append(name)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        last = loop.time()
+        while True:
+            await asyncio.sleep(self.interval)
+            now = loop.time()
+            self.publish(now - last)
+            last = now
+
+    def publish(self, elapsed):
+        self.totals.update(self._tick_counts)
+        update = {
+            "session": self.session,
+            "shard": self.shard,
+            "clients": self.client_count(),
+            "totals": dict(self.totals),
+            "rates": {name: round(count / elapsed, 2) for name, count in self._tick_counts.items()} if elapsed > 0 else {},
+            "joined": self._tick_joined,
+            "left": self._tick_left,
+            "positions": self._tick_positions,
+        }
+        self._tick_counts = Counter()
+        self._tick_positions = {}
+        self._tick_joined = []
+        self._tick_left = []
+
+        if self.metrics is not None:
+            self._send(json.dumps({"session": self.session, "shard": self.shard, "command_port": self.command_port,
+                                   "metrics": self.metrics.snapshot(elapsed)}).encode("utf-8"))
+
+        data = json.dumps(update).encode("utf-8")
+        if len(data) <= MAX_DATAGRAM:
+            self._send(data)
+            return
+
+        # Too many movers for one datagram; send their positions separately
+        positions = list(update.pop("positions").items())
+        update["positions"] = {}
+        self._send(json.dumps(update).encode("utf-8"))
+        per_datagram = max(1, len(positions) * MAX_DATAGRAM // len(data) // 2)
+        for i in range(0, len(positions), per_datagram):
+            chunk = {"session": self.session, "shard": self.shard, "positions": dict(positions[i:i + per_datagram])}
+            self._send(json.dumps(chunk).encode("utf-8"))
+
+    def _send(self, data):
+        try:
+            self._sock.sendto(data, self.address)
+        except OSError:
+            pass  # Dashboard not listening or buffer full; the next tick carries the totals
+
+    def close(self):
+        self._sock.close()
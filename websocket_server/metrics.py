@@ -0,0 +1,142 @@
+import asyncio
+import bisect
+import os
+import time
+from collections import Counter
+
+# Runtime metrics for the ingest server.
+#
+# Everything here is plain counters and fixed-bucket histograms updated on the
+# event loop, so recording costs a dict update. Once a second the live feed
+# sends snapshot() to the dashboard alongside its aggregates, and the
+# dashboard serves it at /metrics (Prometheus text) and /metrics/json.
+# Counters are totals since the server started; rates are over the last
+# interval. Per-client rates are limited to the MAX_CLIENT_LABELS busiest
+# clients so a full classroom can't blow up the datagram.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LOOP_LAG_INTERVAL = 0.25  # Seconds between event-loop lag probes
+MAX_CLIENT_LABELS = 100
+
+
+class Histogram:
+    # Prometheus-style histogram; snapshots are read by webapp/metrics.py
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        return {"buckets": list(self.buckets), "counts": list(self.counts), "sum": self.sum, "count": self.count}
+
+
+class ServerMetrics:
+    def __init__(self, client_count):
+        self.client_count = client_count  # Callable returning the number of connected clients
+        self.received = Counter()        # Event messages per type, before the ingest filter
+        self.accepted = Counter()        # ... and those stored
+        self.messages = 0                # Every WebSocket message, events or not
+        self.parse_failures = 0
+        self.client_messages = Counter()  # Client address -> messages
+        self.persist_seconds = {}        # Store -> Histogram of seconds per write
+        self.persisted = Counter()       # Store -> items written
+        self.loop_lag = Histogram()
+        self.loop_lag_last = 0.0
+        self.queue_depth = {}            # Store -> callable returning items waiting to be written
+        self.shed = Counter()            # Events dropped by the ingest queues under load, per type
+        self.backpressure_waits = 0      # Times a client's reads paused for the ingest consumer
+        self.queue_wait = {}             # Priority class -> Histogram of seconds queued before ingest
+        self._last_accepted = Counter()
+        self._last_received = Counter()
+        self._last_clients = Counter()
+
+    # ── Recording ─────────────────────────────────────────────────
+
+    def message(self, client):
+        self.messages += 1
+        self.client_messages[client] += 1
+
+    def parse_failure(self):
+        self.parse_failures += 1
+
+    def event(self, event_name, accepted):
+        self.received[event_name] += 1
+        if accepted:
+            self.accepted[event_name] += 1
+
+    def forget_client(self, client):
+        self.client_messages.pop(client, None)
+        self._last_clients.pop(client, None)
+
+    def persist(self, store, seconds, items):
+        histogram = self.persist_seconds.get(store)
+        if histogram is None:
+            histogram = self.persist_seconds[store] = Histogram()
+        histogram.observe(seconds)
+        self.persisted[store] += items
+
+    def shed_event(self, event_name):
+        self.shed[event_name] += 1
+
+    def backpressure(self):
+        self.backpressure_waits += 1
+
+    def queued(self, priority, seconds):
+        histogram = self.queue_wait.get(priority)
+        if histogram is None:
+            histogram = self.queue_wait[priority] = Histogram()
+        histogram.observe(seconds)
+
+    def recorder(self, store):
+        # Callback for a writer's on_write
+        return lambda seconds, items: self.persist(store, seconds, items)
+
+    async def watch_loop_lag(self, interval=LOOP_LAG_INTERVAL):
+        # How late a sleep wakes up: time the loop spent busy with something else
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(interval)
+            self.loop_lag_last = max(0.0, loop.time() - started - interval)
+            self.loop_lag.observe(self.loop_lag_last)
+
+    # ── Snapshot ──────────────────────────────────────────────────
+
+    def _rates(self, totals, last, elapsed):
+        return {key: round((count - last.get(key, 0)) / elapsed, 2) for key, count in totals.items()
+                if count != last.get(key, 0)}
+
+    def snapshot(self, elapsed):
+        elapsed = elapsed if elapsed > 0 else 1.0
+        client_rates = self._rates(self.client_messages, self._last_clients, elapsed)
+        busiest = dict(sorted(client_rates.items(), key=lambda item: -item[1])[:MAX_CLIENT_LABELS])
+        snapshot = {
+            "time": time.time(),
+            "clients": self.client_count(),
+            "messages": self.messages,
+            "json_parse_failures": self.parse_failures,
+            "events_received": dict(self.received),
+            "events_accepted": dict(self.accepted),
+            "event_rates": self._rates(self.accepted, self._last_accepted, elapsed),
+            "received_rates": self._rates(self.received, self._last_received, elapsed),
+            "client_rates": busiest,
+            "persisted": dict(self.persisted),
+            "persist_seconds": {store: histogram.snapshot() for store, histogram in self.persist_seconds.items()},
+            "queue_depth": {store: depth() for store, depth in self.queue_depth.items()},
+            "shed": dict(self.shed),
+            "backpressure_waits": self.backpressure_waits,
+            "queue_wait_seconds": {priority: histogram.snapshot() for priority, histogram in self.queue_wait.items()},
+            "loop_lag_seconds": self.loop_lag.snapshot(),
+            "loop_lag_last": self.loop_lag_last,
+            "cpu_seconds": sum(os.times()[:2]),
+        }
+        self._last_accepted = Counter(self.accepted)
+        self._last_received = Counter(self.received)
+        self._last_clients = Counter(self.client_messages)
+        return snapshot
@@ -1,31 +1,75 @@
 import asyncio
 import websockets
 import json
-import uuid
 import signal
 import sys
 import socket
+import logging
+import os
+import time
 from pathlib import Path
 from datetime import datetime
+from journal import EventJournal
+from telemetry import PositionStore
+from ingest_filter import IngestFilter, load_rules
+from live_feed import LiveStats, LIVE_FEED_PORT
+from catalog import SessionCatalog, CATALOG_FILE
+from metrics import ServerMetrics
+from ingest_queue import IngestQueues
+from commands import CommandDispatcher, COMMAND_PORT
+from sharding import worker_count, shard_index, can_share_port, run_workers, SESSION_ENV, SHARD_DIR
+from server_log import setup_logging, stop_logging
 
 clients = set()
 
 # Setup data file
 BASE_DIR = Path(__file__).resolve().parent
-DATA_DIR = BASE_DIR.parent / "data"
+DATA_DIR = Path(os.environ.get("MC_DATA_DIR", BASE_DIR.parent / "data"))
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-timestamp = datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
-DATA_FILE = DATA_DIR / f"events_{timestamp}.json"
-LOG_FILE = DATA_DIR / f"server_{timestamp}.log"
+# Ingest workers (see sharding.py) share the supervisor's session and each write a shard of it
+SHARD = shard_index()
+WORKERS = worker_count() if SHARD is None else 1
 
-event_log = []
+timestamp = os.environ.get(SESSION_ENV) or datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
+SESSION_NAME = f"events_{timestamp}"
+if SHARD is None:
+    SESSION_DIR = DATA_DIR / SESSION_NAME
+    CATALOG_NAME = SESSION_NAME
+    LOG_FILE = DATA_DIR / f"server_{timestamp}.log"
+else:
+    SESSION_DIR = DATA_DIR / SESSION_NAME / SHARD_DIR.format(SHARD)
+    CATALOG_NAME = f"{SESSION_NAME}/{SESSION_DIR.name}"
+    LOG_FILE = DATA_DIR / f"server_{timestamp}_{SESSION_DIR.name}.log"
 
-# Set up logging function
-def log_message(message):
-    with open(LOG_FILE, "a") as log_file:
-        log_file.write(f"{datetime.now().isoformat()} - {message}\n")
-    print(message)  # Print to console as well
+# Optional per-event sampling/dedup rules (see ingest_filter.py)
+INGEST_RULES_FILE = Path(os.environ.get("MC_INGEST_FILTER", BASE_DIR / "ingest_filter.json"))
+
+journal = None
+positions = None
+ingest_filter = IngestFilter(load_rules(INGEST_RULES_FILE))
+metrics = ServerMetrics(lambda: len(clients))
+catalog = SessionCatalog(DATA_DIR / CATALOG_FILE, CATALOG_NAME, on_error=lambda message: log_message(message, logging.ERROR),
+                         on_write=metrics.recorder("catalog"))
+commands = CommandDispatcher(on_error=lambda message: log_message(message, logging.ERROR))
+
+# Dashboard command port on localhost (see commands.py); each ingest worker takes the next one up
+COMMAND_PORT = int(os.environ.get("MC_COMMAND_PORT", COMMAND_PORT)) + (SHARD or 0)
+
+live_stats = LiveStats(SESSION_NAME, lambda: len(clients), port=int(os.environ.get("MC_LIVE_FEED_PORT", LIVE_FEED_PORT)),
+                       metrics=metrics, shard=SHARD, command_port=COMMAND_PORT)
+
+# Listen address; by default this machine's LAN address, which is what players type in /connect
+SERVER_HOST = os.environ.get("MC_SERVER_HOST")
+SERVER_PORT = int(os.environ.get("MC_SERVER_PORT", 19131))
+
+LOG_LEVEL = os.environ.get("MC_SERVER_LOG_LEVEL", "INFO").upper()
+
+# Set up logging function (queued; the file and console are written off the event loop)
+logger = setup_logging(LOG_FILE, LOG_LEVEL)
+
+def log_message(message, level=logging.INFO):
+    logger.log(level, message)
 
 # Fetch local IP address
 def get_local_ip():
@@ -35,43 +79,64 @@ def get_local_ip():
     s.close()
     return local_ip
 
-async def save_event_log():
-    try:
-        with DATA_FILE.open("w") as f:
-            json.dump(event_log, f, indent=2)
-        log_message(f"Events saved to: {DATA_FILE}")
-    except Exception as e:
-        log_message(f"Error saving events: {e}")
-
-async def subscribe_event(websocket, event_name):
-    await websocket.send(json.dumps({
-        "header": {
-            "version": 1,
-            "requestId": str(uuid.uuid4()),
-            "messagePurpose": "subscribe",
-            "messageType": "commandRequest"
-        },
-        "body": {
-            "eventName": event_name
+async def subscribe_event(client_commands, event_name):
+    await client_commands.subscribe(event_name)
+    log_message(f"[{client_commands.websocket.remote_address[0]}] ← Subscribed to {event_name}", logging.DEBUG)
+
+async def ingest_event(client, event_name, body, received):
+    # Runs in the ingest consumer (see ingest_queue.py), one message at a time across all clients
+
+    # Drop samples that add nothing (too soon, too close, or repeated)
+    accepted = ingest_filter.accept(event_name, body, received)
+    metrics.event(event_name, accepted)
+    if not accepted:
+        return
+    if event_name == "PlayerLeave":
+        ingest_filter.forget_player(body.get("player", {}).get("name"))
+    live_stats.record(event_name, body, received)
+    catalog.record(event_name, body, received)
+
+    # Movement samples go to the compact position store, everything else to the journal
+    if event_name == "PlayerTransform":
+        positions.add(received, body)
+    else:
+        event_entry = {
+            "event": event_name,
+            "body": body,
+            "client_ip": client.rsplit(":", 1)[0],
+            "timestamp": datetime.fromtimestamp(received).isoformat()
         }
-    }))
-    log_message(f"[{websocket.remote_address[0]}] ← Subscribed to {event_name}")
+        await journal.append(event_entry)
+
+def log_overload(overloaded):
+    if overloaded:
+        log_message("Ingest is falling behind; shedding PlayerTransform samples", logging.WARNING)
+    else:
+        log_message("Ingest caught up; no longer shedding")
+
+ingest = IngestQueues(ingest_event, metrics=metrics, on_error=lambda message: log_message(message, logging.ERROR),
+                      on_overload=log_overload)
 
 async def handler(websocket):
     client_ip = websocket.remote_address[0]
+    client = f"{client_ip}:{websocket.remote_address[1]}"
     clients.add(websocket)
+    queue = ingest.open(client)
+    client_commands = commands.attach(client, websocket)
 
     log_message(f"[+] Connection from {client_ip}")
 
     # Subscribe to all desired events
     for event in ["PlayerJoin", "PlayerLeave", "PlayerMessage", "PlayerTransform", "BlockPlaced"]:
-        await subscribe_event(websocket, event)
+        await subscribe_event(client_commands, event)
 
     try:
         async for message in websocket:
+            metrics.message(client)
             try:
                 data = json.loads(message)
             except json.JSONDecodeError:
+                metrics.parse_failure()
                 continue
 
             header = data.get("header", {})
@@ -79,56 +144,110 @@ async def handler(websocket):
             event_name = header.get("eventName", "")
             message_type = header.get("messagePurpose", "")
 
-            # Only handle event messages
-            if message_type == "event":
-                event_entry = {
-                    "event": event_name,
-                    "body": body,
-                    "client_ip": client_ip,
-                    "timestamp": datetime.now().isoformat()
-                }
+            # Answers to our commandRequests resolve the command waiting on them
+            if message_type in ("commandResponse", "error"):
+                failed = client_commands.answer(header, body)
+                if failed:
+                    log_message(f"[{client_ip}] Subscription to {failed} failed: {body.get('statusMessage')}", logging.WARNING)
+                continue
 
-                event_log.append(event_entry)
-                await save_event_log()
+            # Otherwise only handle event messages; the ingest consumer does the rest
+            if message_type != "event":
+                continue
+            if client_commands.player is None:
+                client_commands.player = body.get("player", {}).get("name")
+            await ingest.put(queue, event_name, body, time.time())
 
     except websockets.exceptions.ConnectionClosed as e:
         pass
     except Exception as e:
-        log_message(f"[!!] Error with {client_ip}: {e}")
+        log_message(f"[!!] Error with {client_ip}: {e}", logging.ERROR)
     finally:
         clients.remove(websocket)
+        ingest.release(queue)
+        commands.detach(client)
+        metrics.forget_client(client)
         log_message(f"Connected: {len(clients)}")  # Print active client count
 
 async def main():
     # Fetch the local IP address of the server
-    local_ip = get_local_ip()
-    server_url = f"To connect, type in Minecraft chat: /connect {local_ip}:19131"
+    local_ip = SERVER_HOST or get_local_ip()
+    server_url = f"To connect, type in Minecraft chat: /connect {local_ip}:{SERVER_PORT}"
     
     log_message(f"Server starting on {server_url}")
-    log_message(f"Events will be logged to: {DATA_FILE}")
-    
-    # Start WebSocket server
-    server = await websockets.serve(handler, local_ip, 19131)
+    log_message(f"Events will be logged to: {SESSION_DIR}")
+
+    # Start the background journal and position writers
+    global journal, positions
+    journal = EventJournal(SESSION_DIR, on_error=lambda message: log_message(message, logging.ERROR),
+                           on_write=metrics.recorder("journal"))
+    journal.start()
+    positions = PositionStore(SESSION_DIR, on_error=lambda message: log_message(message, logging.ERROR),
+                              on_write=metrics.recorder("positions"))
+    positions.start()
+    await catalog.start(positions)
+    ingest.start()
+    metrics.queue_depth["ingest"] = lambda: ingest.pending
+    metrics.queue_depth["journal"] = lambda: journal.pending
+    metrics.queue_depth["positions"] = lambda: positions.pending
+    live_task = asyncio.create_task(live_stats.run())
+    lag_task = asyncio.create_task(metrics.watch_loop_lag())
+
+    # Commands from the dashboard; ingest works without them
+    try:
+        await commands.serve(port=COMMAND_PORT)
+    except OSError as e:
+        log_message(f"Command port {COMMAND_PORT} unavailable, dashboard commands disabled: {e}", logging.WARNING)
+
+    # Start WebSocket server; workers share the port and the kernel balances connections between them
+    server = await websockets.serve(handler, local_ip, SERVER_PORT, reuse_port=SHARD is not None)
 
-    # Set up signal handling for graceful exit
+    # Set up signal handling for graceful exit (SIGTERM comes from the dashboard's stop button)
     loop = asyncio.get_event_loop()
-    loop.add_signal_handler(signal.SIGINT, lambda: asyncio.create_task(shutdown(server)))
+    stop = loop.create_future()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.cancel)
 
     # Wait for server to run until we receive a signal
     try:
-        await asyncio.Future()  # Run forever
+        await stop  # Run forever
     except asyncio.CancelledError:
         pass
     finally:
+        live_task.cancel()
+        lag_task.cancel()
         await shutdown(server)
 
 async def shutdown(server):
     log_message("\nServer is shutting down...")
+    await commands.close()
     server.close()
     await server.wait_closed()
     log_message("Server closed gracefully.")
-    await save_event_log()  # Save the final events before exit
+    await ingest.close()  # Ingest what the clients had already sent
+    await journal.close()  # Flush the remaining events before exit
+    await positions.close()
+    await catalog.close(positions)  # Last, so its final checkpoint covers everything written
+    live_stats.close()
+    log_message(f"Events saved to: {SESSION_DIR}")
+    log_message(f"Ingest filter: {json.dumps(ingest_filter.stats())}")
+
+def supervise():
+    # Multi-worker mode: the workers do the serving, this process only waits for them
+    local_ip = SERVER_HOST or get_local_ip()
+    log_message(f"Server starting on To connect, type in Minecraft chat: /connect {local_ip}:{SERVER_PORT}")
+    log_message(f"Events will be logged to: {SESSION_DIR}, one shard per worker")
+    run_workers(WORKERS, Path(__file__).resolve(), timestamp, log_message)
+    log_message(f"Events saved to: {SESSION_DIR}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        if WORKERS > 1 and can_share_port():
+            supervise()
+        else:
+            if WORKERS > 1:
+                log_message("SO_REUSEPORT is not available here; running a single ingest process", logging.WARNING)
+            asyncio.run(main())
+    finally:
+        stop_logging()  # Write out any batched log lines
 
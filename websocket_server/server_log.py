@@ -0,0 +1,105 @@
+import logging
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler
+
+# Non-blocking logging for the WebSocket server.
+#
+# Callers on the event loop only put records on a queue. A single background
+# thread formats them, prints them to the console and appends them to the log
+# file through one long-lived handle, writing in batches.
+
+LOG_BATCH = 64             # Write once this many lines are pending
+LOG_FLUSH_INTERVAL = 1.0   # ...or once the oldest pending line is this old
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+_queue = queue.SimpleQueue()
+_writer = None
+
+
+class BatchingFileHandler(logging.FileHandler):
+    def __init__(self, filename, batch_size=LOG_BATCH, flush_interval=LOG_FLUSH_INTERVAL):
+        super().__init__(filename, mode="a", encoding="utf-8")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._last_flush = time.monotonic()
+
+    def emit(self, record):
+        try:
+            self._pending.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+            return
+        if (len(self._pending) >= self.batch_size
+                or record.levelno >= logging.WARNING
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            if self._pending and self.stream:
+                self.stream.write("\n".join(self._pending) + "\n")
+                self._pending.clear()
+            super().flush()
+            self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        super().close()
+
+
+class _LogWriter(threading.Thread):
+    def __init__(self, handlers, flush_interval):
+        super().__init__(name="log-writer", daemon=True)
+        self.handlers = handlers
+        self.flush_interval = flush_interval
+
+    def run(self):
+        while True:
+            try:
+                record = _queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                # Idle: push out anything still sitting in a batch
+                self._flush()
+                continue
+            if record is None:
+                break
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+        for handler in self.handlers:
+            handler.close()
+
+    def _flush(self):
+        for handler in self.handlers:
+            handler.flush()
+
+
+def setup_logging(log_file, level=logging.INFO):
+    global _writer
+
+    file_handler = BatchingFileHandler(log_file)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(logging.Formatter("%(message)s"))
+
+    logger = logging.getLogger("mc_server")
+    logger.setLevel(level)
+    logger.propagate = False
+    logger.addHandler(QueueHandler(_queue))
+
+    _writer = _LogWriter([file_handler, console_handler], LOG_FLUSH_INTERVAL)
+    _writer.start()
+    return logger
+
+
+def stop_logging():
+    global _writer
+    if _writer is None:
+        return
+    _queue.put(None)
+    _writer.join()
+    _writer = None
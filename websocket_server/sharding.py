@@ -0,0 +1,71 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+
+# Multi-process ingest.
+#
+# With MC_INGEST_WORKERS=N (or "auto" for one per core) server.py starts as a
+# supervisor that runs N copies of itself as workers. The workers all listen
+# on the same port with SO_REUSEPORT, so the kernel spreads incoming
+# connections across them, and each client stays with the worker that
+# accepted it. Each worker decodes, filters and persists on its own core and
+# writes its own shard of the session (events_<timestamp>/shard_NN/, laid out
+# like a whole session). The dashboard reads the shards back as one session.
+#
+# Where SO_REUSEPORT is unavailable (Windows), the server runs as a single
+# process.
+
+WORKERS_ENV = "MC_INGEST_WORKERS"
+SHARD_ENV = "MC_INGEST_SHARD"        # Set by the supervisor for each worker
+SESSION_ENV = "MC_INGEST_SESSION"    # Session timestamp shared by all workers
+SHARD_DIR = "shard_{:02d}"
+
+
+class ShardingError(Exception):
+    pass
+
+
+def worker_count():
+    value = os.environ.get(WORKERS_ENV, "1").strip().lower()
+    if value == "auto":
+        return os.cpu_count() or 1
+    try:
+        count = int(value)
+    except ValueError:
+        raise ShardingError(f"{WORKERS_ENV} must be a number or 'auto', not {value!r}")
+    return max(1, count)
+
+
+def shard_index():
+    # This worker's shard, or None when not running as a worker
+    value = os.environ.get(SHARD_ENV)
+    return int(value) if value is not None else None
+
+
+def can_share_port():
+    return hasattr(socket, "SO_REUSEPORT")
+
+
+def run_workers(count, script, session, log):
+    # Runs `count` workers of `script` until they all exit. SIGINT and SIGTERM are
+    # passed on, so each worker shuts down gracefully and flushes its shard.
+    workers = []
+    for shard in range(count):
+        env = dict(os.environ, **{SHARD_ENV: str(shard), SESSION_ENV: session})
+        workers.append(subprocess.Popen([sys.executable, str(script)], env=env))
+    log(f"Started {count} ingest workers: {', '.join(str(worker.pid) for worker in workers)}")
+
+    def forward(signum, frame):
+        for worker in workers:
+            if worker.poll() is None:
+                worker.send_signal(signum)
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, forward)
+
+    for shard, worker in enumerate(workers):
+        code = worker.wait()
+        if code:
+            log(f"Ingest worker {shard} exited with code {code}")
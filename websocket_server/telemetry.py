@@ -0,0 +1,130 @@
+import asyncio
+import json
+import os
+import time
+
+import numpy as np
+
+# Compact storage for PlayerTransform samples.
+#
+# Movement is by far the most frequent event, but analysis only needs who was
+# where and when. Instead of journaling the raw JSON body, each sample is kept
+# as a fixed-width binary record appended to positions.bin, which the
+# dashboard memory-maps as NumPy columns. Player names are stored once, in
+# players.json, and records refer to them by index.
+
+# Record layout; must match POSITION_DTYPE in webapp/event_store.py
+POSITION_DTYPE = np.dtype([
+    ("t", "<f8"),        # Unix time the server received the sample
+    ("player", "<u2"),   # Index into players.json
+    ("x", "<f4"),
+    ("y", "<f4"),
+    ("z", "<f4"),
+    ("yaw", "<f4"),
+])
+POSITIONS_FILE = "positions.bin"
+PLAYERS_FILE = "players.json"
+
+FLUSH_INTERVAL = 1.0
+BUFFER_RECORDS = 4096
+
+
+class PositionStore:
+    def __init__(self, directory, flush_interval=FLUSH_INTERVAL, buffer_records=BUFFER_RECORDS, fsync=True, on_error=None, on_write=None):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.on_error = on_error
+        self.on_write = on_write  # Called with (seconds, records) after each write
+        self.players = {}
+        self.samples_written = 0
+        self._buffer = np.empty(buffer_records, dtype=POSITION_DTYPE)
+        self._count = 0
+        self._players_dirty = False
+        self._write_lock = asyncio.Lock()
+        self._pending_writes = set()
+        self._pending_records = 0
+        self._file = None
+        self._task = None
+
+    def start(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.directory / POSITIONS_FILE, "ab")
+        self._task = asyncio.create_task(self._run())
+
+    @property
+    def pending(self):
+        # Samples buffered or handed to a write that hasn't finished
+        return self._count + self._pending_records
+
+    def add(self, t, body):
+        player = body.get("player", {})
+        name = player.get("name", "Unknown")
+        pos = player.get("position", {})
+
+        player_id = self.players.get(name)
+        if player_id is None:
+            player_id = self.players[name] = len(self.players)
+            self._players_dirty = True
+
+        self._buffer[self._count] = (t, player_id, pos.get("x", 0), pos.get("y", 0), pos.get("z", 0), player.get("yRot", 0))
+        self._count += 1
+        if self._count == len(self._buffer):
+            self._schedule_flush()
+
+    async def close(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._task = None
+        self._schedule_flush()
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes)
+        self._file.close()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._count:
+                self._schedule_flush()
+
+    def _schedule_flush(self):
+        data = self._buffer[:self._count].tobytes()
+        players = dict(self.players) if self._players_dirty else None
+        self._count = 0
+        self._players_dirty = False
+        if not data and players is None:
+            return
+        self._pending_records += len(data) // POSITION_DTYPE.itemsize
+        task = asyncio.create_task(self._flush(data, players))
+        self._pending_writes.add(task)
+        task.add_done_callback(self._pending_writes.discard)
+
+    async def _flush(self, data, players):
+        records = len(data) // POSITION_DTYPE.itemsize
+        async with self._write_lock:
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self._write, data, players)
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(f"Error saving positions: {e}")
+            else:
+                if self.on_write:
+                    self.on_write(time.perf_counter() - started, records)
+            finally:
+                self._pending_records -= records
+
+    def _write(self, data, players):
+        # Names go first so every record on disk refers to a known player
+        if players is not None:
+            tmp_path = self.directory / (PLAYERS_FILE + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(sorted(players, key=players.get), f)
+            os.replace(tmp_path, self.directory / PLAYERS_FILE)
+        if data:
+            self._file.write(data)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self.samples_written += len(data) // POSITION_DTYPE.itemsize
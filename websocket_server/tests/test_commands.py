@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+import pytest
+
+from commands import ClientCommands, CommandDispatcher, CommandError, _parse_control
+
+# Command/response correlation by requestId, timeouts, and the control port's
+# handling of malformed requests.
+
+
+class FakeSocket:
+    # Records what the server sends; optionally answers each command through `commands`
+    def __init__(self, answer=None):
+        self.sent = []
+        self.answer = answer
+        self.commands = None
+
+    async def send(self, message):
+        request = json.loads(message)
+        self.sent.append(request)
+        if self.answer is not None:
+            body = self.answer(request["body"]["commandLine"])
+            if body is not None:
+                asyncio.get_running_loop().call_soon(self.commands.answer, request["header"], body)
+
+
+def _client(answer=None):
+    websocket = FakeSocket(answer)
+    commands = websocket.commands = ClientCommands("127.0.0.1:1", websocket, max_in_flight=4)
+    return commands, websocket
+
+
+def test_responses_matched_to_their_commands():
+    async def run():
+        commands, websocket = _client(lambda line: {"statusCode": 0, "statusMessage": f"done {line}"})
+        results = await asyncio.gather(*(commands.run(f"say {i}") for i in range(10)))
+        assert [r["message"] for r in results] == [f"done say {i}" for i in range(10)]
+        assert all(r["status"] == "ok" for r in results)
+        assert len({request["header"]["requestId"] for request in websocket.sent}) == 10
+        assert commands.in_flight == 0
+    asyncio.run(run())
+
+
+def test_unanswered_command_times_out():
+    async def run():
+        commands, _ = _client(lambda line: None if line == "hang" else {"statusCode": 0})
+        hung, answered = await asyncio.gather(commands.run("hang", timeout=0.05), commands.run("say hi", timeout=0.05))
+        assert hung["status"] == "timeout"
+        assert answered["status"] == "ok"
+        assert commands.in_flight == 0
+    asyncio.run(run())
+
+
+def test_failed_status_and_disconnect():
+    async def run():
+        commands, _ = _client(lambda line: {"statusCode": -2147483648, "statusMessage": "Syntax error"})
+        result = await commands.run("bogus")
+        assert (result["status"], result["message"]) == ("failed", "Syntax error")
+
+        commands, _ = _client()
+        pending = asyncio.ensure_future(commands.run("say hi", timeout=5))
+        await asyncio.sleep(0)
+        commands.close()
+        result = await pending
+        assert (result["status"], result["message"]) == ("failed", "client disconnected")
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("request_line", [
+    b"not json",
+    b"[]",
+    b'{"commands": []}',
+    b'{"commands": ["say hi", ""]}',
+    b'{"commands": ["say hi"], "timeout": 0}',
+    b'{"commands": ["say hi"], "timeout": 3600}',
+    b'{"commands": ["say hi"], "clients": "alex"}',
+    b'{"commands": ["say hi"], "clients": [{"name": "alex"}]}',
+])
+def test_malformed_requests_rejected(request_line):
+    with pytest.raises((ValueError, CommandError)):
+        _parse_control(request_line)
+
+
+def test_control_port_replies_to_rejected_requests():
+    async def run():
+        dispatcher = CommandDispatcher()
+        server = await dispatcher.serve(port=0)
+        port = server.sockets[0].getsockname()[1]
+        replies = []
+        for request in ({"commands": ["say hi"], "clients": [["alex"]]}, {"commands": ["say hi"], "clients": ["alex"]}):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(json.dumps(request).encode("utf-8") + b"\n")
+            await writer.drain()
+            replies.append(json.loads(await asyncio.wait_for(reader.readline(), 5)))
+            writer.close()
+        await dispatcher.close()
+
+        assert "clients must be a list" in replies[0]["error"]
+        assert replies[1]["clients"] == 0
+    asyncio.run(run())
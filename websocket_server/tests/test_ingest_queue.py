@@ -0,0 +1,92 @@
+import asyncio
+
+from ingest_queue import IngestQueues
+from metrics import ServerMetrics
+
+# Fair, prioritised draining of the per-client queues, and shedding of
+# PlayerTransform samples under load.
+
+
+def _drain(queues):
+    # Runs the consumer until everything queued so far has been ingested
+    queues.start()
+    return queues.close()
+
+
+def _queues(**kwargs):
+    consumed = []
+
+    async def consume(client, event_name, body, received):
+        consumed.append((client, event_name, body))
+
+    metrics = ServerMetrics(lambda: 0)
+    return IngestQueues(consume, metrics=metrics, **kwargs), consumed, metrics
+
+
+def test_sheddable_dropped_on_arrival_while_overloaded():
+    async def run():
+        overloads = []
+        queues, consumed, metrics = _queues(shed_threshold=4, on_overload=overloads.append)
+        client = queues.open("a")
+        for i in range(4):
+            await queues.put(client, "PlayerMessage", i, 0.0)
+        await queues.put(client, "PlayerTransform", "dropped", 0.0)
+        await queues.put(client, "PlayerJoin", "kept", 0.0)
+        assert queues.overloaded
+        assert metrics.shed["PlayerTransform"] == 1
+
+        await _drain(queues)
+        assert [body for _, _, body in consumed] == [0, 1, 2, 3, "kept"]
+        assert overloads == [True, False]
+        assert not queues.overloaded
+    asyncio.run(run())
+
+
+def test_oldest_samples_dropped_past_the_per_client_cap():
+    async def run():
+        queues, consumed, metrics = _queues(max_sheddable=2)
+        client = queues.open("a")
+        for i in range(5):
+            await queues.put(client, "PlayerTransform", i, 0.0)
+        assert metrics.shed["PlayerTransform"] == 3
+        await _drain(queues)
+        assert [body for _, _, body in consumed] == [3, 4]
+    asyncio.run(run())
+
+
+def test_round_robin_between_clients():
+    async def run():
+        queues, consumed, _ = _queues()
+        chatty, quiet = queues.open("chatty"), queues.open("quiet")
+        for i in range(3):
+            await queues.put(chatty, "PlayerMessage", i, 0.0)
+        await queues.put(quiet, "PlayerMessage", 0, 0.0)
+        await _drain(queues)
+        assert [client for client, _, _ in consumed] == ["chatty", "quiet", "chatty", "chatty"]
+    asyncio.run(run())
+
+
+def test_important_messages_go_before_samples():
+    async def run():
+        queues, consumed, _ = _queues()
+        a, b = queues.open("a"), queues.open("b")
+        await queues.put(a, "PlayerTransform", "sample", 0.0)
+        await queues.put(b, "PlayerTransform", "sample", 0.0)
+        await queues.put(a, "PlayerMessage", "message", 0.0)
+        await queues.put(b, "PlayerJoin", "join", 0.0)
+        await _drain(queues)
+        assert [body for _, _, body in consumed] == ["message", "join", "sample", "sample"]
+    asyncio.run(run())
+
+
+def test_samples_before_a_leave_are_ingested_before_it():
+    async def run():
+        queues, consumed, metrics = _queues()
+        client = queues.open("a")
+        await queues.put(client, "PlayerTransform", 1, 0.0)
+        await queues.put(client, "PlayerTransform", 2, 0.0)
+        await queues.put(client, "PlayerLeave", "leave", 0.0)
+        await _drain(queues)
+        assert [body for _, _, body in consumed] == [1, 2, "leave"]
+        assert not metrics.shed
+    asyncio.run(run())
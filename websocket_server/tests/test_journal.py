@@ -0,0 +1,41 @@
+import asyncio
+import json
+
+from journal import EventJournal
+
+# The journal writes one JSON line per event, in order, across segments.
+
+
+def _write(directory, entries, **kwargs):
+    async def run():
+        journal = EventJournal(directory, flush_interval=0.01, fsync=False, **kwargs)
+        journal.start()
+        for entry in entries:
+            await journal.append(entry)
+        await journal.close()
+        return journal
+    return asyncio.run(run())
+
+
+def _read(directory):
+    lines = []
+    for segment in sorted(directory.glob("segment_*.jsonl")):
+        lines += segment.read_text(encoding="utf-8").splitlines()
+    return [json.loads(line) for line in lines]
+
+
+def test_events_written_in_order(tmp_path):
+    entries = [{"event": "PlayerMessage", "n": i} for i in range(1000)]
+    journal = _write(tmp_path, entries)
+    assert _read(tmp_path) == entries
+    assert journal.events_written == 1000
+    assert journal.position == ("segment_00001.jsonl", (tmp_path / "segment_00001.jsonl").stat().st_size)
+
+
+def test_segments_rotate_and_stay_whole(tmp_path):
+    entries = [{"event": "PlayerMessage", "n": i, "text": "x" * 100} for i in range(200)]
+    _write(tmp_path, entries, segment_max_bytes=4096, batch_size=8)
+    segments = sorted(tmp_path.glob("segment_*.jsonl"))
+    assert len(segments) > 1
+    assert all(segment.read_bytes().endswith(b"\n") for segment in segments if segment.stat().st_size)
+    assert _read(tmp_path) == entries